@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+async_concurrency_bench.py
+Compare /api/ask throughput with the agent run on the default executor
+versus the native asyncio path, using a fake fixed-latency LLM.
+
+Usage
+-----
+python -m benchmarks.async_concurrency_bench --latency 0.2 --concurrency 32,128,512
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server  # noqa: E402
+import src.text2cypher_agent as text2cypher_agent  # noqa: E402
+from benchmarks.fake_llm import FakeLatencyChatModel  # noqa: E402
+from src.response_cache import ResponseCache  # noqa: E402
+
+
+class ExecutorAgent:
+    """Previous behaviour: blocking ``respond`` on the default thread pool."""
+
+    def __init__(self, agent):
+        self._agent = agent
+
+    async def arespond(self, user_text: str, session_id: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._agent.respond, user_text, session_id)
+
+
+async def run_burst(agent, concurrency: int) -> dict:
+    peak_threads = threading.active_count()
+    stop = asyncio.Event()
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while not stop.is_set():
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.create_task(sample_threads())
+    start = time.perf_counter()
+    with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=agent)):
+        await asyncio.gather(*(
+            api_server.ask_llm_agent(
+                api_server.QueryRequest(query=f"question {i}", session_id=f"bench-{i}")
+            )
+            for i in range(concurrency)
+        ))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampler
+    text2cypher_agent.Text2CypherAgent.clear_session_history()
+    return {
+        "concurrency": concurrency,
+        "wall_s": round(elapsed, 3),
+        "throughput_rps": round(concurrency / elapsed, 1),
+        "peak_threads": peak_threads,
+    }
+
+
+async def main_async(args) -> list[dict]:
+    llm = FakeLatencyChatModel(latency=args.latency, jitter=args.jitter)
+    with patch.object(text2cypher_agent, "make_llm", return_value=llm):
+        agent = text2cypher_agent.Text2CypherAgent(provider="openai")
+
+    modes = {"executor": ExecutorAgent(agent), "native": agent}
+    results = []
+    for mode, mode_agent in modes.items():
+        for concurrency in args.concurrency:
+            row = await run_burst(mode_agent, concurrency)
+            row["mode"] = mode
+            results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executor vs native async /api/ask load test.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--concurrency",
+        type=lambda v: [int(x) for x in v.split(",")],
+        default=[32, 128, 512],
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    api_server._RESPONSE_CACHE = ResponseCache(max_entries=0)
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':>10} {'concurrency':>12} {'wall_s':>8} {'rps':>8} {'threads':>8}")
+    for row in results:
+        print(
+            f"{row['mode']:>10} {row['concurrency']:>12} {row['wall_s']:>8} "
+            f"{row['throughput_rps']:>8} {row['peak_threads']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+cold_start_bench.py
+Measure what a new API process pays before it answers quickly: the time to
+import the app, the startup warm-up and the first and second /api/ask.
+
+Every run is a fresh interpreter. The provider client is really built (so
+its package import and construction are timed) but the call itself goes to
+a fixed-latency fake LLM, so no network or API key is needed; TLS setup is
+therefore not part of the numbers. Modes:
+
+- ``eager``: provider packages imported up front, as before lazy imports
+- ``lazy``:  provider package imported by the first request
+- ``warm``:  lazy, with ``WARMUP_PROVIDERS`` building the agent at startup
+
+Usage
+-----
+python -m benchmarks.cold_start_bench --runs 5
+python -m benchmarks.cold_start_bench --provider google --modes lazy,warm --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_PROVIDER_PACKAGES = {
+    "openai": ["openai", "langchain_openai"],
+    "google": ["langchain_google_genai"],
+}
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+async def _requests(api_server, mode: str, provider: str) -> dict:
+    timings = {"ready_ms": 0.0}
+    if mode == "warm":
+        api_server.WARMUP_PROVIDERS = [provider]
+    async with api_server.lifespan(api_server.app):
+        if mode == "warm":
+            start = time.perf_counter()
+            await api_server._warmup_task
+            timings["ready_ms"] = _ms(start)
+        for name, question in (("first_ms", "list genes"), ("second_ms", "list diseases")):
+            start = time.perf_counter()
+            await api_server.ask_llm_agent(
+                api_server.QueryRequest(query=question, session_id=name, provider=provider)
+            )
+            timings[name] = _ms(start)
+    return timings
+
+
+def run_child(mode: str, provider: str, latency: float) -> dict:
+    """One cold process: import, optional warm-up, two requests."""
+    sys.path.insert(0, str(ROOT))
+    start = time.perf_counter()
+    if mode == "eager":
+        for package in _PROVIDER_PACKAGES[provider]:
+            __import__(package)
+    import src.api_server as api_server
+    import_ms = _ms(start)
+
+    import src.text2cypher_agent as text2cypher_agent
+    from benchmarks.fake_llm import FakeLatencyChatModel
+
+    make_llm = text2cypher_agent.make_llm
+
+    def make_fake_llm(provider: str = "openai", **kwargs):
+        make_llm(provider, **kwargs)  # import and build the real client
+        return FakeLatencyChatModel(latency=latency)
+
+    text2cypher_agent.make_llm = make_fake_llm
+    return {"mode": mode, "import_ms": import_ms, **asyncio.run(_requests(api_server, mode, provider))}
+
+
+def run(mode: str, provider: str, latency: float) -> dict:
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "bench"),
+        "OPENAI_API_MODEL": os.getenv("OPENAI_API_MODEL", "gpt-5-mini"),
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "bench"),
+        "GOOGLE_MODEL": os.getenv("GOOGLE_MODEL", "gemini-2.5-pro"),
+        "RESPONSE_CACHE_MAX_ENTRIES": "0",
+        "SCHEMA_RELOAD_SECONDS": "0",
+        "WARMUP_PROVIDERS": "",
+    }
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start_bench", "--child", mode,
+         "--provider", provider, "--latency", str(latency)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def summarize(rows: list[dict]) -> dict:
+    keys = ("import_ms", "ready_ms", "first_ms", "second_ms")
+    return {
+        "mode": rows[0]["mode"],
+        "runs": len(rows),
+        **{key: round(statistics.median(row[key] for row in rows), 1) for key in keys},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and first-request latency of a fresh process.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--provider", choices=sorted(_PROVIDER_PACKAGES), default="openai")
+    parser.add_argument("--modes", type=lambda v: v.split(","), default=["eager", "lazy", "warm"])
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM latency (s)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.provider, args.latency)))
+        return
+
+    results = [
+        summarize([run(mode, args.provider, args.latency) for _ in range(args.runs)])
+        for mode in args.modes
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':>6} {'import_ms':>10} {'ready_ms':>9} {'first_ms':>9} {'second_ms':>10}")
+    for row in results:
+        print(
+            f"{row['mode']:>6} {row['import_ms']:>10} {row['ready_ms']:>9} "
+            f"{row['first_ms']:>9} {row['second_ms']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
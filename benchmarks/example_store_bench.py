@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+example_store_bench.py
+Add and search cost of the few-shot example store as it grows.
+
+Synthetic questions are built from label, relationship and name vocabularies
+so that some terms are rare (names) and some appear in a large share of the
+store (labels, verbs). For each size the store is filled one example at a
+time, as the server does, then a set of questions is searched repeatedly.
+Search time should stay well under a millisecond at 100k examples.
+
+Usage
+-----
+python -m benchmarks.example_store_bench --sizes 1000,10000,100000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.example_store import ExampleStore  # noqa: E402
+
+LABELS = ["gene", "disease", "compound", "protein", "pathway", "anatomy", "symptom", "side effect"]
+VERBS = ["associated with", "treats", "binds", "expressed in", "causes", "upregulates", "interacts with"]
+OPENERS = ["Which", "List", "How many", "Show"]
+SUFFIXES = ["", "with score above 0.5", "in humans", "ordered by degree"]
+QUERIES = [
+    "Which genes are associated with disease name42?",
+    "list genes",
+    "How many compounds treat hypertension",
+    "proteins interacting with gene name77 in humans",
+]
+
+
+def question(rng: random.Random, names: int) -> str:
+    return " ".join([
+        rng.choice(OPENERS),
+        f"{rng.choice(LABELS)}s",
+        rng.choice(VERBS),
+        rng.choice(LABELS),
+        f"name{rng.randrange(names)}",
+        rng.choice(SUFFIXES),
+    ])
+
+
+def bench(size: int, searches: int, k: int) -> dict:
+    rng = random.Random(size)
+    store = ExampleStore()
+    start = time.perf_counter()
+    for i in range(size):
+        store.add(question(rng, max(1, size // 5)), f"MATCH (n) RETURN n LIMIT {i}")
+    add_us = (time.perf_counter() - start) / size * 1e6
+
+    timings = []
+    for i in range(searches):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        store.search(query, k)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "examples": len(store),
+        "add_us": round(add_us, 1),
+        "search_p50_us": round(statistics.median(timings) * 1e6, 1),
+        "search_p99_us": round(timings[int(len(timings) * 0.99) - 1] * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Example store add/search microbenchmark.")
+    parser.add_argument(
+        "--sizes",
+        type=lambda v: [int(x) for x in v.split(",")],
+        default=[1_000, 10_000, 100_000],
+    )
+    parser.add_argument("--searches", type=int, default=2_000, help="Timed searches per size")
+    parser.add_argument("--k", type=int, default=3, help="Examples returned per search")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = [bench(size, args.searches, args.k) for size in args.sizes]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'examples':>10} {'add us':>8} {'search p50 us':>14} {'search p99 us':>14}")
+    for row in results:
+        print(
+            f"{row['examples']:>10} {row['add_us']:>8} "
+            f"{row['search_p50_us']:>14} {row['search_p99_us']:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
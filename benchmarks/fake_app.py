@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+fake_app.py
+The real FastAPI app with every provider replaced by FakeLatencyChatModel,
+so uvicorn can serve it without network access or API keys.
+
+Settings (environment)
+----------------------
+BENCH_LLM_LATENCY   fake provider latency in seconds (default 0.05)
+BENCH_LLM_JITTER    uniform ± jitter on that latency in seconds (default 0)
+BENCH_LLM_CPU_MS    CPU work per request in milliseconds (default 5)
+Latency and jitter can be set per provider with a suffix, e.g.
+``BENCH_LLM_LATENCY_GOOGLE``.
+
+Usage
+-----
+uvicorn benchmarks.fake_app:app --workers 4
+"""
+
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# Every request should reach the (fake) provider.
+os.environ.setdefault("RESPONSE_CACHE_MAX_ENTRIES", "0")
+
+import src.text2cypher_agent as text2cypher_agent  # noqa: E402
+from benchmarks.fake_llm import FakeLatencyChatModel  # noqa: E402
+
+
+def _setting(name: str, provider: str, default: str) -> str:
+    return os.getenv(f"{name}_{provider.upper()}", os.getenv(name, default))
+
+
+def _make_fake_llm(provider: str = "openai", **_kwargs) -> FakeLatencyChatModel:
+    return FakeLatencyChatModel(
+        latency=float(_setting("BENCH_LLM_LATENCY", provider, "0.05")),
+        jitter=float(_setting("BENCH_LLM_JITTER", provider, "0")),
+        cpu_seconds=float(os.getenv("BENCH_LLM_CPU_MS", "5")) / 1000,
+    )
+
+
+text2cypher_agent.make_llm = _make_fake_llm
+
+from src.api_server import app  # noqa: E402,F401
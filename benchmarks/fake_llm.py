@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+fake_llm.py
+Latency-configurable chat model for offline benchmarks.
+
+The model sleeps for ``latency`` ± ``jitter`` seconds before answering
+(``time.sleep`` on the sync path, ``asyncio.sleep`` on the async path), so
+it behaves like a remote provider without any network access. ``cpu_seconds``
+adds a busy loop per call to model per-request CPU work in the server.
+
+Usage
+-----
+from benchmarks.fake_llm import FakeLatencyChatModel
+llm = FakeLatencyChatModel(latency=0.5, jitter=0.1)
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeLatencyChatModel(BaseChatModel):
+    latency: float = 0.5
+    jitter: float = 0.0
+    response: str = "MATCH (n) RETURN n LIMIT 1"
+    chunk_size: int = 4
+    seed: Optional[int] = None
+    cpu_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-latency"
+
+    def _delay(self) -> float:
+        rng = random.Random(self.seed) if self.seed is not None else random
+        return max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+
+    def _burn_cpu(self) -> None:
+        deadline = time.perf_counter() + self.cpu_seconds
+        while time.perf_counter() < deadline:
+            pass
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        self._burn_cpu()
+        input_chars = sum(len(str(m.content)) for m in messages)
+        message = AIMessage(
+            content=self.response,
+            usage_metadata={
+                "input_tokens": max(1, input_chars // 4),
+                "output_tokens": max(1, len(self.response) // 4),
+                "total_tokens": max(1, input_chars // 4) + max(1, len(self.response) // 4),
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay())
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._result(messages)
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._delay())
+        self._burn_cpu()
+        for idx in range(0, len(self.response), self.chunk_size):
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content=self.response[idx:idx + self.chunk_size])
+            )
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._delay())
+        self._burn_cpu()
+        for idx in range(0, len(self.response), self.chunk_size):
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content=self.response[idx:idx + self.chunk_size])
+            )
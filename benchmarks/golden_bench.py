@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+golden_bench.py
+Tokens, cost, time and accuracy of Text2CypherAgent over a golden question
+set, per provider and prompt configuration.
+
+Each golden question (``benchmarks/golden/questions.jsonl``) is answered by
+a fresh agent built for the configuration under test: schema format, hints
+on or off, schema pruning, and a number of earlier golden exchanges placed
+in the session history. By default the provider is replaced by
+``ReplayChatModel``. It answers from recorded provider responses
+(``benchmarks/golden/recordings.jsonl``), counts input tokens on the prompt
+actually built, and estimates cached tokens the way provider prefix caching
+works. Prompt changes therefore show up in the token numbers without any
+network access. ``--live`` calls the real providers instead, and ``--record``
+does the same and saves their answers as the new recordings.
+
+Recordings are keyed by (provider, config, question). A recording with no
+``config`` answers for every configuration, so accuracy from it cannot differ
+between configurations; the ``cfg%`` column shows the share of answers
+recorded for the configuration itself. Recordings with ``"source": "seed"``
+were written by hand, not returned by a provider: runs that use them are
+marked ``SEED DATA - not measured`` and show no wall time.
+
+Answers are scored against the golden Cypher: exact (after removing code
+fences and a trailing semicolon) and normalized (keyword case, whitespace,
+quote style and variable names ignored).
+
+Usage
+-----
+python -m benchmarks.golden_bench
+python -m benchmarks.golden_bench --configs "baseline;format=json;hints=off;pruning=on;history=4"
+python -m benchmarks.golden_bench --providers openai --record
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.text2cypher_agent as text2cypher_agent  # noqa: E402
+from src.history_window import count_tokens, message_tokens  # noqa: E402
+from src.response_cache import normalize_question  # noqa: E402
+from src.schema_loader import load_schema_snapshot  # noqa: E402
+from src.text2cypher_agent import (  # noqa: E402
+    Text2CypherAgent,
+    clean_answer,
+    get_prompt_usage,
+    get_provider_model,
+    reset_prompt_usage,
+)
+
+GOLDEN_DIR = ROOT / "benchmarks" / "golden"
+
+# USD per 1M tokens (input, cached input, output) for the default models at the
+# time of writing; pass --prices to use your own.
+PRICES = {
+    "openai": (0.25, 0.025, 2.00),
+    "google": (1.25, 0.125, 10.00),
+}
+
+# Provider prefix caching: prompts from this size on, in blocks of this size.
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+DEFAULT_CONFIGS = "baseline;format=json;hints=off;pruning=on;history=4"
+
+KEYWORDS = frozenset(
+    """
+    match optional where return with as and or not in is null distinct order by asc desc
+    limit skip count collect exists contains starts ends unwind union all case when then
+    else end call yield true false
+    """.split()
+)
+_TOKEN = re.compile(
+    r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|[A-Za-z_][A-Za-z0-9_]*|\d+(?:\.\d+)?|<-|->|\S"
+)
+
+
+def normalize_cypher(text: str) -> str:
+    """Cypher with keyword case, spacing, quote style and variable names normalized."""
+    tokens = _TOKEN.findall(clean_answer(text).rstrip("; \n"))
+    variables: Dict[str, str] = {}
+    for i, token in enumerate(tokens[1:], start=1):
+        previous = tokens[i - 1]
+        if (previous in ("(", "[") or previous.lower() == "as") and re.match(r"[A-Za-z_]", token):
+            if token.lower() not in KEYWORDS:
+                variables.setdefault(token, f"v{len(variables) + 1}")
+    normalized = []
+    for i, token in enumerate(tokens):
+        after_dot = i > 0 and tokens[i - 1] == "."
+        if token[0] in "'\"":
+            normalized.append("'" + token[1:-1].replace("\\" + token[0], token[0]) + "'")
+        elif token in variables and not after_dot:
+            normalized.append(variables[token])
+        elif token.lower() in KEYWORDS:
+            normalized.append(token.upper())
+        else:
+            normalized.append(token)
+    return " ".join(normalized)
+
+
+def load_jsonl(path: Path) -> List[dict]:
+    with path.open(encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+class ReplayChatModel(BaseChatModel):
+    """Answers from recordings keyed by question; counts tokens on the real prompt."""
+
+    answers: Dict[str, dict] = {}
+    seen_prefixes: List[str] = []
+    missing: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "golden-replay"
+
+    def _recording(self, messages: List[BaseMessage]) -> Optional[dict]:
+        # The latest recorded question; repair follow-ups replay the same answer.
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                recording = self.answers.get(normalize_question(str(message.content)))
+                if recording is not None:
+                    return recording
+        return None
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        recording = self._recording(messages)
+        if recording is None:
+            self.missing.append(str(messages[-1].content))
+            answer, output_tokens = "", 0
+        else:
+            answer = recording["answer"]
+            output_tokens = recording.get("output_tokens") or count_tokens(answer)
+        input_tokens = sum(message_tokens(message) for message in messages)
+        prefix = str(messages[0].content)
+        prefix_tokens = message_tokens(messages[0])
+        cached = 0
+        if prefix in self.seen_prefixes and input_tokens >= CACHE_MIN_TOKENS:
+            cached = prefix_tokens // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS
+        self.seen_prefixes.append(prefix)
+        message = AIMessage(
+            content=answer,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+                "input_token_details": {"cache_read": cached},
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def parse_config(text: str) -> Dict[str, Any]:
+    """``format=json,hints=off,history=4`` -> settings; ``baseline`` -> defaults."""
+    config = {"name": text.strip() or "baseline", "format": None, "hints": True, "pruning": False, "history": 0}
+    for part in text.split(","):
+        key, _, value = part.strip().partition("=")
+        if not value:
+            continue
+        if key == "format":
+            config["format"] = value
+        elif key in ("hints", "pruning"):
+            config[key] = value.lower() in ("on", "true", "1", "yes")
+        elif key == "history":
+            config["history"] = int(value)
+        else:
+            raise ValueError(f"Unknown config key: {key}")
+    return config
+
+
+def build_agent(provider: str, config: Dict[str, Any], args, llm) -> Text2CypherAgent:
+    env = {"NEO4J_SCHEMA_PATH": str(args.schema), "SCHEMA_HINTS_PATH": str(args.hints) if config["hints"] else ""}
+    with ExitStack() as stack:
+        stack.enter_context(patch.dict(os.environ, env))
+        stack.enter_context(patch.object(text2cypher_agent, "SCHEMA_PRUNING", config["pruning"]))
+        if config["format"]:
+            stack.enter_context(patch.object(text2cypher_agent, "SCHEMA_FORMAT", config["format"]))
+        if llm is not None:
+            stack.enter_context(patch.object(text2cypher_agent, "make_llm", return_value=llm))
+        snapshot = load_schema_snapshot()
+        return Text2CypherAgent(provider=provider, snapshot=snapshot)
+
+
+def replay_answers(provider: str, config: str, recordings: List[dict]) -> Dict[str, dict]:
+    """Recordings by question for one run: the configuration's own, else ones
+    recorded without a configuration."""
+    answers: Dict[str, dict] = {}
+    for recording in recordings:
+        if recording["provider"] == provider and recording.get("config") is None:
+            answers[normalize_question(recording["question"])] = recording
+    for recording in recordings:
+        if recording["provider"] == provider and recording.get("config") == config:
+            answers[normalize_question(recording["question"])] = recording
+    return answers
+
+
+async def run_config(provider: str, config: Dict[str, Any], golden: List[dict], args, recordings) -> dict:
+    llm = None
+    answers: Dict[str, dict] = {}
+    if not (args.live or args.record):
+        answers = replay_answers(provider, config["name"], recordings)
+        llm = ReplayChatModel(answers=answers, seen_prefixes=[], missing=[])
+    agent = build_agent(provider, config, args, llm)
+
+    rows = []
+    with ExitStack() as stack:
+        # Pruned prompts are rendered per request, in the configured format.
+        if config["format"]:
+            stack.enter_context(patch.object(text2cypher_agent, "SCHEMA_FORMAT", config["format"]))
+        for index, item in enumerate(golden):
+            session_id = f"golden-{provider}-{config['name']}-{item['id']}"
+            Text2CypherAgent.clear_session_history(session_id)
+            for earlier in golden[max(0, index - config["history"]):index]:
+                await Text2CypherAgent.aappend_external_exchange(
+                    session_id, earlier["question"], earlier["cypher"], provider=provider
+                )
+            reset_prompt_usage()
+            start = time.perf_counter()
+            try:
+                answer = await agent.arespond(item["question"], session_id)
+                error = None
+            except Exception as exc:  # a live provider error counts as a miss
+                answer, error = "", repr(exc)
+            elapsed = time.perf_counter() - start
+            usage = get_prompt_usage() or {}
+            Text2CypherAgent.clear_session_history(session_id)
+            recording = answers.get(normalize_question(item["question"]))
+            rows.append({
+                "id": item["id"],
+                "question": item["question"],
+                "answer": answer,
+                "error": error,
+                "exact": clean_answer(answer).rstrip(";") == item["cypher"],
+                "normalized": normalize_cypher(answer) == normalize_cypher(item["cypher"]),
+                "input_tokens": usage.get("input_tokens", 0),
+                "cached_input_tokens": usage.get("cached_input_tokens", 0),
+                "output_tokens": usage.get("output_tokens", 0),
+                "wall_ms": round(elapsed * 1000, 1),
+                "source": recording.get("source", "recorded") if recording else ("live" if llm is None else None),
+                "config_specific": llm is None or bool(recording and recording.get("config")),
+            })
+    return summarize(provider, config, rows, args, missing=len(llm.missing) if llm is not None else 0)
+
+
+def summarize(provider: str, config: Dict[str, Any], rows: List[dict], args, missing: int) -> dict:
+    count = len(rows)
+    input_tokens = sum(r["input_tokens"] for r in rows)
+    cached = sum(r["cached_input_tokens"] for r in rows)
+    output_tokens = sum(r["output_tokens"] for r in rows)
+    price_in, price_cached, price_out = args.prices.get(provider, (0.0, 0.0, 0.0))
+    seed = any(r["source"] == "seed" for r in rows)
+    cost = ((input_tokens - cached) * price_in + cached * price_cached + output_tokens * price_out) / 1e6
+    return {
+        "provider": provider,
+        "model": get_provider_model(provider) or None,
+        "config": config["name"],
+        "mode": "live" if (args.live or args.record) else "replay",
+        # Hand-written answers: accuracy is not a measurement of the provider.
+        "seed_data": seed,
+        "config_specific": round(sum(r["config_specific"] for r in rows) / count, 3),
+        "questions": count,
+        "exact": round(sum(r["exact"] for r in rows) / count, 3),
+        "normalized": round(sum(r["normalized"] for r in rows) / count, 3),
+        "avg_input_tokens": round(input_tokens / count, 1),
+        "avg_cached_tokens": round(cached / count, 1),
+        "avg_output_tokens": round(output_tokens / count, 1),
+        "cost_per_1k_usd": round(cost / count * 1000, 4),
+        "p50_wall_ms": None if seed else round(statistics.median(r["wall_ms"] for r in rows), 1),
+        "total_wall_s": None if seed else round(sum(r["wall_ms"] for r in rows) / 1000, 3),
+        "unrecorded": missing,
+        "errors": sum(1 for r in rows if r["error"]),
+        "rows": rows,
+    }
+
+
+def save_recordings(path: Path, results: List[dict], recordings: List[dict]) -> None:
+    """Replace the recordings of every (provider, config) in ``results`` with
+    its answers; seed recordings of a recorded provider are dropped."""
+    recorded = {(result["provider"], result["config"]) for result in results}
+    providers = {provider for provider, _ in recorded}
+    kept = [
+        r for r in recordings
+        if (r["provider"], r.get("config")) not in recorded
+        and not (r["provider"] in providers and r.get("source") == "seed")
+    ]
+    for result in results:
+        for row in result["rows"]:
+            if row["error"]:
+                continue
+            kept.append({
+                "provider": result["provider"],
+                "config": result["config"],
+                "model": result["model"],
+                "question": row["question"],
+                "answer": row["answer"],
+                "output_tokens": row["output_tokens"],
+                "latency_ms": row["wall_ms"],
+                "source": "recorded",
+            })
+    with path.open("w", encoding="utf-8") as fh:
+        for recording in kept:
+            fh.write(json.dumps(recording, ensure_ascii=False) + "\n")
+
+
+def print_table(results: List[dict]) -> None:
+    header = (
+        f"{'provider':>8} {'config':>14} {'exact':>6} {'norm':>6} {'in_tok':>8} {'cached':>8} "
+        f"{'out_tok':>8} {'$/1k':>8} {'p50_ms':>8} {'d_in%':>7} {'cfg%':>5}"
+    )
+    print(header)
+    baselines: Dict[str, dict] = {}
+    for result in results:
+        baseline = baselines.setdefault(result["provider"], result)
+        delta = (
+            round((result["avg_input_tokens"] - baseline["avg_input_tokens"]) / baseline["avg_input_tokens"] * 100, 1)
+            if baseline["avg_input_tokens"] else 0.0
+        )
+        p50 = "-" if result["p50_wall_ms"] is None else result["p50_wall_ms"]
+        print(
+            f"{result['provider']:>8} {result['config'][:14]:>14} {result['exact']:>6} {result['normalized']:>6} "
+            f"{result['avg_input_tokens']:>8} {result['avg_cached_tokens']:>8} {result['avg_output_tokens']:>8} "
+            f"{result['cost_per_1k_usd']:>8} {p50:>8} {delta:>7} {round(result['config_specific'] * 100):>5}"
+            + ("  SEED DATA - not measured" if result["seed_data"] else "")
+        )
+    if any(result["seed_data"] for result in results):
+        print(
+            "\nSEED DATA - not measured: these runs replay hand-written answers. Accuracy is not a"
+            "\nprovider measurement and wall time is not shown; run with --record for real answers."
+        )
+    if any(result["config_specific"] < 1 for result in results):
+        print("Answers not recorded for their configuration (cfg% < 100) are the same in every configuration.")
+    unrecorded = sum(result["unrecorded"] for result in results)
+    if unrecorded:
+        print(f"\n{unrecorded} prompts had no recorded answer; run with --record to refresh the recordings.")
+
+
+def _prices(value: str) -> Dict[str, tuple]:
+    """Parse ``openai=0.25/0.025/2.0,google=...`` (USD per 1M input/cached/output tokens)."""
+    prices = dict(PRICES)
+    for part in value.split(","):
+        provider, _, triple = part.partition("=")
+        prices[provider.strip()] = tuple(float(x) for x in triple.split("/"))
+    return prices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golden-set token, cost and accuracy benchmark.")
+    parser.add_argument("--providers", default="openai,google")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS,
+                        help="';'-separated configs of key=value pairs (format, hints, pruning, history)")
+    parser.add_argument("--golden", type=Path, default=GOLDEN_DIR / "questions.jsonl")
+    parser.add_argument("--recordings", type=Path, default=GOLDEN_DIR / "recordings.jsonl")
+    parser.add_argument("--schema", type=Path, default=ROOT / "data" / "input" / "neo4j_schema.json")
+    parser.add_argument("--hints", type=Path, default=ROOT / "data" / "input" / "schema_hints.json")
+    parser.add_argument("--live", action="store_true", help="Call the real providers")
+    parser.add_argument("--record", action="store_true",
+                        help="Call the real providers and save their answers as recordings, per config")
+    parser.add_argument("--prices", type=_prices, default=dict(PRICES))
+    parser.add_argument("--output", type=Path, default=None, help="Write results (with per-question rows) as JSON")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    golden = load_jsonl(args.golden)
+    recordings = load_jsonl(args.recordings) if args.recordings.exists() else []
+    configs = [parse_config(text) for text in args.configs.split(";")]
+    providers = [p.strip() for p in args.providers.split(",") if p.strip()]
+
+    async def run_all() -> List[dict]:
+        return [
+            await run_config(provider, config, golden, args, recordings)
+            for provider in providers
+            for config in configs
+        ]
+
+    results = asyncio.run(run_all())
+    if args.record:
+        save_recordings(args.recordings, results, recordings)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+    if args.json:
+        print(json.dumps([{k: v for k, v in r.items() if k != "rows"} for r in results], indent=2))
+        return
+    print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+load_test.py
+Offline load test of the FastAPI app: throughput, latency percentiles and
+memory over a sweep of concurrency levels and session counts.
+
+Every provider is replaced by ``FakeLatencyChatModel`` through
+``benchmarks.fake_app`` (``make_llm`` is swapped before the app is
+imported), so no network access or API keys are needed. The app is driven
+either in-process through httpx's ASGI transport or over HTTP against a
+local uvicorn started for each sweep point (``--target uvicorn``).
+
+Each request picks a session (round robin over ``--sessions``, so histories
+grow), a provider from ``--providers`` weights, ``/api/ask`` or
+``/api/ask/stream`` (``--stream-share``) and a question from a pool of
+``--questions``. The draw is seeded, so runs replay the same mix.
+
+Results are written as JSON with the commit they were measured on
+(``--output``); ``--compare`` prints the change against an earlier file.
+
+Usage
+-----
+python -m benchmarks.load_test --concurrency 8,32,128 --sessions 16,256 --output before.json
+python -m benchmarks.load_test --target uvicorn --workers 2 --compare before.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.multiworker_bench import _free_port, wait_ready  # noqa: E402
+
+QUESTIONS = [
+    "Which genes are associated with {name}?",
+    "List compounds that treat {name}",
+    "How many side effects does {name} cause?",
+    "Which anatomy expresses {name}?",
+    "Show pathways that involve {name}",
+    "What diseases resemble {name}?",
+]
+
+# Rows of two result files are matched on these fields.
+ROW_KEY = ("target", "workers", "concurrency", "sessions")
+
+
+def _weights(value: str) -> Dict[str, float]:
+    """Parse ``openai=0.7,google=0.3``."""
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def _ints(value: str) -> List[int]:
+    return [int(x) for x in value.split(",")]
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(len(ordered) * q + 0.5) - 1))]
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """Resident memory of ``pid`` and its children (Linux /proc only)."""
+    try:
+        pids = [pid]
+        children = Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+        pids += [int(child) for child in children]
+        pages = sum(int(Path(f"/proc/{p}/statm").read_text().split()[1]) for p in pids)
+    except (OSError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _git_commit() -> Dict[str, object]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def _bench_env(args) -> Dict[str, str]:
+    env = {
+        "BENCH_LLM_LATENCY": str(args.latency),
+        "BENCH_LLM_JITTER": str(args.jitter),
+        "BENCH_LLM_CPU_MS": str(args.cpu_ms),
+        "RESPONSE_CACHE_MAX_ENTRIES": "0" if not args.cache else "1000",
+    }
+    for provider, latency in (args.provider_latency or {}).items():
+        env[f"BENCH_LLM_LATENCY_{provider.upper()}"] = str(latency)
+    return env
+
+
+def make_workload(args, sessions: int) -> List[dict]:
+    rng = random.Random(args.seed)
+    providers = list(args.providers)
+    weights = [args.providers[p] for p in providers]
+    workload = []
+    for i in range(args.requests):
+        template = QUESTIONS[rng.randrange(len(QUESTIONS))]
+        workload.append({
+            "path": "/api/ask/stream" if rng.random() < args.stream_share else "/api/ask",
+            "json": {
+                "query": template.format(name=f"item{rng.randrange(args.questions)}"),
+                "session_id": f"load-{sessions}-{i % sessions}",
+                "provider": rng.choices(providers, weights)[0],
+            },
+        })
+    return workload
+
+
+async def drive(client: httpx.AsyncClient, workload: List[dict], concurrency: int) -> dict:
+    latencies: Dict[str, List[float]] = {}
+    statuses: Dict[str, int] = {}
+    queue = iter(workload)
+
+    async def one(request: dict) -> None:
+        start = time.perf_counter()
+        try:
+            # Streams are read to the end: the answer is complete only then.
+            async with client.stream("POST", request["path"], json=request["json"]) as response:
+                body = await response.aread()
+            status = str(response.status_code)
+            if request["path"].endswith("/stream") and b"event: error" in body:
+                status = "stream_error"
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        elapsed = time.perf_counter() - start
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == "200":
+            latencies.setdefault(request["json"]["provider"], []).append(elapsed)
+
+    async def worker() -> None:
+        for request in queue:
+            await one(request)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    ordered = sorted(t for values in latencies.values() for t in values)
+    row = {
+        "requests": len(workload),
+        "ok": statuses.get("200", 0),
+        "errors": {status: count for status, count in statuses.items() if status != "200"},
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(workload) / wall, 1),
+    }
+    for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        row[f"{name}_ms"] = round(_percentile(ordered, q) * 1000, 1)
+    row["max_ms"] = round(ordered[-1] * 1000, 1) if ordered else 0.0
+    row["providers"] = {
+        provider: {
+            "ok": len(values),
+            "p50_ms": round(_percentile(sorted(values), 0.5) * 1000, 1),
+            "p99_ms": round(_percentile(sorted(values), 0.99) * 1000, 1),
+        }
+        for provider, values in sorted(latencies.items())
+    }
+    return row
+
+
+async def warm_up(client: httpx.AsyncClient, providers: List[str]) -> None:
+    """Build each provider's agent before timing."""
+    for provider in providers:
+        await client.post("/api/ask", json={"query": "warm up", "session_id": "warmup", "provider": provider})
+    await client.post("/api/clear", json={"session_id": "warmup"})
+
+
+async def run_inprocess(args, concurrency: int, sessions: int) -> dict:
+    os.environ.update(_bench_env(args))
+    from benchmarks.fake_app import app  # noqa: E402 -- patches make_llm first
+    from src.text2cypher_agent import Text2CypherAgent
+
+    Text2CypherAgent.clear_session_history()
+    gc.collect()
+    rss_before = _rss_bytes(os.getpid())
+    transport = httpx.ASGITransport(app=app)
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120, limits=limits) as client:
+        await warm_up(client, list(args.providers))
+        row = await drive(client, make_workload(args, sessions), concurrency)
+        row["history_bytes"] = (await client.get("/api/session/stats")).json().get("history_bytes")
+    rss_after = _rss_bytes(os.getpid())
+    row["rss_mb"] = round(rss_after / 2**20, 1) if rss_after else None
+    row["rss_growth_mb"] = round((rss_after - rss_before) / 2**20, 1) if rss_after and rss_before else None
+    Text2CypherAgent.clear_session_history()
+    return row
+
+
+async def run_uvicorn(args, concurrency: int, sessions: int) -> dict:
+    port = _free_port()
+    env = {**os.environ, **_bench_env(args)}
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "benchmarks.fake_app:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        await wait_ready(base_url)
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+            for _ in range(args.workers):
+                await warm_up(client, list(args.providers))
+            row = await drive(client, make_workload(args, sessions), concurrency)
+            # With several workers this is one worker's view.
+            row["history_bytes"] = (await client.get("/api/session/stats")).json().get("history_bytes")
+        rss = _rss_bytes(server.pid)
+        row["rss_mb"] = round(rss / 2**20, 1) if rss else None
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return row
+
+
+async def sweep(args) -> List[dict]:
+    # One event loop for the whole sweep: the in-process app's locks and
+    # admission queues bind to the loop they first wait on.
+    run = run_inprocess if args.target == "inprocess" else run_uvicorn
+    workers = args.workers if args.target == "uvicorn" else 1
+    results = []
+    for concurrency in args.concurrency:
+        for sessions in args.sessions:
+            row = await run(args, concurrency, sessions)
+            results.append({"target": args.target, "workers": workers,
+                            "concurrency": concurrency, "sessions": sessions, **row})
+    return results
+
+
+def compare(baseline: dict, current: dict) -> List[dict]:
+    """Per matching row: percentage change of throughput, p50, p99 and RSS."""
+    previous = {tuple(row.get(k) for k in ROW_KEY): row for row in baseline["results"]}
+    changes = []
+    for row in current["results"]:
+        old = previous.get(tuple(row.get(k) for k in ROW_KEY))
+        if old is None:
+            continue
+        change = {k: row.get(k) for k in ROW_KEY}
+        for metric in ("throughput_rps", "p50_ms", "p99_ms", "rss_mb"):
+            if old.get(metric) and row.get(metric) is not None:
+                change[metric] = round((row[metric] - old[metric]) / old[metric] * 100, 1)
+        changes.append(change)
+    return changes
+
+
+def print_table(results: List[dict]) -> None:
+    print(
+        f"{'target':>9} {'conc':>5} {'sess':>6} {'rps':>8} {'p50_ms':>8} {'p90_ms':>8} "
+        f"{'p99_ms':>8} {'errors':>7} {'rss_mb':>8} {'hist_kb':>8}"
+    )
+    for row in results:
+        history_kb = round(row["history_bytes"] / 1024, 1) if row.get("history_bytes") is not None else "-"
+        print(
+            f"{row['target']:>9} {row['concurrency']:>5} {row['sessions']:>6} {row['throughput_rps']:>8} "
+            f"{row['p50_ms']:>8} {row['p90_ms']:>8} {row['p99_ms']:>8} {sum(row['errors'].values()):>7} "
+            f"{str(row['rss_mb'] or '-'):>8} {history_kb:>8}"
+        )
+
+
+def print_comparison(changes: List[dict], baseline: dict) -> None:
+    print(f"\nChange vs {baseline['meta'].get('commit')} (%; higher rps and lower ms are better)")
+    print(f"{'conc':>5} {'sess':>6} {'rps':>8} {'p50':>8} {'p99':>8} {'rss':>8}")
+    for change in changes:
+        cells = [f"{change.get(m, '-'):>8}" for m in ("throughput_rps", "p50_ms", "p99_ms", "rss_mb")]
+        print(f"{change['concurrency']:>5} {change['sessions']:>6} " + " ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the FastAPI app with a fake LLM.")
+    parser.add_argument("--target", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (--target uvicorn)")
+    parser.add_argument("--concurrency", type=_ints, default=[8, 32, 128], help="Concurrent clients")
+    parser.add_argument("--sessions", type=_ints, default=[16, 256], help="Distinct session ids")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per sweep point")
+    parser.add_argument("--questions", type=int, default=200, help="Distinct entity names in questions")
+    parser.add_argument("--providers", type=_weights, default=_weights("openai=0.7,google=0.3"))
+    parser.add_argument("--stream-share", type=float, default=0.2, help="Share of /api/ask/stream requests")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Fake LLM latency jitter (s)")
+    parser.add_argument("--provider-latency", type=_weights, default=None,
+                        help="Per-provider latency override, e.g. google=0.2")
+    parser.add_argument("--cpu-ms", type=float, default=2.0, help="Fake LLM CPU work per call (ms)")
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache on")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path, default=None, help="Write results as JSON")
+    parser.add_argument("--compare", type=Path, default=None, help="Earlier --output file to compare with")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(sweep(args))
+
+    settings = {key: value for key, value in vars(args).items() if key not in ("output", "compare", "json")}
+    report = {
+        "meta": {
+            **_git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": settings,
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, default=str) + "\n")
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_table(results)
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        print_comparison(compare(baseline, report), baseline)
+
+
+if __name__ == "__main__":
+    main()
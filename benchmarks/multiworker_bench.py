@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+multiworker_bench.py
+Measure /api/ask throughput as the number of uvicorn workers grows.
+
+Each run starts ``uvicorn benchmarks.fake_app:app --workers N`` (fake LLM,
+no network), drives it with concurrent HTTP requests and stops it again.
+With ``--redis-url`` the workers share sessions through the Redis session
+store; requests are spread over ``--sessions`` session ids, so several
+workers serve the same session and the leased run lock is exercised.
+
+Usage
+-----
+python -m benchmarks.multiworker_bench --workers 1,2,4 --requests 2000
+python -m benchmarks.multiworker_bench --workers 1,4 --redis-url redis://localhost:6379/0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, args) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "BENCH_LLM_LATENCY": str(args.latency),
+        "BENCH_LLM_CPU_MS": str(args.cpu_ms),
+        "SESSION_STORE": "redis" if args.redis_url else "memory",
+    })
+    if args.redis_url:
+        env["REDIS_URL"] = args.redis_url
+        env["SESSION_STORE_PREFIX"] = f"bench{port}"
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "benchmarks.fake_app:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+async def drive(base_url: str, args) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    failures = 0
+    latencies = []
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def one(i: int) -> None:
+            nonlocal failures
+            payload = {"query": f"question {i}", "session_id": f"bench-{i % args.sessions}"}
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/api/ask", json=payload)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    failures += 1
+
+        # Warm up every worker's agent before timing.
+        await asyncio.gather(*(one(-i - 1) for i in range(args.concurrency)))
+        latencies.clear()
+        failures = 0
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "wall_s": round(elapsed, 3),
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+        "failures": failures,
+    }
+
+
+async def run_one(workers: int, args) -> dict:
+    port = _free_port()
+    server = start_server(workers, port, args)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        await wait_ready(base_url)
+        row = await drive(base_url, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    row["workers"] = workers
+    row["store"] = "redis" if args.redis_url else "memory"
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-worker /api/ask load test.")
+    parser.add_argument(
+        "--workers",
+        type=lambda v: [int(x) for x in v.split(",")],
+        default=[1, 2, 4],
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=128)
+    parser.add_argument("--sessions", type=int, default=256, help="Distinct session ids")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM latency (s)")
+    parser.add_argument("--cpu-ms", type=float, default=5.0, help="CPU work per request (ms)")
+    parser.add_argument("--redis-url", default=None, help="Share sessions through Redis")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run_one(workers, args)) for workers in args.workers]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'workers':>8} {'store':>7} {'wall_s':>8} {'rps':>8} {'p50_ms':>8} {'p99_ms':>8} {'fail':>5}")
+    for row in results:
+        print(
+            f"{row['workers']:>8} {row['store']:>7} {row['wall_s']:>8} {row['throughput_rps']:>8} "
+            f"{row['p50_ms']:>8} {row['p99_ms']:>8} {row['failures']:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+schema_format_bench.py
+Compare schema prompt formats by size and, optionally, time-to-first-token.
+
+Usage
+-----
+python -m benchmarks.schema_format_bench
+python -m benchmarks.schema_format_bench --provider openai --runs 3
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.schema_render import available_formats  # noqa: E402
+from src.text2cypher_agent import build_system_prompt, make_llm  # noqa: E402
+from src.utils import estimate_tokens  # noqa: E402
+
+DEFAULT_QUESTION = "Show compounds that treat both type 2 diabetes mellitus and hypertension."
+
+
+def measure_ttft(provider: str, system_prompt: str, question: str, runs: int) -> list[float]:
+    """Return time-to-first-token samples (seconds) for one system prompt."""
+    llm = make_llm(provider)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _chunk in llm.stream([("system", system_prompt), ("human", question)]):
+            samples.append(time.perf_counter() - start)
+            break
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark schema prompt formats.")
+    parser.add_argument(
+        "--schema",
+        default=str(ROOT / "data" / "input" / "neo4j_schema.json"),
+        help="Path to neo4j_schema.json",
+    )
+    parser.add_argument(
+        "--hints",
+        default=str(ROOT / "data" / "input" / "schema_hints.json"),
+        help="Path to schema_hints.json ('' to skip)",
+    )
+    parser.add_argument("--formats", default=",".join(available_formats()))
+    parser.add_argument(
+        "--provider",
+        choices=["openai", "google"],
+        help="Also measure time-to-first-token against this provider",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--question", default=DEFAULT_QUESTION)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    schema = json.loads(Path(args.schema).read_text(encoding="utf-8"))
+    hints = None
+    if args.hints and Path(args.hints).exists():
+        hints = json.loads(Path(args.hints).read_text(encoding="utf-8"))
+
+    results = []
+    for fmt in [f.strip() for f in args.formats.split(",") if f.strip()]:
+        start = time.perf_counter()
+        prompt = build_system_prompt(schema, hints, fmt)
+        render_ms = (time.perf_counter() - start) * 1000
+        row = {
+            "format": fmt,
+            "chars": len(prompt),
+            "tokens": estimate_tokens(prompt),
+            "render_ms": round(render_ms, 3),
+        }
+        if args.provider:
+            samples = measure_ttft(args.provider, prompt, args.question, args.runs)
+            row["ttft_ms_median"] = round(statistics.median(samples) * 1000, 1)
+            row["ttft_ms_min"] = round(min(samples) * 1000, 1)
+        results.append(row)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    columns = list(results[0]) if results else []
+    print("  ".join(f"{c:>14}" for c in columns))
+    for row in results:
+        print("  ".join(f"{row[c]!s:>14}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
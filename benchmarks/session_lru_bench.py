@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+session_lru_bench.py
+Per-operation cost of the in-memory session store's LRU bookkeeping as the
+number of live sessions grows.
+
+For each size the store is filled to its limit, then a mix of operations is
+timed: reading an existing history, appending to a new session (which
+evicts the oldest), taking a run lock for a new session and registering an
+assistant thread. With ordered LRU maps the cost per operation stays flat;
+``--legacy-max`` also times the previous ``min()``/``sorted()`` scans for
+comparison up to that size.
+
+Usage
+-----
+python -m benchmarks.session_lru_bench --sizes 1000,10000,100000,1000000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.session_store import InMemorySessionStore  # noqa: E402
+
+EXCHANGE = [HumanMessage(content="list genes"), AIMessage(content="MATCH (g:Gene) RETURN g")]
+
+
+class LegacyLRU:
+    """The previous dict + last-used timestamp bookkeeping, for comparison."""
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self.items: Dict[str, list] = {}
+        self.last_used: Dict[str, float] = {}
+
+    def touch(self, session_id: str) -> None:
+        self.last_used[session_id] = time.time()
+        while len(self.items) > self.max_sessions:
+            candidates = [sid for sid in self.last_used if sid != session_id]
+            oldest = min(candidates, key=lambda sid: self.last_used.get(sid, 0))
+            self.items.pop(oldest, None)
+            self.last_used.pop(oldest, None)
+
+    def get(self, session_id: str) -> list:
+        items = self.items.get(session_id)
+        if items is not None:
+            self.touch(session_id)
+        return items
+
+    def append(self, session_id: str, messages) -> None:
+        self.items.setdefault(session_id, []).extend(messages)
+        self.touch(session_id)
+
+    def run_lock(self, session_id: str) -> None:
+        self.items.setdefault(session_id, [])
+        self.last_used[session_id] = time.time()
+        sorted(self.last_used, key=lambda sid: self.last_used.get(sid, 0))
+        self.touch(session_id)
+
+
+def bench_store(size: int, ops: int) -> float:
+    store = InMemorySessionStore(
+        max_sessions=size, max_assistant_sessions=size, max_run_locks=size
+    )
+    for i in range(size):
+        store.append_messages(f"s{i}", EXCHANGE)
+    loop = asyncio.new_event_loop()
+    for i in range(size):
+        loop.run_until_complete(store.get_run_lock(f"s{i}"))
+
+    async def mixed() -> None:
+        for i in range(ops):
+            store.get_messages(f"s{size - 1 - i}")
+            store.append_messages(f"n{i}", EXCHANGE)
+            await store.get_run_lock(f"n{i}")
+            await store.set_assistant_thread(f"n{i}", "thread")
+
+    start = time.perf_counter()
+    loop.run_until_complete(mixed())
+    elapsed = time.perf_counter() - start
+    loop.close()
+    return elapsed / (ops * 4)
+
+
+def bench_legacy(size: int, ops: int) -> float:
+    lru = LegacyLRU(size)
+    for i in range(size):
+        lru.items[f"s{i}"] = list(EXCHANGE)
+        lru.last_used[f"s{i}"] = float(i)
+
+    start = time.perf_counter()
+    for i in range(ops):
+        lru.get(f"s{size - 1 - i}")
+        lru.append(f"n{i}", EXCHANGE)
+        lru.run_lock(f"m{i}")
+    return (time.perf_counter() - start) / (ops * 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session store LRU microbenchmark.")
+    parser.add_argument(
+        "--sizes",
+        type=lambda v: [int(x) for x in v.split(",")],
+        default=[1_000, 10_000, 100_000, 1_000_000],
+    )
+    parser.add_argument("--ops", type=int, default=20_000, help="Timed operations per size")
+    parser.add_argument("--legacy-max", type=int, default=10_000,
+                        help="Largest size to time the old scan-based eviction at")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        row = {"sessions": size, "ordered_ns_per_op": round(bench_store(size, args.ops) * 1e9)}
+        if size <= args.legacy_max:
+            legacy_ops = max(1, min(args.ops, 2_000_000 // size))
+            row["legacy_ns_per_op"] = round(bench_legacy(size, legacy_ops) * 1e9)
+        results.append(row)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'sessions':>10} {'ordered ns/op':>14} {'legacy ns/op':>14}")
+    for row in results:
+        legacy = row.get("legacy_ns_per_op", "-")
+        print(f"{row['sessions']:>10} {row['ordered_ns_per_op']:>14} {legacy:>14}")
+
+
+if __name__ == "__main__":
+    main()
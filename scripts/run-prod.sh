@@ -10,9 +10,12 @@ cd "$SCRIPT_DIR/.."
 
 # Run uvicorn with production settings
 # The --app-dir flag ensures proper module resolution
+# WORKERS > 1 requires a shared session store (SESSION_STORE=redis). Workers may
+# share EXAMPLE_STORE_PATH (file-locked; each sees the others' examples on restart).
 PORT="${PORT:-8000}"
+WORKERS="${WORKERS:-1}"
 
 exec uv run uvicorn src.api_server:app \
     --host 0.0.0.0 \
     --port "$PORT" \
-    --workers 1
+    --workers "$WORKERS"
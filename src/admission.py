@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+admission.py
+Per-provider admission control for LLM calls.
+
+Each provider (``openai``, ``google``, ``assistant``) gets a limit on
+concurrent calls and a bounded FIFO wait queue. A call that finds a free
+slot starts at once; otherwise it waits in the queue, but only up to a
+queue-time deadline. When the queue is full the call is rejected right away
+(429), and when the deadline passes it gives up (503). Both carry a
+``retry_after`` estimated from recent call durations, so excess load is shed
+early instead of piling onto provider rate limits and timing out together.
+
+Settings (environment)
+----------------------
+MAX_CONCURRENT_LLM_CALLS     concurrent calls per provider (default 32, 0 = unlimited)
+MAX_QUEUED_LLM_CALLS         calls allowed to wait per provider (default 64)
+LLM_QUEUE_TIMEOUT_SECONDS    longest wait in the queue (default 10)
+Each can be set per provider with a suffix, e.g. ``MAX_CONCURRENT_LLM_CALLS_GOOGLE``.
+
+Usage
+-----
+from src.admission import get_admission_controller
+async with get_admission_controller("openai").slot():
+    answer = await agent.arespond(question, session_id)
+"""
+
+from __future__ import annotations
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Weight of the latest call in the running average call duration.
+_HOLD_SMOOTHING = 0.2
+
+
+class Saturated(Exception):
+    """The provider is at capacity; retry after ``retry_after`` seconds."""
+
+    def __init__(self, provider: str, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.provider = provider
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded, deadline-limited wait queue."""
+
+    def __init__(
+        self,
+        provider: str,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout_seconds: float,
+    ):
+        self.provider = provider
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.avg_call_seconds = 1.0
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead is likely to have drained."""
+        if not self.max_concurrent:
+            return 1
+        return max(1, math.ceil(self.avg_call_seconds * (self.waiting + 1) / self.max_concurrent))
+
+    def _reject(self, status_code: int, detail: str) -> Saturated:
+        return Saturated(self.provider, status_code, self.retry_after(), detail)
+
+    def check(self) -> None:
+        """Raise :class:`Saturated` (429) now if a call would be rejected."""
+        if self._semaphore is not None and self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise self._reject(429, f"Too many concurrent requests for {self.provider}.")
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one call slot for the block, waiting in the queue if needed."""
+        if self._semaphore is None:
+            yield
+            return
+        if self._semaphore.locked():
+            self.check()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout_seconds)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise self._reject(503, f"Timed out waiting for {self.provider} capacity.")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            held = time.perf_counter() - start
+            self.avg_call_seconds += _HOLD_SMOOTHING * (held - self.avg_call_seconds)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_call_seconds": round(self.avg_call_seconds, 3),
+        }
+
+
+def _setting(name: str, provider: str, default: str) -> str:
+    return os.getenv(f"{name}_{provider.upper()}", os.getenv(name, default))
+
+
+def create_admission_controller(provider: str) -> AdmissionController:
+    """Build a controller from the settings for ``provider``."""
+    return AdmissionController(
+        provider,
+        max_concurrent=max(0, int(_setting("MAX_CONCURRENT_LLM_CALLS", provider, "32"))),
+        max_queue=max(0, int(_setting("MAX_QUEUED_LLM_CALLS", provider, "64"))),
+        queue_timeout_seconds=max(0.0, float(_setting("LLM_QUEUE_TIMEOUT_SECONDS", provider, "10"))),
+    )
+
+
+_CONTROLLERS: Dict[str, AdmissionController] = {}
+
+
+def get_admission_controller(provider: str) -> AdmissionController:
+    """Return the process-wide controller for ``provider``."""
+    controller = _CONTROLLERS.get(provider)
+    if controller is None:
+        controller = _CONTROLLERS[provider] = create_admission_controller(provider)
+    return controller
+
+
+def set_admission_controller(provider: str, controller: AdmissionController) -> None:
+    """Replace a provider's controller (tests, custom limits)."""
+    _CONTROLLERS[provider] = controller
+
+
+def admission_stats() -> Dict[str, Dict[str, float]]:
+    return {provider: controller.stats() for provider, controller in _CONTROLLERS.items()}
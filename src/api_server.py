@@ -4,43 +4,99 @@
 FastAPI service exposing:
 
 - POST /api/ask   – runs Text2CypherAgent with selected provider
+- POST /api/ask/stream     – same, streamed as Server-Sent Events
+- POST /api/ask/batch      – many questions at once, results streamed as NDJSON
+- GET  /api/cache/stats    – response cache hit/miss/eviction counters
+- GET  /api/prompt/stats   – schema pruning token savings per provider
+- GET  /api/session/stats  – session store sizes and history memory use
+- GET  /metrics            – stage latencies, in-flight requests, tokens (Prometheus)
+- POST /api/execute        – runs a query read-only on Neo4j, records as NDJSON
+- POST /api/examples       – keeps a confirmed question/Cypher pair as an example
 - POST /api/assistant/ask  – proxies question to the OpenAI Assistant
 """
 
 import asyncio
+import json
 import logging
 import os
 import re
 import time
-from functools import partial
+import uuid
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from openai import OpenAI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from neo4j.exceptions import Neo4jError
 from pydantic import BaseModel, field_validator
 
-from src.schema_loader import get_schema
-from src.text2cypher_agent import Text2CypherAgent
-from src.utils import get_env_variable
+from src.admission import Saturated, admission_stats, get_admission_controller
+from src.metrics import STAGE_SECONDS, Family, in_flight, render, timed
+from src.query_executor import (
+    QUERY_EXECUTION,
+    ReadOnlyViolation,
+    check_read_only,
+    close_query_executor,
+    get_query_executor,
+)
+from src.response_cache import ResponseCache, make_cache_key
+from src.cypher_validator import get_cypher_validator
+from src.example_store import EXAMPLES_ENABLED, aget_example_store
+from src.hedging import OUTCOMES, create_hedger
+from src.schema_loader import (
+    get_schema,
+    get_schema_snapshot,
+    get_schema_version,
+    publish_schema_snapshot,
+    refresh_schema,
+)
+from src.session_store import get_session_store
+from src.single_flight import SingleFlight
+from src.text2cypher_agent import (
+    QUERY_PREFLIGHT,
+    RepairedAnswer,
+    Text2CypherAgent,
+    aaccept_example,
+    clean_answer,
+    get_prompt_usage,
+    get_provider_model,
+    reset_prompt_usage,
+    set_prompt_usage,
+)
+from src.utils import get_env_variable, parse_bool
+
+if TYPE_CHECKING:
+    # Imported on first use: the SDK is only needed by the Assistant proxy.
+    from openai import AsyncOpenAI
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 # ── FastAPI app ───────────────────────────────────────────────────
-app = FastAPI()
-
-
-def _parse_bool(value: str, default: bool = False) -> bool:
-    normalized = value.strip().lower()
-    if normalized in {"1", "true", "yes", "on"}:
-        return True
-    if normalized in {"0", "false", "no", "off"}:
-        return False
-    return default
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _warmup_task
+    watcher = asyncio.create_task(_watch_schema()) if SCHEMA_RELOAD_SECONDS else None
+    # Read in a thread now rather than by the first request that needs it.
+    examples = asyncio.create_task(aget_example_store()) if EXAMPLES_ENABLED else None
+    if WARMUP_PROVIDERS:
+        # Runs in the background: /health answers right away, /ready once done.
+        _warmup_task = asyncio.create_task(warm_up(WARMUP_PROVIDERS))
+    yield
+    for task in (watcher, examples, _warmup_task):
+        if task is not None and not task.done():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    _warmup_task = None
+    await close_query_executor()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 # ── CORS middleware ─────────────────────────────────────────────────
@@ -65,7 +121,7 @@ cors_headers_raw = get_env_variable(
 cors_headers = [header.strip() for header in cors_headers_raw.split(",") if header.strip()]
 if not cors_headers:
     cors_headers = ["Content-Type", "Authorization", "Accept"]
-cors_allow_credentials = _parse_bool(
+cors_allow_credentials = parse_bool(
     get_env_variable("CORS_ALLOW_CREDENTIALS", default="false"),
     default=False,
 )
@@ -83,29 +139,43 @@ app.add_middleware(
 )
 
 # ── globals guarded by async locks ──────────────────────────────────
-_openai_client: Optional[OpenAI] = None
+_openai_client: Optional["AsyncOpenAI"] = None
 _OPENAI_CLIENT_LOCK = asyncio.Lock()
 
-_ASSISTANT_THREADS: Dict[str, str] = {}
-_ASSISTANT_LAST_USED: Dict[str, float] = {}
-_ASSISTANT_LOCK = asyncio.Lock()
-
-_SESSION_RUN_LOCKS: Dict[str, asyncio.Lock] = {}
-_SESSION_RUN_LAST_USED: Dict[str, float] = {}
-_SESSION_RUN_LOCKS_GUARD = asyncio.Lock()
-
 _AGENT_INSTANCES: Dict[str, Optional[Text2CypherAgent]] = {
     "openai": None,
     "google": None,
 }
 _AGENT_LOCK = asyncio.Lock()
+_warmup_task: Optional[asyncio.Task] = None
 
 _VALID_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
 ASSISTANT_POLL_SECONDS = max(0.2, float(os.getenv("ASSISTANT_POLL_SECONDS", "1.0")))
+ASSISTANT_POLL_MIN_SECONDS = min(
+    ASSISTANT_POLL_SECONDS,
+    max(0.01, float(os.getenv("ASSISTANT_POLL_MIN_SECONDS", "0.05"))),
+)
+ASSISTANT_STREAMING = parse_bool(os.getenv("ASSISTANT_STREAMING", "true"), default=True)
 ASSISTANT_TIMEOUT_SECONDS = max(5.0, float(os.getenv("ASSISTANT_TIMEOUT_SECONDS", "120")))
-ASSISTANT_MAX_SESSIONS = max(1, int(os.getenv("ASSISTANT_MAX_SESSIONS", "200")))
-MAX_SESSION_RUN_LOCKS = max(1, int(os.getenv("MAX_SESSION_RUN_LOCKS", "1000")))
 MAX_QUERY_LENGTH = max(1, int(os.getenv("MAX_QUERY_LENGTH", "10000")))
+BATCH_MAX_ITEMS = max(1, int(os.getenv("BATCH_MAX_ITEMS", "500")))
+BATCH_MAX_CONCURRENCY = max(1, int(os.getenv("BATCH_MAX_CONCURRENCY", "8")))
+RESPONSE_CACHE_MAX_ENTRIES = max(0, int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")))
+RESPONSE_CACHE_TTL_SECONDS = max(0.0, float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")))
+# Identical concurrent questions (same provider, schema and history) share one LLM call.
+SINGLE_FLIGHT = parse_bool(os.getenv("SINGLE_FLIGHT", "true"), default=True)
+SCHEMA_RELOAD_SECONDS = max(0.0, float(os.getenv("SCHEMA_RELOAD_SECONDS", "5")))
+# Providers whose agents are built (and connections opened) at startup.
+WARMUP_PROVIDERS = [p.strip() for p in os.getenv("WARMUP_PROVIDERS", "").split(",") if p.strip()]
+WARMUP_TIMEOUT_SECONDS = max(1.0, float(os.getenv("WARMUP_TIMEOUT_SECONDS", "30")))
+
+_RESPONSE_CACHE = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+)
+_SINGLE_FLIGHT = SingleFlight(enabled=SINGLE_FLIGHT)
+# Opt-in (HEDGING): slow openai/google calls are raced against the other provider.
+_HEDGER = create_hedger()
 
 
 def _validate_session_id(v: str) -> str:
@@ -119,59 +189,36 @@ def _validate_session_id(v: str) -> str:
     return session_id
 
 
-def _evict_oldest_assistant_threads_locked() -> None:
-    """Evict oldest assistant thread entries. Caller must hold _ASSISTANT_LOCK."""
-    while len(_ASSISTANT_THREADS) > ASSISTANT_MAX_SESSIONS:
-        if not _ASSISTANT_LAST_USED:
-            stale_session = next(iter(_ASSISTANT_THREADS), None)
-            if stale_session is None:
-                break
-            _ASSISTANT_THREADS.pop(stale_session, None)
-            continue
-        oldest_session = min(
-            _ASSISTANT_LAST_USED,
-            key=lambda session: _ASSISTANT_LAST_USED.get(session, 0),
-        )
-        _ASSISTANT_THREADS.pop(oldest_session, None)
-        _ASSISTANT_LAST_USED.pop(oldest_session, None)
-
-
-def _evict_session_run_locks_locked(exclude_session_id: Optional[str] = None) -> None:
-    """Best-effort eviction of idle run locks. Caller must hold _SESSION_RUN_LOCKS_GUARD."""
-    while len(_SESSION_RUN_LOCKS) > MAX_SESSION_RUN_LOCKS:
-        if not _SESSION_RUN_LAST_USED:
-            break
-        evicted = False
-        for session_id in sorted(
-            _SESSION_RUN_LAST_USED,
-            key=lambda sid: _SESSION_RUN_LAST_USED.get(sid, 0),
-        ):
-            if exclude_session_id is not None and session_id == exclude_session_id:
-                continue
-            lock = _SESSION_RUN_LOCKS.get(session_id)
-            if lock is None:
-                _SESSION_RUN_LAST_USED.pop(session_id, None)
-                continue
-            if lock.locked():
-                continue
-            _SESSION_RUN_LOCKS.pop(session_id, None)
-            _SESSION_RUN_LAST_USED.pop(session_id, None)
-            evicted = True
-            break
-        if not evicted:
-            break
-
-
-async def get_session_run_lock(session_id: str) -> asyncio.Lock:
-    async with _SESSION_RUN_LOCKS_GUARD:
-        lock = _SESSION_RUN_LOCKS.get(session_id)
-        if lock is None:
-            _evict_session_run_locks_locked(exclude_session_id=session_id)
-            lock = asyncio.Lock()
-            _SESSION_RUN_LOCKS[session_id] = lock
-        _SESSION_RUN_LAST_USED[session_id] = time.time()
-        _evict_session_run_locks_locked(exclude_session_id=session_id)
-        return lock
+async def get_session_run_lock(session_id: str):
+    """Return the per-session run mutex from the session store."""
+    return await get_session_store().get_run_lock(session_id)
+
+
+@asynccontextmanager
+async def _llm_slot(provider: str):
+    """Hold an admission slot for one LLM call, recording the queue wait."""
+    start = time.perf_counter()
+    async with get_admission_controller(provider).slot():
+        STAGE_SECONDS.observe(time.perf_counter() - start, "admission", provider)
+        yield
+
+
+def _busy(exc: Saturated) -> HTTPException:
+    return HTTPException(
+        status_code=exc.status_code,
+        detail=exc.detail,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@asynccontextmanager
+async def _session_run(session_id: str, provider: str):
+    """Hold the session run lock, recording the wait as the ``session_lock`` stage."""
+    session_lock = await get_session_run_lock(session_id)
+    start = time.perf_counter()
+    async with session_lock:
+        STAGE_SECONDS.observe(time.perf_counter() - start, "session_lock", provider)
+        yield
 
 
 async def get_or_create_agent(provider: str = "openai") -> Text2CypherAgent:
@@ -186,19 +233,87 @@ async def get_or_create_agent(provider: str = "openai") -> Text2CypherAgent:
     async with _AGENT_LOCK:
         existing = _AGENT_INSTANCES.get(provider)
         if existing is None:
-            existing = Text2CypherAgent(provider=provider)
+            # Off the event loop: the first agent imports the provider package.
+            existing = await asyncio.to_thread(
+                Text2CypherAgent, provider=provider, snapshot=get_schema_snapshot()
+            )
             _AGENT_INSTANCES[provider] = existing
     return existing
 
 
-async def get_openai_client() -> OpenAI:
+async def warm_up(providers: List[str]) -> Dict[str, float]:
+    """Build agents, prompts, validators and connections before the first request.
+
+    Returns the seconds spent per provider. A provider that fails to warm up
+    is logged and left to be built lazily by its first request.
+    """
+    timings: Dict[str, float] = {}
+    for provider in providers:
+        start = time.perf_counter()
+        try:
+            agent = await asyncio.wait_for(get_or_create_agent(provider), WARMUP_TIMEOUT_SECONDS)
+            await asyncio.wait_for(agent.awarm_up(), WARMUP_TIMEOUT_SECONDS)
+        except Exception:
+            logger.exception("Warm-up failed for provider %s", provider)
+            continue
+        timings[provider] = time.perf_counter() - start
+        logger.info("Warmed up %s in %.0f ms", provider, timings[provider] * 1000)
+    if QUERY_EXECUTION or QUERY_PREFLIGHT:
+        try:
+            executor = await get_query_executor()
+            await asyncio.wait_for(executor.warm_up(), WARMUP_TIMEOUT_SECONDS)
+        except Exception:
+            logger.exception("Warm-up failed for Neo4j")
+    return timings
+
+
+async def reload_schema_if_changed() -> Optional[str]:
+    """Swap in agents for a changed schema file; return the new version, if any.
+
+    New agents (prompt, pruner, validator, LLM) are built off the event loop
+    while the old ones keep serving. Publishing the snapshot and replacing
+    the agents then happens with no await in between, so a request sees
+    either the old version and agents or the new ones. Requests already
+    running keep the agent they started with.
+    """
+    snapshot = await asyncio.to_thread(refresh_schema)
+    if snapshot is None:
+        return None
+
+    async with _AGENT_LOCK:
+        providers = [provider for provider, agent in _AGENT_INSTANCES.items() if agent is not None]
+
+        def build_agents() -> Dict[str, Text2CypherAgent]:
+            get_cypher_validator(snapshot)
+            return {provider: Text2CypherAgent(provider=provider, snapshot=snapshot) for provider in providers}
+
+        agents = await asyncio.to_thread(build_agents)
+        old_version = get_schema_version()
+        publish_schema_snapshot(snapshot)
+        _AGENT_INSTANCES.update(agents)
+    logger.info("Schema reloaded: %s -> %s", old_version, snapshot.version)
+    return snapshot.version
+
+
+async def _watch_schema() -> None:
+    while True:
+        await asyncio.sleep(SCHEMA_RELOAD_SECONDS)
+        try:
+            await reload_schema_if_changed()
+        except Exception:
+            logger.exception("Schema reload failed; keeping the current schema")
+
+
+async def get_openai_client() -> "AsyncOpenAI":
     global _openai_client
     if _openai_client is not None:
         return _openai_client
 
     async with _OPENAI_CLIENT_LOCK:
         if _openai_client is None:
-            _openai_client = OpenAI(
+            from openai import AsyncOpenAI
+
+            _openai_client = AsyncOpenAI(
                 api_key=get_env_variable("OPENAI_API_KEY"),
                 base_url=get_env_variable(
                     "OPENAI_API_BASE_URL", default="https://api.openai.com/v1"
@@ -207,24 +322,19 @@ async def get_openai_client() -> OpenAI:
     return _openai_client
 
 
-async def get_or_create_assistant_thread(session_id: str, client: OpenAI) -> str:
-    loop = asyncio.get_running_loop()
-    async with _ASSISTANT_LOCK:
-        thread_id = _ASSISTANT_THREADS.get(session_id)
-        if thread_id is None:
-            thread = await loop.run_in_executor(None, client.beta.threads.create)
-            thread_id = thread.id
-            _ASSISTANT_THREADS[session_id] = thread_id
-
-        _ASSISTANT_LAST_USED[session_id] = time.time()
-        _evict_oldest_assistant_threads_locked()
-        return thread_id
+async def get_or_create_assistant_thread(session_id: str, client: "AsyncOpenAI") -> str:
+    """Return the session's Assistant thread id. Caller must hold the session run lock."""
+    store = get_session_store()
+    thread_id = await store.get_assistant_thread(session_id)
+    if thread_id is None:
+        thread = await client.beta.threads.create()
+        thread_id = thread.id
+        await store.set_assistant_thread(session_id, thread_id)
+    return thread_id
 
 
 async def delete_assistant_thread(session_id: str) -> None:
-    async with _ASSISTANT_LOCK:
-        _ASSISTANT_THREADS.pop(session_id, None)
-        _ASSISTANT_LAST_USED.pop(session_id, None)
+    await get_session_store().delete_assistant_thread(session_id)
 
 
 # ── request models ────────────────────────────────────────────────────
@@ -257,6 +367,97 @@ class SessionRequest(BaseModel):
         return _validate_session_id(v)
 
 
+class BatchRequest(BaseModel):
+    questions: List[str]
+    provider: Optional[str] = "openai"
+    # "stateless": every item starts from an empty history that is discarded.
+    # "session": item i uses and keeps session "<session_id>-<i>".
+    mode: Literal["stateless", "session"] = "stateless"
+    session_id: Optional[str] = None
+    max_concurrency: Optional[int] = None
+
+    @field_validator("questions")
+    @classmethod
+    def questions_are_valid(cls, v: List[str]) -> List[str]:
+        if not v:
+            raise ValueError("questions cannot be empty")
+        if len(v) > BATCH_MAX_ITEMS:
+            raise ValueError(f"A batch cannot exceed {BATCH_MAX_ITEMS} questions")
+        questions = []
+        for question in v:
+            if not question.strip():
+                raise ValueError("Questions cannot be empty")
+            if len(question) > MAX_QUERY_LENGTH:
+                raise ValueError(f"Questions cannot exceed {MAX_QUERY_LENGTH} characters")
+            questions.append(question.strip())
+        return questions
+
+    @field_validator("session_id")
+    @classmethod
+    def session_id_is_valid(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return v
+        session_id = _validate_session_id(v)
+        if len(session_id) > 100:
+            raise ValueError("batch session_id prefix cannot exceed 100 characters")
+        return session_id
+
+    @field_validator("max_concurrency")
+    @classmethod
+    def max_concurrency_is_positive(cls, v: Optional[int]) -> Optional[int]:
+        if v is not None and v < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        return v
+
+
+class ExecuteRequest(BaseModel):
+    query: str
+    parameters: Optional[Dict[str, Any]] = None
+    max_rows: Optional[int] = None
+    # The standalone question the query answers: a run that returns rows
+    # accepts the pair as a few-shot example.
+    question: Optional[str] = None
+
+    @field_validator("query")
+    @classmethod
+    def query_not_empty(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError("Query cannot be empty")
+        if len(v) > MAX_QUERY_LENGTH:
+            raise ValueError(f"Query cannot exceed {MAX_QUERY_LENGTH} characters")
+        return v.strip()
+
+    @field_validator("max_rows")
+    @classmethod
+    def max_rows_is_positive(cls, v: Optional[int]) -> Optional[int]:
+        if v is not None and v < 1:
+            raise ValueError("max_rows must be at least 1")
+        return v
+
+    @field_validator("question")
+    @classmethod
+    def question_is_valid(cls, v: Optional[str]) -> Optional[str]:
+        if v is None or not v.strip():
+            return None
+        if len(v) > MAX_QUERY_LENGTH:
+            raise ValueError(f"Question cannot exceed {MAX_QUERY_LENGTH} characters")
+        return v.strip()
+
+
+class ExampleRequest(BaseModel):
+    question: str
+    cypher: str
+
+    @field_validator("question", "cypher")
+    @classmethod
+    def text_is_valid(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError("Text cannot be empty")
+        if len(v) > MAX_QUERY_LENGTH:
+            raise ValueError(f"Text cannot exceed {MAX_QUERY_LENGTH} characters")
+        return v.strip()
+
+
 # --------------------------------------------------------------------
 # Health check endpoints
 # --------------------------------------------------------------------
@@ -268,13 +469,17 @@ async def health_check():
 
 @app.get("/ready", tags=["ops"])
 async def readiness_check():
-    """Readiness check - verifies schema is loaded."""
+    """Readiness check - verifies schema is loaded and warm-up has finished."""
+    if _warmup_task is not None and not _warmup_task.done():
+        raise HTTPException(status_code=503, detail="Warming up")
     try:
         schema = get_schema()
         return {
             "ready": True,
+            "schema_version": get_schema_version(),
             "node_types": len(schema.get("NodeTypes", {})),
             "relationship_types": len(schema.get("RelationshipTypes", {})),
+            "session_store": get_session_store().stats()["backend"],
         }
     except Exception:
         logger.exception("Readiness check failed")
@@ -285,18 +490,221 @@ async def readiness_check():
 # Schema endpoint
 # --------------------------------------------------------------------
 @app.get("/api/schema", tags=["schema"])
-async def fetch_schema():
-    """Return the cached Neo4j schema JSON."""
+async def fetch_schema(response: Response):
+    """Return the cached Neo4j schema JSON, with the active schema version
+    in the ``X-Schema-Version`` and ``ETag`` headers."""
     try:
-        return get_schema()
+        snapshot = get_schema_snapshot()
+        response.headers["X-Schema-Version"] = snapshot.version
+        response.headers["ETag"] = f'"{snapshot.version}"'
+        return snapshot.schema
     except Exception:
         logger.exception("Schema fetch failed")
         raise HTTPException(status_code=500, detail="Schema unavailable")
 
 
+@app.get("/api/cache/stats", tags=["ops"])
+async def response_cache_stats():
+    """Return response cache and single-flight counters."""
+    return {**_RESPONSE_CACHE.stats(), "single_flight": _SINGLE_FLIGHT.stats()}
+
+
+@app.get("/api/session/stats", tags=["ops"])
+async def session_store_stats():
+    """Return session store sizes, including approximate history memory use."""
+    return get_session_store().stats()
+
+
+@app.get("/api/prompt/stats", tags=["ops"])
+async def prompt_stats():
+    """Return schema pruning counters for every agent created so far."""
+    return {
+        provider: agent.prompt_stats()
+        for provider, agent in _AGENT_INSTANCES.items()
+        if agent is not None
+    }
+
+
+# Session store stats keys per map: (entries, evictions).
+_SESSION_STORE_MAPS = {
+    "histories": ("history_sessions", "session_evictions"),
+    "assistant_threads": ("assistant_threads", "assistant_thread_evictions"),
+    "run_locks": ("run_locks", "run_lock_evictions"),
+}
+
+
+def _state_families() -> List[Family]:
+    """Session store and response cache state, read at scrape time."""
+    families = []
+    store = get_session_store().stats()
+    if store["backend"] == "memory":
+        entries = Family("text2cypher_session_store_entries", "gauge", "Entries per session store map.")
+        evictions = Family(
+            "text2cypher_session_store_evictions_total",
+            "counter",
+            "Entries evicted per session store map (history_bytes: over the byte budget).",
+        )
+        for name, (size_key, evictions_key) in _SESSION_STORE_MAPS.items():
+            entries.add(store[size_key], map=name)
+            evictions.add(store[evictions_key], map=name)
+        evictions.add(store["byte_evictions"], map="history_bytes")
+        history_bytes = Family(
+            "text2cypher_session_history_bytes", "gauge", "Approximate size of stored histories."
+        )
+        families += [entries, evictions, history_bytes.add(store["history_bytes"])]
+
+    cache = _RESPONSE_CACHE.stats()
+    events = Family("text2cypher_response_cache_events_total", "counter", "Response cache lookups and removals.")
+    for event in ("hits", "misses", "evictions", "expirations"):
+        events.add(cache[event], event=event)
+    entries = Family("text2cypher_response_cache_entries", "gauge", "Cached answers.")
+    flight = _SINGLE_FLIGHT.stats()
+    coalesced = Family(
+        "text2cypher_single_flight_total", "counter", "LLM calls led, and requests that joined one in flight."
+    )
+    coalesced.add(flight["leaders"], role="leader").add(flight["followers"], role="follower")
+    families += [entries.add(cache["size"]), events, coalesced]
+
+    calls = Family("text2cypher_llm_calls", "gauge", "LLM calls running or waiting for a slot.")
+    shed = Family("text2cypher_llm_calls_shed_total", "counter", "LLM calls refused by admission control.")
+    for provider, stats in admission_stats().items():
+        calls.add(stats["active"], provider=provider, state="active")
+        calls.add(stats["waiting"], provider=provider, state="waiting")
+        shed.add(stats["rejected"], provider=provider, reason="queue_full")
+        shed.add(stats["timed_out"], provider=provider, reason="queue_timeout")
+    families += [calls, shed]
+
+    hedges = Family("text2cypher_hedges_total", "counter", "Hedged LLM calls by primary provider and outcome.")
+    delay = Family("text2cypher_hedge_delay_seconds", "gauge", "Current wait before a hedged call is sent.")
+    for primary, stats in _HEDGER.stats().items():
+        for outcome in OUTCOMES:
+            hedges.add(stats[outcome], primary=primary, outcome=outcome)
+        delay.add(stats["delay_seconds"], primary=primary)
+    families += [hedges, delay]
+    return families
+
+
+@app.get("/metrics", tags=["ops"], response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms, in-flight gauges, token counters and store
+    sizes in the Prometheus text exposition format."""
+    return PlainTextResponse(render(_state_families()), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # --------------------------------------------------------------------
 # LLM agent endpoint
 # --------------------------------------------------------------------
+async def _lookup_cached_answer(provider: str, query: str, session_id: str) -> tuple:
+    """Return ``(cache_key, cached)``. Caller must hold the session run lock.
+
+    ``cached`` is ``(answer, provider)`` on a hit, where ``answer`` is the raw
+    model answer as history keeps it and ``provider`` answered
+    originally (the hedge partner when it won the race), else None. On a hit
+    the exchange is appended to the session history tagged with that
+    provider. The key also identifies the request for single-flight; it is
+    None when both the cache and single-flight are off.
+    """
+    if not _RESPONSE_CACHE.enabled and not _SINGLE_FLIGHT.enabled:
+        return None, None
+    cache_key = make_cache_key(
+        provider,
+        get_provider_model(provider),
+        query,
+        get_schema_version(),
+        await Text2CypherAgent.aget_session_history(session_id),
+    )
+    cached = _RESPONSE_CACHE.get(cache_key)
+    if cached is not None:
+        answer, answered_by = cached
+        await Text2CypherAgent.aappend_external_exchange(
+            session_id,
+            query,
+            answer,
+            provider=answered_by,
+        )
+        if _HEDGER.enabled:
+            set_prompt_usage({"provider": answered_by})
+    return cache_key, cached
+
+
+async def _recorded_answer(session_id: str, fallback: str) -> str:
+    """The answer the agent just appended to the session history, raw as
+    :meth:`Text2CypherAgent.respond` keeps it; ``fallback`` if there is none.
+
+    Only valid under the session run lock, so the last message is ours.
+    """
+    history = await Text2CypherAgent.aget_session_history(session_id)
+    if history and history[-1]["role"] == "assistant" and history[-1]["content"]:
+        return history[-1]["content"]
+    return fallback
+
+
+def _usage_fields() -> dict:
+    """Token counts (and the plan cost verdict, with QUERY_PREFLIGHT, and the
+    answering provider, with HEDGING) of the request just answered in this
+    context; no token counts on cache hits."""
+    usage = get_prompt_usage()
+    if usage is None:
+        return {}
+    fields = {}
+    if "prompt_tokens" in usage:
+        fields["prompt_tokens"] = usage["prompt_tokens"]
+    if "cached_input_tokens" in usage:
+        fields["cached_prompt_tokens"] = usage["cached_input_tokens"]
+    if "cost" in usage:
+        fields["cost"] = usage["cost"]
+    if "provider" in usage:
+        fields["provider"] = usage["provider"]
+    return fields
+
+
+async def generate_answer(provider: str, query: str, session_id: str) -> str:
+    """Answer one question for a session, serialized by the session run lock."""
+    reset_prompt_usage()
+    async with _session_run(session_id, provider):
+        # Look up before taking the agent: across a schema reload the key's
+        # version is then never newer than the agent's.
+        cache_key, cached = await _lookup_cached_answer(provider, query, session_id)
+        if cached is not None:
+            return clean_answer(cached[0])
+
+        with timed("agent", provider):
+            agent = await get_or_create_agent(provider)
+
+        async def generate(name: str) -> tuple:
+            # Runs in its own task when hedged, so the usage travels back with it.
+            leg_agent = agent if name == provider else await get_or_create_agent(name)
+            async with _llm_slot(name):
+                # Only the provider's own time feeds the hedge delay, not the queue wait.
+                with _HEDGER.measure(name, censored=name == provider):
+                    return await leg_agent.agenerate(query, session_id), get_prompt_usage()
+
+        async def answer() -> tuple:
+            # Shared and cached in the raw form history keeps, so every
+            # session that gets this answer stores the same text.
+            if not _HEDGER.enabled:
+                async with _llm_slot(provider):
+                    cypher = await agent.arespond(query, session_id)
+                if cache_key is None:
+                    return cypher, provider
+                return await _recorded_answer(session_id, cypher), provider
+            (raw, usage), winner = await _HEDGER.race(provider, generate, timed=False)
+            if usage is not None:
+                usage["provider"] = winner
+            set_prompt_usage(usage)
+            # Only the winning answer is kept, tagged with the provider that wrote it.
+            await Text2CypherAgent.aappend_external_exchange(session_id, query, raw, provider=winner)
+            return raw, winner
+
+        (raw, winner), shared = await _SINGLE_FLIGHT.do(cache_key, answer)
+        cypher = clean_answer(raw)
+        if shared:
+            await Text2CypherAgent.aappend_external_exchange(session_id, query, raw, provider=winner)
+        elif cache_key is not None and cypher:
+            _RESPONSE_CACHE.put(cache_key, (raw, winner))
+    return cypher
+
+
 @app.post("/api/ask", tags=["llm-agent"])
 async def ask_llm_agent(req: QueryRequest):
     provider = req.provider or "openai"
@@ -304,15 +712,11 @@ async def ask_llm_agent(req: QueryRequest):
         raise HTTPException(status_code=400, detail=f"Invalid provider: {provider}")
 
     try:
-        session_lock = await get_session_run_lock(req.session_id)
-        async with session_lock:
-            agent = await get_or_create_agent(provider)
-            loop = asyncio.get_running_loop()
-            cypher = await loop.run_in_executor(
-                None,
-                partial(agent.respond, req.query, req.session_id),
-            )
-        return {"answer": cypher}
+        with in_flight("ask"), timed("total", provider):
+            cypher = await generate_answer(provider, req.query, req.session_id)
+        return {"answer": cypher, **_usage_fields()}
+    except Saturated as exc:
+        raise _busy(exc)
     except HTTPException:
         raise
     except Exception:
@@ -320,6 +724,138 @@ async def ask_llm_agent(req: QueryRequest):
         raise HTTPException(status_code=500, detail="Failed to generate Cypher query.")
 
 
+@app.post("/api/ask/batch", tags=["llm-agent"])
+async def ask_llm_agent_batch(req: BatchRequest):
+    """Translate many questions concurrently, streaming NDJSON as items finish.
+
+    Each line is ``{"index", "question", "answer" | "error", "elapsed_ms"}``
+    (plus ``"session_id"`` in session mode), in completion order.
+    """
+    provider = req.provider or "openai"
+    if provider not in ["openai", "google"]:
+        raise HTTPException(status_code=400, detail=f"Invalid provider: {provider}")
+
+    limit = min(req.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(limit)
+    prefix = req.session_id or f"batch-{uuid.uuid4().hex[:12]}"
+
+    async def run_item(index: int, question: str) -> dict:
+        if req.mode == "session":
+            session_id = f"{prefix}-{index}"
+        else:
+            session_id = f"batch-{uuid.uuid4().hex}"
+        item = {"index": index, "question": question}
+        if req.mode == "session":
+            item["session_id"] = session_id
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                with in_flight("ask_batch_item"):
+                    item["answer"] = await generate_answer(provider, question, session_id)
+            except Saturated as exc:
+                item["error"] = exc.detail
+                item["retry_after"] = exc.retry_after
+            except Exception:
+                logger.exception("Batch item failed", extra={"index": index})
+                item["error"] = "Failed to generate Cypher query."
+            finally:
+                if req.mode == "stateless":
+                    await Text2CypherAgent.aclear_session_history(session_id)
+            item["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return item
+
+    async def lines():
+        tasks = [
+            asyncio.create_task(run_item(index, question))
+            for index, question in enumerate(req.questions)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/ask/stream", tags=["llm-agent"])
+async def ask_llm_agent_stream(req: QueryRequest):
+    """Stream the answer as Server-Sent Events.
+
+    Emits ``token`` events (``{"text": ...}``) as the model generates, then a
+    final ``done`` event with the full answer, or an ``error`` event. A
+    ``replace`` event (``{"text": ...}``) before ``done`` means the streamed
+    query was repaired (schema validation) or regenerated (cost preflight);
+    it replaces all tokens. A full provider queue is refused with 429 before
+    the stream starts; a queue timeout ends it with an ``error`` event that
+    carries ``retry_after``.
+    """
+    provider = req.provider or "openai"
+    if provider not in ["openai", "google"]:
+        raise HTTPException(status_code=400, detail=f"Invalid provider: {provider}")
+    try:
+        get_admission_controller(provider).check()
+    except Saturated as exc:
+        raise _busy(exc)
+
+    async def events():
+        reset_prompt_usage()
+        try:
+            with in_flight("ask_stream"), timed("total", provider):
+                async with _session_run(req.session_id, provider):
+                    cache_key, cached = await _lookup_cached_answer(provider, req.query, req.session_id)
+                    answer, answered_by = cached or (None, provider)
+                    if answer is None:
+                        # Resolved before follow(): nothing may await between
+                        # follow() and lead(), or two streams could both lead.
+                        with timed("agent", provider):
+                            agent = await get_or_create_agent(provider)
+                        shared, result = await _SINGLE_FLIGHT.follow(cache_key)
+                        if shared:
+                            answer, answered_by = result
+                            await Text2CypherAgent.aappend_external_exchange(
+                                req.session_id, req.query, answer, provider=answered_by
+                            )
+                    if answer is not None:
+                        answer = clean_answer(answer)
+                        yield _sse("token", {"text": answer})
+                    else:
+                        parts = []
+                        async with _SINGLE_FLIGHT.lead(cache_key) as call, _llm_slot(provider):
+                            async for text in agent.astream(req.query, req.session_id):
+                                if isinstance(text, RepairedAnswer):
+                                    # The streamed query was repaired or regenerated; send the final one.
+                                    parts = [text]
+                                    yield _sse("replace", {"text": text})
+                                    continue
+                                parts.append(text)
+                                yield _sse("token", {"text": text})
+                            answer = "".join(parts)
+                            raw = answer
+                            if cache_key is not None:
+                                raw = await _recorded_answer(req.session_id, answer)
+                            call.result = (raw, provider)
+                        if cache_key is not None and answer:
+                            _RESPONSE_CACHE.put(cache_key, (raw, provider))
+                yield _sse("done", {"answer": answer, "provider": answered_by, **_usage_fields()})
+        except Saturated as exc:
+            yield _sse("error", {"detail": exc.detail, "retry_after": exc.retry_after})
+        except Exception:
+            logger.exception("LLM agent stream failed")
+            yield _sse("error", {"detail": "Failed to generate Cypher query."})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/api/history", tags=["shared"])
 async def get_shared_history(session_id: str):
     """Return conversation history with provider info for a session."""
@@ -327,7 +863,7 @@ async def get_shared_history(session_id: str):
         session_id = _validate_session_id(session_id)
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=str(exc))
-    return {"history": Text2CypherAgent.get_session_history(session_id)}
+    return {"history": await Text2CypherAgent.aget_session_history(session_id)}
 
 
 @app.post("/api/clear", tags=["shared"])
@@ -335,91 +871,235 @@ async def clear_shared_history(req: SessionRequest):
     """Clear chat history and assistant thread for one session."""
     session_lock = await get_session_run_lock(req.session_id)
     async with session_lock:
-        Text2CypherAgent.clear_session_history(req.session_id)
+        await Text2CypherAgent.aclear_session_history(req.session_id)
         await delete_assistant_thread(req.session_id)
-    async with _SESSION_RUN_LOCKS_GUARD:
-        _SESSION_RUN_LAST_USED[req.session_id] = time.time()
-        _evict_session_run_locks_locked(exclude_session_id=req.session_id)
     return {"status": "cleared"}
 
 
 # --------------------------------------------------------------------
-# OpenAI Assistant endpoint
+# Query execution endpoint
 # --------------------------------------------------------------------
-@app.post("/api/assistant/ask", tags=["assistant"])
-async def ask_assistant(req: QueryRequest):
-    """Send a question to the OpenAI Assistant (stateful)."""
+@app.post("/api/execute", tags=["neo4j"])
+async def execute_query(req: ExecuteRequest):
+    """Run a query read-only on Neo4j and stream the records as NDJSON.
+
+    Lines are ``{"columns"}``, one ``{"row"}`` per record and a final
+    ``{"done", "rows", "truncated", "timed_out", "elapsed_ms"}``; a failure
+    part-way ends the stream with ``{"error"}``. Enabled with
+    ``QUERY_EXECUTION=true``; rows and time are capped by ``EXECUTE_MAX_ROWS``
+    and ``EXECUTE_TIMEOUT_SECONDS``.
+    """
+    if not QUERY_EXECUTION:
+        raise HTTPException(status_code=404, detail="Query execution is disabled.")
     try:
-        session_lock = await get_session_run_lock(req.session_id)
-        async with session_lock:
-            assistant_id = get_env_variable("OPENAI_ASSISTANT_ID")
-            client = await get_openai_client()
+        check_read_only(req.query)
+    except ReadOnlyViolation as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    try:
+        executor = await get_query_executor()
+    except Exception:
+        logger.exception("Neo4j driver unavailable")
+        raise HTTPException(status_code=503, detail="Neo4j is not available.")
+
+    async def lines():
+        item: Dict[str, Any] = {}
+        try:
+            with in_flight("execute"), timed("execute", "neo4j"):
+                async for item in executor.stream(req.query, req.parameters, req.max_rows):
+                    yield json.dumps(item, default=str) + "\n"
+            # Ran to the end and found something: the question's answer is accepted.
+            if req.question and item.get("rows") and not item.get("timed_out"):
+                await aaccept_example(req.question, req.query)
+        except Neo4jError as exc:
+            # Server errors (syntax, timeout, access mode) are useful to the user.
+            logger.warning("Query execution failed: %s", exc.code)
+            yield json.dumps({"error": exc.message or "Query failed.", "code": exc.code}) + "\n"
+        except Exception:
+            logger.exception("Query execution failed")
+            yield json.dumps({"error": "Failed to execute query."}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/api/examples", tags=["llm-agent"])
+async def accept_example(req: ExampleRequest):
+    """Keep a question and its confirmed Cypher as a few-shot example.
+
+    ``stored`` is false when the Cypher fails the schema check or the same
+    answer is already stored. 404 unless FEW_SHOT_EXAMPLES or
+    EXAMPLE_DIRECT_RETURN is set.
+    """
+    if not EXAMPLES_ENABLED:
+        raise HTTPException(status_code=404, detail="Few-shot examples are disabled.")
+    return {"stored": await aaccept_example(req.question, req.cypher)}
 
-            loop = asyncio.get_running_loop()
-            thread_id = await get_or_create_assistant_thread(req.session_id, client)
 
-            await loop.run_in_executor(
-                None,
-                partial(
-                    client.beta.threads.messages.create,
-                    thread_id=thread_id,
-                    role="user",
-                    content=req.query,
-                ),
+# --------------------------------------------------------------------
+# OpenAI Assistant endpoint
+# --------------------------------------------------------------------
+_ASSISTANT_RUN_ACTIVE = ("queued", "in_progress", "cancelling")
+# Status codes meaning the endpoint does not support streamed runs. A 400 is
+# an ordinary request error (e.g. the thread already has an active run) and
+# must not turn streaming off for the whole process.
+_STREAMING_UNSUPPORTED_STATUS = {404, 405, 501}
+_assistant_streaming_supported = True
+
+
+def _assistant_message_text(message) -> str:
+    parts = []
+    for block in getattr(message, "content", None) or []:
+        text = getattr(block, "text", None)
+        if getattr(block, "type", "text") == "text" and text is not None:
+            parts.append(text.value)
+    return "".join(parts).strip()
+
+
+async def _run_assistant_streaming(
+    client: "AsyncOpenAI",
+    thread_id: str,
+    assistant_id: str,
+    run_ids: list,
+) -> str:
+    """Create a streamed run and collect the assistant messages it completes."""
+    stream = await client.beta.threads.runs.create(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        stream=True,
+    )
+    answer = ""
+    async for event in stream:
+        name = event.event
+        data = event.data
+        if name == "thread.run.created":
+            run_ids.append(data.id)
+        elif name == "thread.message.completed":
+            if getattr(data, "role", None) == "assistant":
+                answer = _assistant_message_text(data) or answer
+        elif name == "thread.run.completed":
+            return answer or "No response from assistant."
+        elif name in (
+            "thread.run.failed",
+            "thread.run.cancelled",
+            "thread.run.expired",
+            "thread.run.incomplete",
+            "thread.run.requires_action",
+        ):
+            logger.error("Assistant run did not complete", extra={"status": name})
+            raise HTTPException(status_code=502, detail="Assistant run failed.")
+        elif name == "error":
+            logger.error("Assistant stream error", extra={"error": str(data)})
+            raise HTTPException(status_code=502, detail="Assistant run failed.")
+    raise HTTPException(status_code=502, detail="Assistant run failed.")
+
+
+async def _run_assistant_polling(
+    client: "AsyncOpenAI",
+    thread_id: str,
+    assistant_id: str,
+    run_ids: list,
+) -> str:
+    """Create a run and poll it with exponential backoff.
+
+    Polling starts at ASSISTANT_POLL_MIN_SECONDS and doubles up to
+    ASSISTANT_POLL_SECONDS, so short runs are noticed within milliseconds.
+    """
+    run = await client.beta.threads.runs.create(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+    )
+    run_ids.append(run.id)
+    delay = ASSISTANT_POLL_MIN_SECONDS
+    while run.status in _ASSISTANT_RUN_ACTIVE:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, ASSISTANT_POLL_SECONDS)
+        run = await client.beta.threads.runs.retrieve(run.id, thread_id=thread_id)
+
+    if run.status != "completed":
+        logger.error("Assistant run did not complete", extra={"status": run.status})
+        raise HTTPException(status_code=502, detail="Assistant run failed.")
+
+    msgs = await client.beta.threads.messages.list(
+        thread_id=thread_id,
+        run_id=run.id,
+        order="desc",
+    )
+    for msg in msgs.data:
+        if msg.role != "assistant":
+            continue
+        text = _assistant_message_text(msg)
+        if text:
+            return text
+    return "No response from assistant."
+
+
+async def _run_assistant(
+    client: "AsyncOpenAI",
+    thread_id: str,
+    assistant_id: str,
+    run_ids: list,
+) -> str:
+    global _assistant_streaming_supported
+    from openai import APIStatusError
+
+    if ASSISTANT_STREAMING and _assistant_streaming_supported:
+        try:
+            return await _run_assistant_streaming(client, thread_id, assistant_id, run_ids)
+        except APIStatusError as exc:
+            if run_ids or exc.status_code not in _STREAMING_UNSUPPORTED_STATUS:
+                raise
+            logger.warning(
+                "Assistant run streaming unavailable (HTTP %s); falling back to polling",
+                exc.status_code,
             )
+            _assistant_streaming_supported = False
+    return await _run_assistant_polling(client, thread_id, assistant_id, run_ids)
 
-            run = await loop.run_in_executor(
-                None,
-                partial(
-                    client.beta.threads.runs.create,
-                    thread_id=thread_id,
-                    assistant_id=assistant_id,
-                ),
+
+async def _ask_assistant(req: QueryRequest) -> dict:
+    """Answer one Assistant question, holding the session run lock."""
+    async with _session_run(req.session_id, "assistant"), _llm_slot("assistant"):
+        assistant_id = get_env_variable("OPENAI_ASSISTANT_ID")
+        client = await get_openai_client()
+        with timed("assistant_thread", "assistant"):
+            thread_id = await get_or_create_assistant_thread(req.session_id, client)
+            await client.beta.threads.messages.create(
+                thread_id=thread_id,
+                role="user",
+                content=req.query,
             )
 
-            deadline = time.monotonic() + ASSISTANT_TIMEOUT_SECONDS
-            while run.status in ("queued", "in_progress"):
-                if time.monotonic() >= deadline:
-                    raise HTTPException(status_code=504, detail="Assistant request timed out.")
-
-                await asyncio.sleep(ASSISTANT_POLL_SECONDS)
-                run = await loop.run_in_executor(
-                    None,
-                    partial(
-                        client.beta.threads.runs.retrieve,
-                        thread_id=thread_id,
-                        run_id=run.id,
-                    ),
+        run_ids: list = []
+        try:
+            with timed("assistant_run", "assistant"):
+                answer = await asyncio.wait_for(
+                    _run_assistant(client, thread_id, assistant_id, run_ids),
+                    timeout=ASSISTANT_TIMEOUT_SECONDS,
                 )
+        except asyncio.TimeoutError:
+            for run_id in run_ids:
+                try:
+                    await client.beta.threads.runs.cancel(run_id, thread_id=thread_id)
+                except Exception:
+                    logger.warning("Failed to cancel timed-out assistant run", exc_info=True)
+            raise HTTPException(status_code=504, detail="Assistant request timed out.")
+
+        await Text2CypherAgent.aappend_external_exchange(
+            req.session_id,
+            req.query,
+            answer,
+            provider="assistant",
+        )
+    return {"answer": answer}
 
-            if run.status != "completed":
-                logger.error("Assistant run did not complete", extra={"status": run.status})
-                raise HTTPException(status_code=502, detail="Assistant run failed.")
-
-            msgs = await loop.run_in_executor(
-                None,
-                partial(client.beta.threads.messages.list, thread_id=thread_id),
-            )
-
-            answer = "No response from assistant."
-            for msg in msgs.data:
-                if msg.role != "assistant":
-                    continue
-                run_id = getattr(msg, "run_id", None)
-                if run_id and run_id != run.id:
-                    continue
-                if msg.content:
-                    answer = msg.content[0].text.value.strip()
-                    break
-
-            Text2CypherAgent.append_external_exchange(
-                req.session_id,
-                req.query,
-                answer,
-                provider="assistant",
-            )
-        return {"answer": answer}
 
+@app.post("/api/assistant/ask", tags=["assistant"])
+async def ask_assistant(req: QueryRequest):
+    """Send a question to the OpenAI Assistant (stateful)."""
+    try:
+        with in_flight("assistant"), timed("total", "assistant"):
+            return await _ask_assistant(req)
+    except Saturated as exc:
+        raise _busy(exc)
     except HTTPException:
         raise
     except Exception:
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+cypher_validator.py
+Local, schema-aware sanity check for generated Cypher.
+
+A small tokenizer turns the query into identifiers, literals and
+punctuation; node and relationship patterns are then read off the token
+stream and every label, relationship type and property is checked against
+the schema, including the direction given by each relationship's
+``_endpoints``. The label/relationship index is built once per schema
+version. This is not a full Cypher parser: constructs it does not
+understand are skipped rather than reported.
+
+Usage
+-----
+from src.cypher_validator import get_cypher_validator
+result = get_cypher_validator().validate("MATCH (d:Disease)-[:TREATS_CtD]->(c:Compound) RETURN c")
+result.ok, result.errors
+"""
+
+from __future__ import annotations
+import difflib
+import re
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from src.schema_loader import SchemaSnapshot, get_schema, get_schema_version
+
+_TOKEN = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |(?P<comment>//[^\n]*|/\*.*?\*/)
+    |(?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+    |(?P<quoted>`(?:[^`]|``)*`)
+    |(?P<param>\$\w+)
+    |(?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    |(?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<range>\.\.)
+    |(?P<punct><>|<=|>=|=~|\+=|[-<>()\[\]{}:,.|*=+/%^;&!])
+    |(?P<unterminated>['"`])
+    |(?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Words before "(" that start a pattern rather than call a function.
+_KEYWORDS = frozenset(
+    """
+    MATCH OPTIONAL WHERE AND OR XOR NOT WITH RETURN MERGE CREATE DELETE DETACH
+    SET REMOVE UNWIND AS IN CALL YIELD UNION ALL ON CASE WHEN THEN ELSE END
+    ORDER BY SKIP LIMIT DISTINCT EXISTS FOREACH
+    """.split()
+)
+# Words before "{" that open a subquery rather than a map.
+_SUBQUERY_OPENERS = frozenset({"CALL", "EXISTS", "COUNT", "COLLECT"})
+_CLAUSE_START = frozenset({"MATCH", "OPTIONAL", "WITH", "RETURN", "UNWIND", "CALL", "MERGE", "CREATE"})
+_UNKNOWN_ENDPOINT = "Unknown"
+
+
+class Token(NamedTuple):
+    kind: str
+    value: str
+    pos: int
+
+
+def tokenize(query: str) -> Tuple[List[Token], List[str]]:
+    """Return the significant tokens of ``query`` and any lexical errors."""
+    tokens: List[Token] = []
+    errors: List[str] = []
+    for match in _TOKEN.finditer(query):
+        kind = match.lastgroup
+        value = match.group()
+        if kind in ("ws", "comment"):
+            continue
+        if kind == "unterminated":
+            errors.append(f"Unterminated {value} quote at position {match.start()}")
+            break
+        if kind == "quoted":
+            kind, value = "ident", value[1:-1].replace("``", "`")
+        tokens.append(Token(kind, value, match.start()))
+    return tokens, errors
+
+
+def looks_like_cypher(text: str) -> bool:
+    """True when ``text`` starts with a Cypher clause (not a clarifying question)."""
+    tokens, _ = tokenize(text[:64])
+    return bool(tokens) and tokens[0].kind == "ident" and tokens[0].value.upper() in _CLAUSE_START
+
+
+@dataclass
+class ValidationResult:
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+@dataclass
+class _Node:
+    var: Optional[str]
+    labels: List[str]
+    pos: int
+
+
+@dataclass
+class _Rel:
+    var: Optional[str]
+    types: List[str]
+    direction: str  # "right", "left" or "none"
+    left: _Node
+    right: Optional[_Node] = None
+
+
+def _pattern_text(labels: Iterable[str]) -> str:
+    labels = list(labels)
+    return f"(:{'|'.join(labels)})" if labels else "()"
+
+
+class _PatternReader:
+    """Single pass over the tokens collecting patterns and property accesses."""
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.nodes: List[_Node] = []
+        self.rels: List[_Rel] = []
+        self.label_refs: List[Tuple[str, int]] = []
+        self.prop_refs: List[Tuple[str, str]] = []  # (variable, property)
+        self.map_keys: List[Tuple[object, str]] = []  # (_Node | _Rel, key)
+
+    def _at(self, idx: int) -> Optional[Token]:
+        return self.tokens[idx] if 0 <= idx < len(self.tokens) else None
+
+    def _is(self, idx: int, value: str) -> bool:
+        token = self._at(idx)
+        return token is not None and token.kind != "string" and token.value == value
+
+    def _is_ident(self, idx: int) -> bool:
+        token = self._at(idx)
+        return token is not None and token.kind == "ident"
+
+    def run(self) -> None:
+        braces: List[str] = []
+        idx = 0
+        while idx < len(self.tokens):
+            token = self.tokens[idx]
+            if token.value == "(" and token.kind == "punct" and not self._is_call(idx):
+                end = self._read_path(idx)
+                if end is not None:
+                    idx = end
+                    continue
+            if token.kind == "punct" and token.value == "{":
+                prev = self._at(idx - 1)
+                opener = prev is not None and prev.kind == "ident" and prev.value.upper() in _SUBQUERY_OPENERS
+                braces.append("query" if opener else "map")
+            elif token.kind == "punct" and token.value == "}" and braces:
+                braces.pop()
+            elif token.kind == "ident" and self._is(idx + 1, ".") and self._is_ident(idx + 2):
+                if not self._is(idx - 1, "."):
+                    self.prop_refs.append((token.value, self.tokens[idx + 2].value))
+                idx += 3
+                continue
+            elif (
+                token.kind == "ident"
+                and self._is(idx + 1, ":")
+                and self._is_ident(idx + 2)
+                and "map" not in braces
+            ):
+                # Label predicate such as ``WHERE n:Disease``.
+                self.label_refs.append((self.tokens[idx + 2].value, self.tokens[idx + 2].pos))
+                idx += 3
+                continue
+            idx += 1
+
+    def _is_call(self, idx: int) -> bool:
+        prev = self._at(idx - 1)
+        return prev is not None and prev.kind == "ident" and prev.value.upper() not in _KEYWORDS
+
+    def _skip_group(self, idx: int, open_: str, close: str) -> Optional[int]:
+        depth = 0
+        while idx < len(self.tokens):
+            if self._is(idx, open_):
+                depth += 1
+            elif self._is(idx, close):
+                depth -= 1
+                if depth == 0:
+                    return idx + 1
+            idx += 1
+        return None
+
+    def _read_map(self, idx: int, owner) -> Optional[int]:
+        """Record the keys of a ``{key: value}`` property map; return the index after it."""
+        end = self._skip_group(idx, "{", "}")
+        if end is None:
+            return None
+        depth = 0
+        for pos in range(idx, end):
+            if self._is(pos, "{") or self._is(pos, "[") or self._is(pos, "("):
+                depth += 1
+            elif self._is(pos, "}") or self._is(pos, "]") or self._is(pos, ")"):
+                depth -= 1
+            elif depth == 1 and self._is_ident(pos) and self._is(pos + 1, ":"):
+                self.map_keys.append((owner, self.tokens[pos].value))
+        return end
+
+    def _read_names(self, idx: int, separators: Tuple[str, ...]) -> Tuple[List[str], int]:
+        """Read ``:A|B:C&D`` style label or type expressions."""
+        names: List[str] = []
+        while self._is(idx, ":") or (names and any(self._is(idx, sep) for sep in separators)):
+            idx += 1
+            while self._is(idx, "!") or self._is(idx, ":"):
+                idx += 1
+            if not self._is_ident(idx):
+                break
+            names.append(self.tokens[idx].value)
+            idx += 1
+        return names, idx
+
+    def _read_node(self, idx: int) -> Optional[Tuple[_Node, int]]:
+        if not self._is(idx, "("):
+            return None
+        pos = idx + 1
+        var = None
+        if self._is_ident(pos) and not self._is(pos + 1, "."):
+            var = self.tokens[pos].value
+            pos += 1
+        labels, pos = self._read_names(pos, ("|", "&"))
+        node = _Node(var, labels, self.tokens[idx].pos)
+        if self._is(pos, "{"):
+            pos = self._read_map(pos, node)
+            if pos is None:
+                return None
+        if self._is_ident(pos) and self.tokens[pos].value.upper() == "WHERE":
+            end = self._skip_group(idx, "(", ")")
+            return (node, end) if end is not None else None
+        if not self._is(pos, ")"):
+            return None
+        return node, pos + 1
+
+    def _read_rel(self, idx: int, left: _Node) -> Optional[Tuple[_Rel, int]]:
+        pos = idx
+        left_arrow = self._is(pos, "<")
+        if left_arrow:
+            pos += 1
+        if not self._is(pos, "-"):
+            return None
+        pos += 1
+        var, types = None, []
+        if self._is(pos, "["):
+            bracket = pos
+            pos += 1
+            if self._is_ident(pos) and not self._is(pos + 1, "."):
+                var = self.tokens[pos].value
+                pos += 1
+            types, pos = self._read_names(pos, ("|",))
+            rel = _Rel(var, types, "none", left)
+            while pos < len(self.tokens) and not (self._is(pos, "{") or self._is(pos, "]")):
+                pos += 1
+            if self._is(pos, "{"):
+                self._read_map(pos, rel)
+            end = self._skip_group(bracket, "[", "]")
+            if end is None or not self._is(end, "-"):
+                return None
+            pos = end + 1
+        else:
+            rel = _Rel(None, [], "none", left)
+            if not self._is(pos, "-"):
+                return None
+            pos += 1
+        right_arrow = self._is(pos, ">")
+        if right_arrow:
+            pos += 1
+        if left_arrow and not right_arrow:
+            rel.direction = "left"
+        elif right_arrow and not left_arrow:
+            rel.direction = "right"
+        return rel, pos
+
+    def _read_path(self, idx: int) -> Optional[int]:
+        read = self._read_node(idx)
+        if read is None:
+            return None
+        node, pos = read
+        self.nodes.append(node)
+        while True:
+            rel_read = self._read_rel(pos, node)
+            if rel_read is None:
+                return pos
+            rel, rel_end = rel_read
+            node_read = self._read_node(rel_end)
+            if node_read is None:
+                return pos
+            node, pos = node_read
+            rel.right = node
+            self.nodes.append(node)
+            self.rels.append(rel)
+
+
+class CypherValidator:
+    """Checks queries against one schema; build once per schema version."""
+
+    def __init__(self, schema: dict):
+        self.label_props: Dict[str, Set[str]] = {
+            label: set(props or {}) for label, props in (schema.get("NodeTypes") or {}).items()
+        }
+        self.rel_props: Dict[str, Set[str]] = {}
+        self.rel_endpoints: Dict[str, Tuple[str, str]] = {}
+        self.adjacency: Dict[Tuple[str, str], Set[str]] = {}
+        for rel_type, props in (schema.get("RelationshipTypes") or {}).items():
+            props = dict(props or {})
+            endpoints = props.pop("_endpoints", None)
+            self.rel_props[rel_type] = set(props)
+            if isinstance(endpoints, (list, tuple)) and len(endpoints) == 2:
+                source, target = endpoints
+                self.rel_endpoints[rel_type] = (source, target)
+                self.adjacency.setdefault((source, target), set()).add(rel_type)
+
+    @staticmethod
+    def _suggest(name: str, candidates: Iterable[str]) -> str:
+        matches = difflib.get_close_matches(name, list(candidates), n=3, cutoff=0.6)
+        return f" (did you mean {', '.join(matches)}?)" if matches else ""
+
+    def _endpoint_fits(self, rel_type: str, source: Set[str], target: Set[str]) -> Optional[bool]:
+        endpoints = self.rel_endpoints.get(rel_type)
+        if endpoints is None or _UNKNOWN_ENDPOINT in endpoints:
+            return None
+        return (not source or endpoints[0] in source) and (not target or endpoints[1] in target)
+
+    def _connecting(self, source: Set[str], target: Set[str]) -> List[str]:
+        return sorted(
+            rel_type
+            for (src, dst), rel_types in self.adjacency.items()
+            if src in source and dst in target
+            for rel_type in rel_types
+        )
+
+    def validate(self, query: str) -> ValidationResult:
+        tokens, errors = tokenize(query)
+        reader = _PatternReader(tokens)
+        reader.run()
+
+        node_labels: Dict[str, Set[str]] = {}
+        rel_types: Dict[str, Set[str]] = {}
+        for node in reader.nodes:
+            if node.var and node.labels:
+                node_labels.setdefault(node.var, set()).update(node.labels)
+        for rel in reader.rels:
+            if rel.var and rel.types:
+                rel_types.setdefault(rel.var, set()).update(rel.types)
+
+        seen: Set[str] = set()
+
+        def report(message: str) -> None:
+            if message not in seen:
+                seen.add(message)
+                errors.append(message)
+
+        label_refs = [(label, node.pos) for node in reader.nodes for label in node.labels]
+        for label, _ in label_refs + reader.label_refs:
+            if label not in self.label_props:
+                report(f"Unknown node label :{label}{self._suggest(label, self.label_props)}")
+        for rel in reader.rels:
+            for rel_type in rel.types:
+                if rel_type not in self.rel_props:
+                    report(
+                        f"Unknown relationship type :{rel_type}"
+                        f"{self._suggest(rel_type, self.rel_props)}"
+                    )
+
+        def labels_of(node: _Node) -> Set[str]:
+            labels = set(node.labels) or node_labels.get(node.var or "", set())
+            return {label for label in labels if label in self.label_props}
+
+        for rel in reader.rels:
+            known = [t for t in rel.types if t in self.rel_endpoints]
+            if not known or rel.right is None:
+                continue
+            left, right = labels_of(rel.left), labels_of(rel.right)
+            if not left and not right:
+                continue
+            if rel.direction == "left":
+                source, target = right, left
+            else:
+                source, target = left, right
+            fits = [self._endpoint_fits(t, source, target) for t in known]
+            if rel.direction == "none":
+                fits = [
+                    fit or self._endpoint_fits(t, target, source)
+                    for t, fit in zip(known, fits)
+                ]
+            if any(fit is None or fit for fit in fits):
+                continue
+            arrow = "<-" if rel.direction == "left" else "-"
+            tail = "->" if rel.direction == "right" else "-"
+            written = f"{_pattern_text(sorted(left))}{arrow}[:{'|'.join(known)}]{tail}{_pattern_text(sorted(right))}"
+            expected = "; ".join(
+                f"(:{self.rel_endpoints[t][0]})-[:{t}]->(:{self.rel_endpoints[t][1]})" for t in known
+            )
+            message = f"{written} does not match the schema, which has {expected}"
+            options = self._connecting(source, target)
+            if rel.direction != "none" and not options:
+                source, target = target, source
+                options = self._connecting(source, target)
+            if options:
+                message += (
+                    f" (relationships from {'|'.join(sorted(source))} to "
+                    f"{'|'.join(sorted(target))}: {', '.join(options)})"
+                )
+            report(message)
+
+        def check_property(owner_kind: str, names: Set[str], prop: str) -> None:
+            table = self.label_props if owner_kind == "node" else self.rel_props
+            known = [name for name in names if name in table]
+            if not known:
+                return
+            available = set().union(*(table[name] for name in known))
+            if prop not in available:
+                report(
+                    f"Property {prop} is not defined on :{'|'.join(sorted(known))}"
+                    f"{self._suggest(prop, available)}"
+                )
+
+        for owner, key in reader.map_keys:
+            if isinstance(owner, _Node):
+                check_property("node", labels_of(owner), key)
+            else:
+                check_property("rel", set(owner.types) or rel_types.get(owner.var or "", set()), key)
+        for var, prop in reader.prop_refs:
+            if var in node_labels:
+                check_property("node", node_labels[var], prop)
+            elif var in rel_types:
+                check_property("rel", rel_types[var], prop)
+
+        return ValidationResult(errors)
+
+
+_VALIDATORS: Dict[str, CypherValidator] = {}
+_VALIDATORS_LOCK = Lock()
+_MAX_VALIDATORS = 2
+
+
+def get_cypher_validator(snapshot: Optional[SchemaSnapshot] = None) -> CypherValidator:
+    """Return the validator for a schema snapshot (default: the active one).
+
+    Validators are built once per schema version; the previous version is
+    kept while agents built for it finish their requests after a reload.
+    """
+    version = snapshot.version if snapshot is not None else get_schema_version()
+    validator = _VALIDATORS.get(version)
+    if validator is not None:
+        return validator
+    with _VALIDATORS_LOCK:
+        validator = _VALIDATORS.get(version)
+        if validator is None:
+            validator = CypherValidator(snapshot.schema if snapshot is not None else get_schema())
+            _VALIDATORS[version] = validator
+            while len(_VALIDATORS) > _MAX_VALIDATORS:
+                del _VALIDATORS[next(iter(_VALIDATORS))]
+    return validator
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+example_store.py
+Few-shot examples retrieved from past question/Cypher pairs.
+
+Accepted answers are kept as examples: standalone questions whose Cypher
+passes the schema check and was confirmed, by a run that returned rows or by
+the user (``aaccept_example`` in the agent module). A BM25 index over the
+questions finds the past questions most similar to a new one; the agent sends
+them to the LLM as example exchanges ahead of the conversation. With direct return enabled, a
+near-exact repeat of a stored question is answered from the store.
+
+The index is updated in place as examples are added: postings, document
+frequencies and lengths are running totals, so nothing is ever rebuilt.
+A search scores query terms rarest first and stops opening new candidates
+once the remaining terms cannot lift one into the top k (MaxScore). Very
+common terms only open candidates from their champion list (the documents
+where they weigh most), which bounds the work per term and keeps lookups
+under a millisecond at 100k examples.
+
+Examples are appended to a JSON Lines file and read back at startup; a
+newer answer to the same question replaces the older one. Once the file holds
+more superseded lines than live ones (and at least ``_COMPACT_MIN_SUPERSEDED``),
+it is rewritten with the latest line per question. The server loads the store
+and writes to it off the event loop (``aget_example_store``, ``ExampleStore.aadd``).
+
+Several worker processes may share one file: appends, loads and compaction
+hold an exclusive ``flock`` on ``<file>.lock``, compaction works from the file
+(so other workers' lines are kept) through a per-process temporary file, and
+a worker whose handle points at a replaced file reopens it before writing.
+Each worker only searches the examples it loaded or added itself; the others'
+arrive at its next start.
+
+Settings (environment)
+----------------------
+FEW_SHOT_EXAMPLES              examples added to each prompt (default 0 = off)
+EXAMPLE_DIRECT_RETURN          answer a near-exact repeat without an LLM call (default false)
+EXAMPLE_DIRECT_MIN_SIMILARITY  word overlap needed for that, 0-1 (default 1.0)
+EXAMPLE_STORE_PATH             JSON Lines file (default data/output/examples.jsonl;
+                               empty keeps examples in memory only)
+
+Usage
+-----
+from src.example_store import get_example_store
+store = get_example_store()
+store.add("Which genes are linked to asthma?", "MATCH (g:Gene)-[:ASSOCIATED_WITH]->...")
+examples = store.search("genes associated with asthma", k=3)
+store = await aget_example_store()    # from async code: loads in a thread
+"""
+
+from __future__ import annotations
+import asyncio
+import heapq
+import json
+import logging
+import math
+import os
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock, RLock
+from typing import Dict, Iterator, List, Optional, Set, TextIO
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, one worker only.
+    fcntl = None
+
+from dotenv import load_dotenv
+
+from src.response_cache import normalize_question
+from src.schema_pruner import stem, tokenize
+from src.utils import get_project_root, parse_bool
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+FEW_SHOT_EXAMPLES = max(0, int(os.getenv("FEW_SHOT_EXAMPLES", "0")))
+EXAMPLE_DIRECT_RETURN = parse_bool(os.getenv("EXAMPLE_DIRECT_RETURN", "false"))
+EXAMPLE_DIRECT_MIN_SIMILARITY = min(1.0, max(0.0, float(os.getenv("EXAMPLE_DIRECT_MIN_SIMILARITY", "1.0"))))
+# Examples are only collected when something uses them.
+EXAMPLES_ENABLED = bool(FEW_SHOT_EXAMPLES) or EXAMPLE_DIRECT_RETURN
+
+# BM25 parameters.
+_K1 = 1.2
+_B = 0.75
+# Terms in more documents than this open candidates only from their champion list.
+_CHAMPION_MIN_DF = 1024
+_CHAMPIONS = 256
+# Superseded lines in the file, or removed slots in the index, before either
+# may be compacted.
+_COMPACT_MIN_SUPERSEDED = 1000
+
+_WORD = re.compile(r"\w+")
+
+
+def _words(text: str) -> Set[str]:
+    """Stemmed words with no stopwords removed ("how many" and "list" differ)."""
+    return {stem(word) for word in _WORD.findall(text.lower())}
+
+
+@dataclass(frozen=True)
+class Example:
+    question: str
+    cypher: str
+    schema_version: Optional[str] = None
+    score: float = 0.0
+
+
+class ExampleStore:
+    """Question/Cypher pairs with an incrementally updated BM25 index."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._lock = RLock()
+        self._examples: List[Optional[Example]] = []
+        self._terms: List[Dict[str, int]] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # Per common term: min-heap of (weight at insertion, doc id).
+        self._champions: Dict[str, List[tuple]] = {}
+        self._by_question: Dict[str, int] = {}
+        self._total_length = 0
+        # File lines no longer live (replaced, repeated or unreadable).
+        self._superseded = 0
+        # Index slots of replaced examples, dropped by _reindex.
+        self._removed = 0
+        self._file: Optional[TextIO] = None
+        self._lock_file: Optional[TextIO] = None
+        self._file_lock = Lock()
+        self.added = 0
+        self.searches = 0
+        self.direct_matches = 0
+        if path is not None and path.exists():
+            with self._shared_file():
+                self._load(path)
+                self._maybe_compact()
+
+    def __len__(self) -> int:
+        return len(self._by_question)
+
+    def _load(self, path: Path) -> None:
+        if not path.exists():
+            return
+        skipped = 0
+        with path.open(encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    item = json.loads(line)
+                    if not self._add(Example(item["question"], item["cypher"], item.get("schema_version"))):
+                        self._superseded += 1
+                except (ValueError, KeyError, TypeError):
+                    skipped += 1
+        self._superseded += skipped
+        if skipped:
+            logger.warning("Skipped %d unreadable lines in %s", skipped, path)
+        logger.info("Loaded %d examples from %s", len(self), path)
+
+    def add(self, question: str, cypher: str, schema_version: Optional[str] = None) -> bool:
+        """Store an example; False when the same answer is already stored."""
+        example = Example(question.strip(), cypher.strip(), schema_version)
+        with self._lock:
+            if not self._add(example):
+                return False
+            self.added += 1
+        self._persist(example)
+        return True
+
+    async def aadd(self, question: str, cypher: str, schema_version: Optional[str] = None) -> bool:
+        """:meth:`add` for async code: the file write runs in a thread."""
+        example = Example(question.strip(), cypher.strip(), schema_version)
+        with self._lock:
+            if not self._add(example):
+                return False
+            self.added += 1
+        if self.path is not None:
+            await asyncio.to_thread(self._persist, example)
+        return True
+
+    def _add(self, example: Example) -> bool:
+        key = normalize_question(example.question)
+        old = self._by_question.get(key)
+        if old is not None:
+            if self._examples[old].cypher == example.cypher:
+                return False
+            self._remove(old)
+            self._superseded += 1
+        terms: Dict[str, int] = {}
+        for term in tokenize(example.question):
+            terms[term] = terms.get(term, 0) + 1
+        doc = len(self._examples)
+        length = sum(terms.values())
+        self._examples.append(example)
+        self._terms.append(terms)
+        self._lengths.append(length)
+        self._by_question[key] = doc
+        self._total_length += length
+        avg_length = self._total_length / len(self)
+        for term, tf in terms.items():
+            posting = self._postings.setdefault(term, {})
+            posting[doc] = tf
+            if len(posting) >= _CHAMPION_MIN_DF // 2:
+                self._offer_champion(term, doc, self._weight(tf, length, avg_length))
+        if self._removed >= max(_COMPACT_MIN_SUPERSEDED, len(self)):
+            self._reindex()
+        return True
+
+    def _reindex(self) -> None:
+        """Rebuild the index over the live examples, renumbered from 0, so
+        replaced examples do not keep a slot forever."""
+        live = [example for example in self._examples if example is not None]
+        self._examples, self._terms, self._lengths = [], [], []
+        self._postings, self._champions, self._by_question = {}, {}, {}
+        self._total_length = 0
+        self._removed = 0
+        for example in live:
+            self._add(example)
+
+    def _offer_champion(self, term: str, doc: int, weight: float) -> None:
+        heap = self._champions.get(term)
+        if heap is None:
+            # Seed from the full posting list the first time the term gets common.
+            avg_length = self._total_length / len(self)
+            heap = self._champions[term] = [
+                (self._weight(tf, self._lengths[d], avg_length), d)
+                for d, tf in self._postings[term].items()
+            ]
+            heapq.heapify(heap)
+            while len(heap) > _CHAMPIONS:
+                heapq.heappop(heap)
+            return
+        if len(heap) < _CHAMPIONS:
+            heapq.heappush(heap, (weight, doc))
+        elif weight > heap[0][0]:
+            heapq.heapreplace(heap, (weight, doc))
+
+    def _remove(self, doc: int) -> None:
+        # Champion entries of removed documents are skipped at search time.
+        for term in self._terms[doc]:
+            posting = self._postings[term]
+            del posting[doc]
+            if not posting:
+                del self._postings[term]
+                self._champions.pop(term, None)
+        self._total_length -= self._lengths[doc]
+        del self._by_question[normalize_question(self._examples[doc].question)]
+        self._examples[doc] = None
+        self._terms[doc] = {}
+        self._lengths[doc] = 0
+        self._removed += 1
+
+    @staticmethod
+    def _line(example: Example) -> str:
+        return json.dumps(
+            {"question": example.question, "cypher": example.cypher, "schema_version": example.schema_version},
+            ensure_ascii=False,
+        )
+
+    @contextmanager
+    def _shared_file(self) -> Iterator[None]:
+        """Hold this process's file lock and the cross-process ``flock``."""
+        with self._file_lock:
+            if self._lock_file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._lock_file = self.path.with_name(self.path.name + ".lock").open("a")
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _append_handle(self) -> TextIO:
+        """The append handle, reopened if another process replaced the file."""
+        if self._file is not None:
+            try:
+                current = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current != os.fstat(self._file.fileno()).st_ino:
+                self._file.close()
+                self._file = None
+        if self._file is None:
+            self._file = self.path.open("a", encoding="utf-8")
+        return self._file
+
+    def _persist(self, example: Example) -> None:
+        if self.path is None:
+            return
+        try:
+            with self._shared_file():
+                fh = self._append_handle()
+                fh.write(self._line(example) + "\n")
+                fh.flush()
+                self._maybe_compact()
+        except OSError:
+            logger.exception("Could not write example to %s", self.path)
+
+    def _maybe_compact(self) -> None:
+        """Rewrite the file with the latest line per question once it is mostly
+        superseded. Caller holds :meth:`_shared_file`.
+
+        The file, not this process's index, is the source, so lines other
+        workers appended are kept.
+        """
+        with self._lock:
+            if self._superseded < max(_COMPACT_MIN_SUPERSEDED, len(self)):
+                return
+        latest: Dict[str, str] = {}
+        lines = 0
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with self.path.open(encoding="utf-8") as fh:
+                for line in fh:
+                    lines += 1
+                    try:
+                        key = normalize_question(json.loads(line)["question"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    latest.pop(key, None)
+                    latest[key] = line if line.endswith("\n") else line + "\n"
+            with tmp.open("w", encoding="utf-8") as fh:
+                fh.writelines(latest.values())
+            os.replace(tmp, self.path)
+        except OSError:
+            logger.exception("Could not compact %s", self.path)
+            return
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        with self._lock:
+            self._superseded = 0
+        logger.info("Compacted %s: %d lines kept of %d", self.path, len(latest), lines)
+
+    @staticmethod
+    def _weight(tf: int, length: int, avg_length: float) -> float:
+        """BM25 term-frequency part (multiply by the term's IDF)."""
+        return tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * length / avg_length))
+
+    def search(self, question: str, k: int = 3) -> List[Example]:
+        """Return up to ``k`` stored examples most similar to ``question``."""
+        with self._lock:
+            self.searches += 1
+            count = len(self)
+            if not count or k <= 0:
+                return []
+            avg_length = self._total_length / count
+            idf = {}
+            for term in set(tokenize(question)):
+                df = len(self._postings.get(term, ()))
+                if df:
+                    idf[term] = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            order = sorted(idf, key=idf.get, reverse=True)
+            remaining = sum(idf.values()) * (_K1 + 1)
+            scores: Dict[int, float] = {}
+            for term in order:
+                posting = self._postings[term]
+                term_idf = idf[term]
+                if len(scores) >= k and heapq.nlargest(k, scores.values())[-1] >= remaining:
+                    # No document outside the current candidates can reach the top k.
+                    candidates = [(doc, posting[doc]) for doc in scores if doc in posting]
+                elif len(posting) > _CHAMPION_MIN_DF and term in self._champions:
+                    candidates = [(doc, posting[doc]) for _, doc in self._champions[term] if doc in posting]
+                    candidates += [(doc, posting[doc]) for doc in scores if doc in posting]
+                    candidates = list(dict(candidates).items())
+                else:
+                    candidates = posting.items()
+                for doc, tf in candidates:
+                    scores[doc] = scores.get(doc, 0.0) + term_idf * self._weight(tf, self._lengths[doc], avg_length)
+                remaining -= term_idf * (_K1 + 1)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            results = []
+            for doc, score in best:
+                example = self._examples[doc]
+                results.append(Example(example.question, example.cypher, example.schema_version, round(score, 4)))
+            return results
+
+    def match(self, question: str, min_similarity: float = 1.0) -> Optional[Example]:
+        """Return the stored example for a near-exact repeat of ``question``.
+
+        Similarity is the overlap (Jaccard) of the stemmed words, stopwords
+        included, between ``question`` and the best BM25 hit.
+        """
+        with self._lock:
+            doc = self._by_question.get(normalize_question(question))
+            if doc is not None:
+                self.direct_matches += 1
+                return self._examples[doc]
+            hits = self.search(question, k=1)
+            if not hits:
+                return None
+            asked, stored = _words(question), _words(hits[0].question)
+            if not asked or len(asked & stored) / len(asked | stored) < min_similarity:
+                return None
+            self.direct_matches += 1
+            return hits[0]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "examples": len(self),
+                "added": self.added,
+                "superseded_lines": self._superseded,
+                "terms": len(self._postings),
+                "searches": self.searches,
+                "direct_matches": self.direct_matches,
+            }
+
+    def close(self) -> None:
+        with self._file_lock:
+            for fh in (self._file, self._lock_file):
+                if fh is not None:
+                    fh.close()
+            self._file = self._lock_file = None
+
+
+def create_example_store() -> ExampleStore:
+    raw_path = os.getenv("EXAMPLE_STORE_PATH", "data/output/examples.jsonl").strip()
+    if not raw_path:
+        return ExampleStore()
+    path = Path(raw_path).expanduser()
+    if not path.is_absolute():
+        path = get_project_root() / path
+    return ExampleStore(path)
+
+
+_STORE: Optional[ExampleStore] = None
+_STORE_LOCK = Lock()
+
+
+def get_example_store() -> ExampleStore:
+    """Return the process-wide example store (loaded on first use)."""
+    global _STORE
+    if _STORE is not None:
+        return _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = create_example_store()
+    return _STORE
+
+
+async def aget_example_store() -> ExampleStore:
+    """:func:`get_example_store` for async code: the first load runs in a thread."""
+    if _STORE is not None:
+        return _STORE
+    return await asyncio.to_thread(get_example_store)
+
+
+def set_example_store(store: ExampleStore) -> None:
+    """Replace the process-wide example store (tests, embedding)."""
+    global _STORE
+    with _STORE_LOCK:
+        _STORE = store
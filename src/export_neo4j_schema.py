@@ -1,5 +1,9 @@
 import argparse
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from neo4j import GraphDatabase
 import sys
@@ -17,9 +21,34 @@ def _sort_schema(d: dict[str, dict[str, str]]) -> dict[str, dict[str, str]]:
     """
     return {lbl: dict(sorted(props.items())) for lbl, props in sorted(d.items())}
 
+@contextmanager
+def _phase(name: str, timings: dict[str, float]):
+    """Time one export phase and print its duration."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+        print(f"  {name:<24} {timings[name]:7.2f}s")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Export Neo4j schema.")
     parser.add_argument("--output_dir", required=True, help="Path to store neo4j_schema.json")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Diff against the existing neo4j_schema.json, keep its endpoints while "
+             "they still exist, and rewrite the file only if something changed",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4,
+        help="Parallel sessions for endpoint sampling (default: 4)",
+    )
+    parser.add_argument(
+        "--batch_size", type=int, default=50,
+        help="Relationship types sampled per query (default: 50)",
+    )
     args = parser.parse_args()
 
     try:
@@ -32,27 +61,96 @@ def main():
         raise SystemExit(1)
 
     auth = (db_user, db_password) if db_user and db_password else None
-    driver = GraphDatabase.driver(uri, auth=auth)
+    workers = max(1, args.workers)
+    driver = GraphDatabase.driver(uri, auth=auth, max_connection_pool_size=workers + 2)
 
     output_dir = Path(args.output_dir).expanduser().resolve()
     output_dir.mkdir(parents=True, exist_ok=True)
+    out_path = output_dir / "neo4j_schema.json"
+    previous = load_existing_schema(out_path) if args.incremental else None
 
+    timings: dict[str, float] = {}
+    total_start = time.perf_counter()
+    print("Exporting schema:")
     try:
-        with driver.session(database=db_name) as session:
-            node_schema = get_node_schema(session)
-            rel_schema  = get_relationship_schema(session)
-
-            # sort keys for deterministic output
-            node_schema = _sort_schema(node_schema)
-            rel_schema  = _sort_schema(rel_schema)
+        with _phase("schema properties", timings):
+            # Node and relationship property procedures run side by side.
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                nodes = pool.submit(_in_session, driver, db_name, get_node_schema)
+                rels = pool.submit(_in_session, driver, db_name, get_relationship_properties)
+                node_schema, rel_schema = nodes.result(), rels.result()
+        with _phase("endpoint sampling", timings):
+            known = (previous or {}).get("RelationshipTypes", {})
+            endpoints = sample_endpoints(
+                driver,
+                db_name,
+                list(rel_schema),
+                previous={rtype: props.get("_endpoints") for rtype, props in known.items()},
+                batch_size=max(1, args.batch_size),
+                workers=workers,
+            )
+        for rtype, pair in endpoints.items():
+            rel_schema[rtype]["_endpoints"] = pair
     finally:
         driver.close()
 
-    schema = {"NodeTypes": node_schema, "RelationshipTypes": rel_schema}
-    out_path = output_dir / "neo4j_schema.json"
+    # sort keys for deterministic output
+    schema = {"NodeTypes": _sort_schema(node_schema), "RelationshipTypes": _sort_schema(rel_schema)}
+    with _phase("write", timings):
+        if previous is not None and previous == schema:
+            written = False
+        else:
+            if previous is not None:
+                for line in diff_schemas(previous, schema):
+                    print(f"    {line}")
+            write_schema(out_path, schema)
+            written = True
+    print(f"  {'total':<24} {time.perf_counter() - total_start:7.2f}s")
+    if written:
+        print(f"Schema dumped → {out_path}")
+    else:
+        print(f"Schema unchanged → {out_path}")
+
+
+def _in_session(driver, db_name, fn):
+    with driver.session(database=db_name) as session:
+        return fn(session)
+
+
+def load_existing_schema(path: Path) -> dict | None:
+    """Return the previously exported schema, or None if there is no usable one."""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def write_schema(path: Path, schema: dict) -> None:
+    """Write atomically so readers (e.g. a reloading API) never see a partial file."""
     json_str = json.dumps(schema, indent=2, sort_keys=True)
-    out_path.write_text(json_str, encoding="utf-8")
-    print(f"Schema dumped → {out_path}")
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json_str, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def diff_schemas(old: dict, new: dict) -> list[str]:
+    """Human-readable changes between two exported schemas."""
+    lines = []
+    for section in ("NodeTypes", "RelationshipTypes"):
+        before, after = old.get(section) or {}, new.get(section) or {}
+        for name in sorted(after.keys() - before.keys()):
+            lines.append(f"+ {section} {name}")
+        for name in sorted(before.keys() - after.keys()):
+            lines.append(f"- {section} {name}")
+        for name in sorted(before.keys() & after.keys()):
+            if before[name] == after[name]:
+                continue
+            keys = sorted(
+                key for key in before[name].keys() | after[name].keys()
+                if before[name].get(key) != after[name].get(key)
+            )
+            lines.append(f"~ {section} {name}: {', '.join(keys)}")
+    return lines
 
 
 def get_node_schema(session):
@@ -83,10 +181,10 @@ def get_node_schema(session):
     return schema
 
 
-def get_relationship_schema(session):
+def get_relationship_properties(session):
     """
-    For each relationship type return its property map and a sampled endpoint
-    pair.  Includes relationship types that have zero properties.
+    Return a dict[rel-type -> {property -> type}] that includes relationship
+    types with zero properties.  Endpoints are added by sample_endpoints().
     """
     rel_schema: dict[str, dict[str, str]] = {}
 
@@ -111,22 +209,106 @@ def get_relationship_schema(session):
         rtype = rec["relationshipType"]
         rel_schema.setdefault(rtype, {})
 
-    # 3) sample endpoints for every relationship type
-    for rtype in rel_schema:
-        safe_rtype = rtype.replace("`", "``")
-        q_sample = f'''
-        MATCH (s)-[r:`{safe_rtype}`]->(t)
-        WITH head(labels(s)) AS src, head(labels(t)) AS tgt, elementId(r) AS rid
-        ORDER BY rid
-        RETURN src, tgt
-        LIMIT 1
-        '''
-        rec = session.run(q_sample).single()
-        if rec:
-            rel_schema[rtype]["_endpoints"] = [rec["src"], rec["tgt"]]
-        else:
-            rel_schema[rtype]["_endpoints"] = ["Unknown", "Unknown"]
+    return rel_schema
+
+
+def _quote(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
 
+
+def build_sample_query(rel_types: list[str]) -> tuple[str, dict[str, str]]:
+    """
+    One query that samples an endpoint pair for every type in ``rel_types``.
+    Each UNION branch stops at its first relationship (type scan + LIMIT 1),
+    so nothing is sorted and no type is scanned in full.
+    """
+    branches = []
+    params = {}
+    for idx, rtype in enumerate(rel_types):
+        params[f"t{idx}"] = rtype
+        branches.append(
+            f"MATCH (s)-[:{_quote(rtype)}]->(t) "
+            f"RETURN $t{idx} AS rtype, head(labels(s)) AS src, head(labels(t)) AS tgt LIMIT 1"
+        )
+    return "\nUNION ALL\n".join(branches), params
+
+
+def build_verify_query(pairs: dict[str, list[str]]) -> tuple[str, dict[str, str]]:
+    """One query returning the types whose previously exported endpoints still exist."""
+    branches = []
+    params = {}
+    for idx, (rtype, (src, tgt)) in enumerate(pairs.items()):
+        params[f"t{idx}"] = rtype
+        branches.append(
+            f"MATCH (:{_quote(src)})-[:{_quote(rtype)}]->(:{_quote(tgt)}) "
+            f"RETURN $t{idx} AS rtype LIMIT 1"
+        )
+    return "\nUNION ALL\n".join(branches), params
+
+
+def _batches(items: list, size: int) -> list[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def sample_endpoints(
+    driver,
+    db_name,
+    rel_types: list[str],
+    previous: dict[str, list[str] | None] | None = None,
+    batch_size: int = 50,
+    workers: int = 4,
+) -> dict[str, list[str]]:
+    """
+    Return rel-type -> [source label, target label] for every type.
+
+    Types are sampled ``batch_size`` per query, with batches spread over
+    ``workers`` parallel sessions.  With ``previous`` endpoints (incremental
+    export), pairs that still exist are kept as they are, so an unchanged
+    graph produces an unchanged file; only the rest are sampled.
+    """
+    endpoints: dict[str, list[str]] = {}
+    previous = previous or {}
+
+    def run(query_and_params):
+        query, params = query_and_params
+        with driver.session(database=db_name) as session:
+            return [rec.data() for rec in session.run(query, params)]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        known = {
+            rtype: list(pair) for rtype in rel_types
+            if isinstance(pair := previous.get(rtype), list) and len(pair) == 2
+            and "Unknown" not in pair
+        }
+        verify = [build_verify_query({t: known[t] for t in batch}) for batch in _batches(list(known), batch_size)]
+        for rows in pool.map(run, verify):
+            for row in rows:
+                endpoints[row["rtype"]] = known[row["rtype"]]
+
+        todo = [rtype for rtype in rel_types if rtype not in endpoints]
+        queries = [build_sample_query(batch) for batch in _batches(todo, batch_size)]
+        for rows in pool.map(run, queries):
+            for row in rows:
+                endpoints[row["rtype"]] = [row["src"], row["tgt"]]
+
+    for rtype in rel_types:
+        endpoints.setdefault(rtype, ["Unknown", "Unknown"])
+    return endpoints
+
+
+def get_relationship_schema(session):
+    """
+    For each relationship type return its property map and a sampled endpoint
+    pair.  Includes relationship types that have zero properties.
+    """
+    rel_schema = get_relationship_properties(session)
+    rel_types = list(rel_schema)
+    for batch in _batches(rel_types, 50):
+        query, params = build_sample_query(batch)
+        for rec in session.run(query, params):
+            rel_schema[rec["rtype"]]["_endpoints"] = [rec["src"], rec["tgt"]]
+    for rtype in rel_types:
+        rel_schema[rtype].setdefault("_endpoints", ["Unknown", "Unknown"])
     return rel_schema
 
 
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+hedging.py
+Latency hedging between the ``openai`` and ``google`` providers.
+
+A hedged call starts on the primary provider. If it has not answered after
+the hedge delay, the same call is started on the secondary provider and the
+first successful answer wins; the other call is cancelled. The delay is
+either fixed or a quantile of the primary's recently observed call times
+(``p90`` by default), so only the slow tail pays for a second call. A
+primary cancelled because the secondary won counts with the time it ran, a
+lower bound of its real duration; leaving the slow tail out would pull the
+quantile down and raise the hedge rate without bound. If the primary fails
+before the delay, the secondary is started at once.
+
+Settings (environment)
+----------------------
+HEDGING                  race slow calls against the other provider (default false)
+HEDGE_DELAY              seconds, or ``pNN`` for the primary's observed quantile (default p90)
+HEDGE_MIN_DELAY_SECONDS  lower bound of the delay, and the delay until enough
+                         calls have been observed (default 1.0)
+HEDGE_MIN_SAMPLES        calls observed before the quantile is trusted (default 20)
+
+Usage
+-----
+from src.hedging import create_hedger
+hedger = create_hedger()
+answer, winner = await hedger.race("openai", lambda provider: generate(provider))
+
+# Time only the provider call, not queueing before it:
+async def generate(provider):
+    async with slot(provider):
+        with hedger.measure(provider, censored=provider == "openai"):
+            return await agent.agenerate(question, session_id)
+answer, winner = await hedger.race("openai", generate, timed=False)
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from src.utils import parse_bool
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Secondary provider for each primary.
+HEDGE_PARTNERS: Dict[str, str] = {"openai": "google", "google": "openai"}
+
+# Recent call times kept per provider for the delay quantile.
+_WINDOW = 256
+
+_QUANTILE = re.compile(r"^p(\d{1,2}(?:\.\d+)?)$")
+
+OUTCOMES = ("not_hedged", "primary_won", "secondary_won", "failed")
+
+
+class Hedger:
+    def __init__(
+        self,
+        enabled: bool = False,
+        delay: str = "p90",
+        min_delay_seconds: float = 1.0,
+        min_samples: int = 20,
+    ):
+        self.enabled = enabled
+        self.min_delay_seconds = min_delay_seconds
+        self.min_samples = min_samples
+        match = _QUANTILE.match(delay.strip().lower())
+        if match:
+            self.quantile: Optional[float] = float(match.group(1)) / 100
+            self.fixed_delay = min_delay_seconds
+        else:
+            self.quantile = None
+            self.fixed_delay = max(0.0, float(delay))
+        self._durations: Dict[str, Deque[float]] = {}
+        self._outcomes: Dict[Tuple[str, str], int] = {}
+
+    def observe(self, provider: str, seconds: float) -> None:
+        """Record how long a call on ``provider`` took (or at least ran)."""
+        self._durations.setdefault(provider, deque(maxlen=_WINDOW)).append(seconds)
+
+    def delay_for(self, provider: str) -> float:
+        """Seconds to wait on ``provider`` before starting the secondary call."""
+        if self.quantile is None:
+            return self.fixed_delay
+        durations = sorted(self._durations.get(provider, ()))
+        if len(durations) < self.min_samples:
+            return self.min_delay_seconds
+        index = min(len(durations) - 1, math.ceil(self.quantile * len(durations)) - 1)
+        return max(self.min_delay_seconds, durations[index])
+
+    @contextmanager
+    def measure(self, provider: str, censored: bool = False) -> Iterator[None]:
+        """Record how long the block takes on ``provider``; with ``censored``,
+        also the time it ran when it is cancelled (a lower bound)."""
+        start = time.perf_counter()
+        try:
+            yield
+        except asyncio.CancelledError:
+            if censored:
+                self.observe(provider, time.perf_counter() - start)
+            raise
+        self.observe(provider, time.perf_counter() - start)
+
+    async def race(
+        self,
+        primary: str,
+        call: Callable[[str], Awaitable[Any]],
+        timed: bool = True,
+    ) -> Tuple[Any, str]:
+        """Return ``(result, provider)`` of ``call(primary)``, hedged with
+        ``call(secondary)`` when the primary is slow or fails.
+
+        With hedging disabled, or no partner for ``primary``, this is just
+        ``call(primary)``. If every call fails, the primary's error is raised.
+        Each call is timed as a whole unless ``timed`` is false; ``call`` then
+        times the part that is the provider's own with :meth:`measure`.
+        """
+        secondary = HEDGE_PARTNERS.get(primary)
+        if not self.enabled or secondary is None:
+            return await call(primary), primary
+
+        tasks: Dict[asyncio.Task, str] = {}
+
+        def start(provider: str) -> asyncio.Task:
+            leg = self._timed(provider, call, censored=provider == primary) if timed else call(provider)
+            task = asyncio.create_task(leg)
+            tasks[task] = provider
+            return task
+
+        first = start(primary)
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.delay_for(primary))
+            if done and first.exception() is None:
+                self._count(primary, "not_hedged")
+                return first.result(), primary
+            start(secondary)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = tasks[task]
+                        self._count(primary, "primary_won" if winner == primary else "secondary_won")
+                        return task.result(), winner
+            for task, provider in tasks.items():
+                if provider == secondary:
+                    logger.warning("Hedged call on %s failed: %r", secondary, task.exception())
+            self._count(primary, "failed")
+            raise first.exception()
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            # Wait for cancellation so the loser's provider slot is released.
+            await asyncio.gather(*losers, return_exceptions=True)
+
+    async def _timed(self, provider: str, call: Callable[[str], Awaitable[Any]], censored: bool = False) -> Any:
+        with self.measure(provider, censored):
+            return await call(provider)
+
+    def _count(self, primary: str, outcome: str) -> None:
+        key = (primary, outcome)
+        self._outcomes[key] = self._outcomes.get(key, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per primary provider: outcome counts, hedge rate and current delay."""
+        stats: Dict[str, Dict[str, float]] = {}
+        for primary in sorted({primary for primary, _ in self._outcomes}):
+            counts = {outcome: self._outcomes.get((primary, outcome), 0) for outcome in OUTCOMES}
+            calls = sum(counts.values())
+            hedged = calls - counts["not_hedged"]
+            stats[primary] = {
+                **counts,
+                "hedge_rate": round(hedged / calls, 4) if calls else 0.0,
+                "delay_seconds": round(self.delay_for(primary), 3),
+            }
+        return stats
+
+
+def create_hedger() -> Hedger:
+    """Build a hedger from the environment settings."""
+    return Hedger(
+        enabled=parse_bool(os.getenv("HEDGING", "false"), default=False),
+        delay=os.getenv("HEDGE_DELAY", "p90"),
+        min_delay_seconds=max(0.0, float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "1.0"))),
+        min_samples=max(1, int(os.getenv("HEDGE_MIN_SAMPLES", "20"))),
+    )
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+history_window.py
+Fit a session's chat history into a token budget.
+
+The most recent exchanges are sent verbatim, always including the latest
+Cypher answer (the draft the user is usually revising). Everything older is
+folded into a short extractive summary ("question -> Cypher" per turn) that
+is sent as one system message. Summaries are cached per session and extended
+with newly folded turns instead of being rebuilt on every request.
+
+Usage
+-----
+from src.history_window import HistoryAssembler
+assembler = HistoryAssembler(budget_tokens=2000)
+window = assembler.assemble(session_id, messages)
+window.messages, window.tokens
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from threading import Lock
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from src.utils import estimate_tokens
+
+HISTORY_TOKEN_BUDGET = max(0, int(os.getenv("HISTORY_TOKEN_BUDGET", "2000")))
+HISTORY_SUMMARY_TOKENS = max(0, int(os.getenv("HISTORY_SUMMARY_TOKENS", "400")))
+HISTORY_SUMMARY_SESSIONS = max(1, int(os.getenv("HISTORY_SUMMARY_SESSIONS", "1000")))
+
+# Rough per-message framing cost (role markers) on chat APIs.
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_HEADER = "Summary of earlier conversation (oldest first):"
+_SUMMARY_OMITTED = "- (older turns omitted)"
+_SUMMARY_FIELD_CHARS = 120
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Memoized :func:`estimate_tokens`; history text repeats across requests."""
+    return estimate_tokens(text)
+
+
+def message_tokens(msg: BaseMessage) -> int:
+    content = msg.content if isinstance(msg.content, str) else str(msg.content)
+    return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _one_line(text: str) -> str:
+    text = _WHITESPACE.sub(" ", text).strip()
+    if len(text) > _SUMMARY_FIELD_CHARS:
+        text = text[: _SUMMARY_FIELD_CHARS - 3].rstrip() + "..."
+    return text
+
+
+def summarize_turns(messages: List[BaseMessage]) -> List[str]:
+    """Return one summary line per exchange, oldest first."""
+    lines = []
+    question: Optional[str] = None
+    for msg in messages:
+        if isinstance(msg, AIMessage):
+            answer = _one_line(str(msg.content))
+            lines.append(f"- {_one_line(question)} -> {answer}" if question else f"- -> {answer}")
+            question = None
+        else:
+            if question is not None:
+                lines.append(f"- {_one_line(question)}")
+            question = str(msg.content)
+    if question is not None:
+        lines.append(f"- {_one_line(question)}")
+    return lines
+
+
+def _anchor(msg: BaseMessage) -> str:
+    role = "ai" if isinstance(msg, AIMessage) else "human"
+    return hashlib.sha256(f"{role}\0{msg.content}".encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class HistoryWindow:
+    messages: List[BaseMessage]
+    tokens: int
+    verbatim: int
+    folded: int
+    summary_tokens: int
+    summary_cached: bool = False
+
+
+class HistoryAssembler:
+    """Build token-bounded history windows with a cached rolling summary.
+
+    ``budget_tokens`` bounds the verbatim messages plus the summary, except
+    that the latest exchange is always kept even if it alone is larger.
+    ``budget_tokens=0`` disables the budget and sends history unchanged.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = HISTORY_TOKEN_BUDGET,
+        summary_tokens: int = HISTORY_SUMMARY_TOKENS,
+        max_sessions: int = HISTORY_SUMMARY_SESSIONS,
+    ):
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = min(summary_tokens, budget_tokens)
+        self.max_sessions = max_sessions
+        # session_id -> (anchor of last folded message, summary lines)
+        self._summaries: "OrderedDict[str, Tuple[str, List[str]]]" = OrderedDict()
+        self._lock = Lock()
+        self.summary_hits = 0
+        self.summary_misses = 0
+
+    def forget(self, session_id: Optional[str] = None) -> None:
+        with self._lock:
+            if session_id is None:
+                self._summaries.clear()
+            else:
+                self._summaries.pop(session_id, None)
+
+    def _summary_lines(self, session_id: str, folded: List[BaseMessage]) -> Tuple[List[str], bool]:
+        """Return summary lines for ``folded``, extending the cached summary when possible."""
+        with self._lock:
+            cached = self._summaries.get(session_id)
+            if cached is not None:
+                self._summaries.move_to_end(session_id)
+        lines: Optional[List[str]] = None
+        if cached is not None:
+            anchor, cached_lines = cached
+            for idx in range(len(folded) - 1, -1, -1):
+                if _anchor(folded[idx]) == anchor:
+                    lines = cached_lines + summarize_turns(folded[idx + 1:])
+                    break
+        hit = lines is not None
+        if lines is None:
+            lines = summarize_turns(folded)
+        lines = self._fit_summary(lines)
+        with self._lock:
+            if hit:
+                self.summary_hits += 1
+            else:
+                self.summary_misses += 1
+            self._summaries[session_id] = (_anchor(folded[-1]), lines)
+            self._summaries.move_to_end(session_id)
+            while len(self._summaries) > self.max_sessions:
+                self._summaries.popitem(last=False)
+        return lines, hit
+
+    def _fit_summary(self, lines: List[str]) -> List[str]:
+        """Keep the newest lines that fit in ``summary_tokens``."""
+        omitted = bool(lines) and lines[0] == _SUMMARY_OMITTED
+        if omitted:
+            lines = lines[1:]
+        budget = self.summary_tokens - count_tokens(SUMMARY_HEADER) - MESSAGE_OVERHEAD_TOKENS
+        kept: List[str] = []
+        used = count_tokens(_SUMMARY_OMITTED)
+        for line in reversed(lines):
+            cost = count_tokens(line) + 1
+            if used + cost > budget:
+                omitted = True
+                break
+            kept.append(line)
+            used += cost
+        kept.reverse()
+        return [_SUMMARY_OMITTED] + kept if omitted else kept
+
+    def assemble(self, session_id: str, messages: List[BaseMessage]) -> HistoryWindow:
+        costs = [message_tokens(msg) for msg in messages]
+        total = sum(costs)
+        if not self.budget_tokens or total <= self.budget_tokens:
+            return HistoryWindow(list(messages), total, len(messages), 0, 0)
+
+        # The latest exchange (with the latest Cypher draft) is always verbatim.
+        start = len(messages)
+        for idx in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[idx], AIMessage):
+                start = idx - 1 if idx > 0 and isinstance(messages[idx - 1], HumanMessage) else idx
+                break
+        start = min(start, max(0, len(messages) - 1))
+        used = sum(costs[start:])
+
+        # Add earlier messages while they fit next to a full-size summary.
+        available = self.budget_tokens - self.summary_tokens
+        while start > 0 and used + costs[start - 1] <= available:
+            start -= 1
+            used += costs[start]
+        # Begin the verbatim part on a question, not on an orphaned answer.
+        if start < len(messages) - 1 and isinstance(messages[start], AIMessage):
+            used -= costs[start]
+            start += 1
+
+        if start == 0:
+            return HistoryWindow(list(messages), used, len(messages), 0, 0)
+
+        lines, hit = self._summary_lines(session_id, messages[:start])
+        summary = SystemMessage(content="\n".join([SUMMARY_HEADER, *lines]))
+        summary_tokens = message_tokens(summary)
+        return HistoryWindow(
+            messages=[summary, *messages[start:]],
+            tokens=used + summary_tokens,
+            verbatim=len(messages) - start,
+            folded=start,
+            summary_tokens=summary_tokens,
+            summary_cached=hit,
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "budget_tokens": self.budget_tokens,
+                "summary_tokens": self.summary_tokens,
+                "cached_summaries": len(self._summaries),
+                "summary_hits": self.summary_hits,
+                "summary_misses": self.summary_misses,
+            }
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+metrics.py
+In-process counters, gauges and histograms rendered in the Prometheus text
+exposition format, without a client library or any extra service.
+
+Recording is a ``perf_counter`` call plus a short locked update of a dict
+keyed by label values, so it can sit on every request. Values that already
+live elsewhere (session store sizes, response cache counters) are not
+mirrored on the hot path; the ``/metrics`` handler reads them at scrape time
+and passes them to :func:`render` as extra families.
+
+Usage
+-----
+from src.metrics import STAGE_SECONDS, in_flight, render, timed
+with in_flight("ask"), timed("llm", "openai"):
+    ...
+text = render()
+"""
+
+from __future__ import annotations
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; LLM calls dominate, so the buckets reach a minute.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# (labels, value) pairs of one metric family.
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+class Family:
+    """A scrape-time metric family: ``name``, ``kind``, ``help`` and samples."""
+
+    def __init__(self, name: str, kind: str, help: str, samples: Optional[Samples] = None):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.samples: Samples = samples or []
+
+    def add(self, value: float, **labels: str) -> "Family":
+        self.samples.append((labels, value))
+        return self
+
+    def lines(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in self.samples:
+            yield f"{self.name}{_labels(labels)} {_value(value)}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def lines(self) -> Iterator[str]:
+        with self._lock:
+            samples = [(self._labels(key), value) for key, value in self._values.items()]
+        return Family(self.name, self.kind, self.help, samples).lines()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last one is +Inf)..., sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def lines(self) -> Iterator[str]:
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, series in snapshot.items():
+            labels = self._labels(key)
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), series[:-1]):
+                cumulative += count
+                bucket_labels = {**labels, "le": _value(bound)}
+                yield f"{self.name}_bucket{_labels(bucket_labels)} {_value(cumulative)}"
+            yield f"{self.name}_sum{_labels(labels)} {_value(series[-1])}"
+            yield f"{self.name}_count{_labels(labels)} {_value(cumulative)}"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# ── process-wide metrics ──────────────────────────────────────────────
+STAGE_SECONDS = Histogram(
+    "text2cypher_stage_seconds",
+    "Time spent in each request stage.",
+    ("stage", "provider"),
+)
+IN_FLIGHT = Gauge(
+    "text2cypher_requests_in_flight",
+    "Requests currently being served.",
+    ("endpoint",),
+)
+TOKENS = Counter(
+    "text2cypher_tokens_total",
+    "Provider-reported tokens.",
+    ("provider", "type"),
+)
+
+_METRICS = (STAGE_SECONDS, IN_FLIGHT, TOKENS)
+
+
+@contextmanager
+def timed(stage: str, provider: str) -> Iterator[None]:
+    """Observe the time spent in the block as ``stage`` for ``provider``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage, provider)
+
+
+@contextmanager
+def in_flight(endpoint: str) -> Iterator[None]:
+    """Count the block as an in-flight request to ``endpoint``."""
+    IN_FLIGHT.inc(endpoint)
+    try:
+        yield
+    finally:
+        IN_FLIGHT.dec(endpoint)
+
+
+def render(extra: Iterable[Family] = ()) -> str:
+    """Return all metrics, plus ``extra`` families, in text exposition format."""
+    lines: List[str] = []
+    for metric in (*_METRICS, *extra):
+        lines.extend(metric.lines())
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    """Clear the process-wide metrics (tests)."""
+    for metric in _METRICS:
+        metric.clear()
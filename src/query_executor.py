@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+query_executor.py
+Run generated Cypher read-only against Neo4j and stream the records.
+
+One async ``neo4j`` driver (and so one connection pool) is shared by the
+whole process, so a query does not pay for a connect and handshake. Queries
+run in explicit READ transactions with a server-side timeout; obvious
+write clauses are rejected locally before anything is sent. Records are
+pulled ``fetch_size`` at a time and only as fast as the caller consumes them,
+and pulling stops at the row limit, so memory stays flat for large results.
+
+Usage
+-----
+from src.query_executor import get_query_executor
+executor = await get_query_executor()
+async for item in executor.stream("MATCH (d:Disease) RETURN d LIMIT 5"):
+    ...  # {"columns": [...]}, {"row": {...}}, ..., {"done": True, ...}
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from dotenv import load_dotenv
+from neo4j import READ_ACCESS, AsyncGraphDatabase
+from neo4j.graph import Node, Path, Relationship
+
+from src.cypher_validator import Token, tokenize
+from src.utils import get_env_variable, parse_bool
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+QUERY_EXECUTION = parse_bool(os.getenv("QUERY_EXECUTION", "false"))
+EXECUTE_MAX_ROWS = max(1, int(os.getenv("EXECUTE_MAX_ROWS", "1000")))
+EXECUTE_TIMEOUT_SECONDS = max(1.0, float(os.getenv("EXECUTE_TIMEOUT_SECONDS", "30")))
+EXECUTE_FETCH_SIZE = max(1, int(os.getenv("EXECUTE_FETCH_SIZE", "100")))
+NEO4J_MAX_POOL_SIZE = max(1, int(os.getenv("NEO4J_MAX_POOL_SIZE", "50")))
+
+# Clauses that change data or schema; procedures that write are refused by
+# the READ transaction on the server instead.
+_WRITE_CLAUSES = frozenset(
+    """
+    CREATE MERGE DELETE DETACH SET REMOVE DROP LOAD FOREACH
+    GRANT DENY REVOKE ALTER
+    """.split()
+)
+# Words after which an expression or name follows, never a clause
+# ("RETURN n AS set", "MATCH (start) WITH start", "ORDER BY set").
+_EXPRESSION_KEYWORDS = frozenset(
+    """
+    MATCH OPTIONAL WHERE AND OR XOR NOT WITH RETURN UNWIND AS IN IS YIELD
+    CASE WHEN THEN ELSE ORDER BY SKIP LIMIT DISTINCT CONTAINS STARTS ENDS
+    """.split()
+)
+
+
+class ReadOnlyViolation(ValueError):
+    """The query contains a clause that writes."""
+
+
+def _in_clause_position(tokens: List[Token], idx: int) -> bool:
+    """True when ``tokens[idx]`` can start a clause: at the start of the query
+    or right after an expression ends (a name, literal or closing bracket),
+    which is where the next clause or a WITH/UNION boundary begins."""
+    if idx == 0:
+        return True
+    prev = tokens[idx - 1]
+    if prev.kind == "punct":
+        return prev.value in (")", "]", "}", ";")
+    if prev.kind == "ident":
+        return prev.value.upper() not in _EXPRESSION_KEYWORDS
+    return prev.kind in ("string", "number", "param")
+
+
+def check_read_only(query: str) -> None:
+    """Raise :class:`ReadOnlyViolation` if ``query`` uses a write clause.
+
+    Only words in clause position count, so variables, aliases, labels and
+    property names may reuse them (``RETURN n.name AS set``). The READ
+    transaction is what actually guarantees nothing is written.
+    """
+    tokens, _ = tokenize(query)
+    for idx, token in enumerate(tokens):
+        if token.kind != "ident" or token.value.upper() not in _WRITE_CLAUSES:
+            continue
+        if query[token.pos] == "`" or not _in_clause_position(tokens, idx):
+            continue
+        following = tokens[idx + 1] if idx + 1 < len(tokens) else None
+        # Property names and map keys may reuse these words.
+        if following is not None and following.kind == "punct" and following.value in (":", "."):
+            continue
+        raise ReadOnlyViolation(f"{token.value.upper()} is not allowed in read-only queries")
+
+
+def to_json_value(value: Any) -> Any:
+    """Convert driver values (nodes, relationships, paths) to JSON-friendly data."""
+    if isinstance(value, Node):
+        return {
+            "element_id": value.element_id,
+            "labels": sorted(value.labels),
+            "properties": {k: to_json_value(v) for k, v in value.items()},
+        }
+    if isinstance(value, Relationship):
+        return {
+            "element_id": value.element_id,
+            "type": value.type,
+            "start": value.start_node.element_id if value.start_node else None,
+            "end": value.end_node.element_id if value.end_node else None,
+            "properties": {k: to_json_value(v) for k, v in value.items()},
+        }
+    if isinstance(value, Path):
+        return {
+            "nodes": [to_json_value(node) for node in value.nodes],
+            "relationships": [to_json_value(rel) for rel in value.relationships],
+        }
+    if isinstance(value, dict):
+        return {k: to_json_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(v) for v in value]
+    return value
+
+
+class QueryExecutor:
+    """Streams read-only query results from a shared driver."""
+
+    def __init__(
+        self,
+        driver,
+        database: Optional[str] = None,
+        max_rows: int = EXECUTE_MAX_ROWS,
+        timeout_seconds: float = EXECUTE_TIMEOUT_SECONDS,
+        fetch_size: int = EXECUTE_FETCH_SIZE,
+    ):
+        self.driver = driver
+        self.database = database
+        self.max_rows = max_rows
+        self.timeout_seconds = timeout_seconds
+        self.fetch_size = fetch_size
+
+    async def stream(
+        self,
+        query: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        max_rows: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ``{"columns"}``, then one ``{"row"}`` per record, then ``{"done"}``.
+
+        The final item reports ``rows``, whether the row limit ``truncated``
+        the result or the time limit was hit (``timed_out``), and
+        ``elapsed_ms``. Raises :class:`ReadOnlyViolation` before connecting.
+        """
+        check_read_only(query)
+        limit = min(max_rows or self.max_rows, self.max_rows)
+        start = time.perf_counter()
+        deadline = start + self.timeout_seconds
+        rows = 0
+        truncated = timed_out = False
+        async with self.driver.session(
+            database=self.database,
+            default_access_mode=READ_ACCESS,
+            fetch_size=self.fetch_size,
+        ) as session:
+            tx = await session.begin_transaction(timeout=self.timeout_seconds)
+            try:
+                result = await tx.run(query, parameters or {})
+                yield {"columns": list(result.keys())}
+                async for record in result:
+                    if rows >= limit:
+                        truncated = True
+                        break
+                    rows += 1
+                    yield {"row": {key: to_json_value(value) for key, value in record.items()}}
+                    if time.perf_counter() > deadline:
+                        timed_out = True
+                        break
+            finally:
+                # Read-only: roll back, discarding any records not pulled yet.
+                await tx.close()
+        yield {
+            "done": True,
+            "rows": rows,
+            "truncated": truncated,
+            "timed_out": timed_out,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    async def explain(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> Optional[dict]:
+        """Return the ``EXPLAIN`` plan of ``query`` without running it."""
+        check_read_only(query)
+        async with self.driver.session(
+            database=self.database,
+            default_access_mode=READ_ACCESS,
+        ) as session:
+            tx = await session.begin_transaction(timeout=self.timeout_seconds)
+            try:
+                result = await tx.run(f"EXPLAIN {query}", parameters or {})
+                summary = await result.consume()
+            finally:
+                await tx.close()
+        return summary.plan
+
+    async def warm_up(self) -> None:
+        """Open a pooled connection ahead of the first query."""
+        await self.driver.verify_connectivity(database=self.database)
+
+    async def close(self) -> None:
+        await self.driver.close()
+
+
+def create_query_executor() -> QueryExecutor:
+    """Build an executor with a pooled driver from the ``DB_*`` settings."""
+    uri = get_env_variable("DB_URL")
+    db_user = get_env_variable("DB_USER", default="neo4j")
+    db_password = get_env_variable("DB_PASSWORD", default="")
+    auth = (db_user, db_password) if db_user and db_password else None
+    driver = AsyncGraphDatabase.driver(
+        uri,
+        auth=auth,
+        max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+        connection_acquisition_timeout=EXECUTE_TIMEOUT_SECONDS,
+    )
+    return QueryExecutor(driver, database=get_env_variable("DB_NAME", default="") or None)
+
+
+_EXECUTOR: Optional[QueryExecutor] = None
+_EXECUTOR_LOCK = asyncio.Lock()
+
+
+async def get_query_executor() -> QueryExecutor:
+    """Return the process-wide executor, creating its driver on first use."""
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        return _EXECUTOR
+    async with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = create_query_executor()
+    return _EXECUTOR
+
+
+def set_query_executor(executor: Optional[QueryExecutor]) -> None:
+    """Replace the process-wide executor (tests, custom drivers)."""
+    global _EXECUTOR
+    _EXECUTOR = executor
+
+
+async def close_query_executor() -> None:
+    """Close the shared driver and its pool, if one was created."""
+    global _EXECUTOR
+    executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        await executor.close()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+query_plan.py
+Estimate the cost of a query from its ``EXPLAIN`` plan.
+
+The plan is the nested operator map the Neo4j driver returns in
+``ResultSummary.plan``. The analyzer walks it once, taking the largest
+``EstimatedRows`` and flagging operators that are risky on a large graph:
+Cartesian products, scans of all nodes, variable-length expansions without
+an upper bound and (as a softer warning) full label scans. It needs no
+database, so plans recorded from one can be replayed in tests.
+
+Usage
+-----
+from src.query_plan import analyze_plan
+cost = analyze_plan(summary.plan)
+cost.verdict, cost.estimated_rows, cost.risks
+"""
+
+from __future__ import annotations
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+PREFLIGHT_MAX_ESTIMATED_ROWS = max(1, int(float(os.getenv("PREFLIGHT_MAX_ESTIMATED_ROWS", "1000000"))))
+
+VERDICT_OK = "ok"
+VERDICT_WARN = "warn"
+VERDICT_EXPENSIVE = "expensive"
+VERDICT_UNKNOWN = "unknown"
+_VERDICT_RANK = {VERDICT_OK: 0, VERDICT_WARN: 1, VERDICT_EXPENSIVE: 2, VERDICT_UNKNOWN: 3}
+
+# "*", "*2..", "*..": no upper bound; "*3", "*1..5", "*..5": bounded.
+_VAR_LENGTH = re.compile(r"\*(\d*)(\.\.)?(\d*)")
+
+
+@dataclass
+class PlanCost:
+    verdict: str
+    estimated_rows: float = 0.0
+    risks: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+    @property
+    def expensive(self) -> bool:
+        return self.verdict == VERDICT_EXPENSIVE
+
+    def is_better_than(self, other: "PlanCost") -> bool:
+        rank, other_rank = _VERDICT_RANK[self.verdict], _VERDICT_RANK[other.verdict]
+        if rank != other_rank:
+            return rank < other_rank
+        return self.estimated_rows < other.estimated_rows
+
+    def feedback(self) -> str:
+        """Plan findings phrased for a regeneration prompt."""
+        lines = [f"- {risk}" for risk in self.risks + self.warnings]
+        if self.estimated_rows >= PREFLIGHT_MAX_ESTIMATED_ROWS:
+            lines.append(f"- the planner estimates about {self.estimated_rows:,.0f} rows")
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "verdict": self.verdict,
+            "estimated_rows": round(self.estimated_rows),
+            "risks": self.risks + self.warnings,
+        }
+
+
+def _operators(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    stack = [plan]
+    while stack:
+        op = stack.pop()
+        yield op
+        stack.extend(reversed(op.get("children") or []))
+
+
+def _arguments(op: Dict[str, Any]) -> Dict[str, Any]:
+    # Bolt sends "args"; some tooling records the long name.
+    return op.get("args") or op.get("arguments") or {}
+
+
+def _operator_name(op: Dict[str, Any]) -> str:
+    return str(op.get("operatorType", "")).split("@", 1)[0]
+
+
+def _unbounded(details: str) -> bool:
+    for match in _VAR_LENGTH.finditer(details):
+        lower, dots, upper = match.groups()
+        if (dots and not upper) or (not dots and not lower):
+            return True
+    return False
+
+
+def analyze_plan(
+    plan: Optional[Dict[str, Any]],
+    max_estimated_rows: int = PREFLIGHT_MAX_ESTIMATED_ROWS,
+) -> PlanCost:
+    """Return a :class:`PlanCost` for an EXPLAIN plan (``unknown`` if there is none)."""
+    if not plan:
+        return PlanCost(VERDICT_UNKNOWN)
+    risks: List[str] = []
+    warnings: List[str] = []
+    estimated = 0.0
+    for op in _operators(plan):
+        name = _operator_name(op)
+        args = _arguments(op)
+        rows = float(args.get("EstimatedRows") or 0)
+        estimated = max(estimated, rows)
+        details = str(args.get("Details") or ", ".join(op.get("identifiers") or []))
+        if name == "CartesianProduct":
+            sides = [
+                ", ".join(child.get("identifiers") or []) or "?"
+                for child in op.get("children") or []
+            ]
+            risks.append(f"Cartesian product of unconnected patterns ({') x ('.join(sides)})")
+        elif name == "AllNodesScan":
+            risks.append(f"scan of all nodes for unlabelled ({details})")
+        elif name.startswith("VarLengthExpand") and _unbounded(details):
+            risks.append(f"variable-length path without an upper bound: {details}")
+        elif name == "NodeByLabelScan":
+            warnings.append(f"full label scan {details} (about {rows:,.0f} rows)")
+
+    if risks or estimated >= max_estimated_rows:
+        verdict = VERDICT_EXPENSIVE
+    elif warnings:
+        verdict = VERDICT_WARN
+    else:
+        verdict = VERDICT_OK
+    return PlanCost(verdict, estimated, risks, warnings)
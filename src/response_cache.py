@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+response_cache.py
+In-process LRU + TTL cache for generated Cypher answers.
+
+Entries are keyed on everything that can change the model output: provider,
+model, the normalized question, the schema/hints version and a digest of the
+session history that would be sent with the prompt.
+
+Usage
+-----
+from src.response_cache import ResponseCache, make_cache_key
+cache = ResponseCache(max_entries=1000, ttl_seconds=3600)
+key = make_cache_key("openai", "gpt-5-mini", question, version, history)
+answer = cache.get(key)
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Collapse whitespace and trailing punctuation.
+
+    Case is preserved on purpose: names quoted in a question usually end up as
+    string literals in the generated Cypher, where case matters.
+    """
+    text = unicodedata.normalize("NFKC", question)
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.rstrip("?!. ")
+
+
+def history_digest(history: Iterable[Dict[str, Any]]) -> str:
+    """Return a stable digest of a history payload (role/content pairs)."""
+    h = hashlib.sha256()
+    for item in history:
+        h.update(json.dumps([item.get("role"), item.get("content")]).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def make_cache_key(
+    provider: str,
+    model: str,
+    question: str,
+    schema_version: str,
+    history: Iterable[Dict[str, Any]],
+) -> Tuple[str, str, str, str, str]:
+    return (
+        provider,
+        model,
+        normalize_question(question),
+        schema_version,
+        history_digest(history),
+    )
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a per-entry time-to-live.
+
+    A ``max_entries`` of 0 disables the cache: ``get`` always misses and
+    ``put`` is a no-op.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[Any, Tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if self.ttl_seconds > 0 and self._clock() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Any, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
@@ -1,33 +1,60 @@
 #!/usr/bin/env python3
 """
 schema_loader.py
-Fast, memoised accessor for the Neo4j schema JSON and optional hints.
+Versioned registry for the Neo4j schema JSON and optional hints.
+
+The files are read once into an immutable :class:`SchemaSnapshot` whose
+``version`` is a content hash. :func:`refresh_schema` re-reads them only
+when their mtime, size or inode changed, and returns a new snapshot only
+when the content hash differs; the caller decides when to publish it with
+:func:`publish_schema_snapshot`, so dependent state (prompts, agents) can be
+rebuilt first and swapped in together.
 
 Usage
 -----
-from schema_loader import get_schema, get_schema_hints
-schema = get_schema()       # dict, loaded once per process
-hints = get_schema_hints()  # dict or None, loaded once per process
+from schema_loader import get_schema, get_schema_hints, get_schema_version
+schema = get_schema()          # dict from the active snapshot
+hints = get_schema_hints()     # dict or None
+version = get_schema_version() # content hash of schema + hints
+new = refresh_schema()         # SchemaSnapshot if the files changed, else None
 """
 
 from __future__ import annotations
+import hashlib
 import json
+import logging
 import os
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
 from threading import RLock
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 from dotenv import load_dotenv
 from src.utils import get_project_root
 
 load_dotenv()
 
-# ── internal cache --------------------------------------------------------
-_cached_schema: Dict[str, Any] | None = None
-_cached_hints: Dict[str, Any] | None = None
-_hints_loaded: bool = False
+logger = logging.getLogger(__name__)
+
+# ── active snapshot -------------------------------------------------------
+_snapshot: Optional["SchemaSnapshot"] = None
 _CACHE_LOCK = RLock()
 
+# (mtime_ns, size, inode) of a file, or None when it does not exist.
+FileStamp = Optional[Tuple[int, int, int]]
+
+
+@dataclass(frozen=True)
+class SchemaSnapshot:
+    schema: Dict[str, Any]
+    hints: Optional[Dict[str, Any]]
+    version: str
+    schema_path: Path
+    hints_path: Optional[Path]
+    stamps: Tuple[FileStamp, FileStamp]
+    loaded_at: float = field(default_factory=time.time)
+
 
 def _resolve_config_path(raw_path: Optional[str]) -> Optional[Path]:
     """Resolve config path relative to project root when not absolute."""
@@ -53,31 +80,110 @@ def _get_hints_path() -> Optional[Path]:
     return _resolve_config_path(os.getenv("SCHEMA_HINTS_PATH"))
 
 
-def get_schema() -> Dict[str, Any]:
-    """Return the Neo4j schema as a JSON dict (cached)."""
-    global _cached_schema
-    if _cached_schema is not None:
-        return _cached_schema
+def _stamp(path: Optional[Path]) -> FileStamp:
+    if path is None:
+        return None
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _content_version(schema: Dict[str, Any], hints: Optional[Dict[str, Any]]) -> str:
+    # Canonical JSON: the hash only changes when the content changes, not
+    # when keys are reordered or reformatted.
+    payload = json.dumps({"schema": schema, "hints": hints}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def load_schema_snapshot() -> SchemaSnapshot:
+    """Read the schema and hints files into a new, unpublished snapshot."""
+    schema_path = _get_schema_path()
+    hints_path = _get_hints_path()
+    # Stamp before reading: a write racing the read shows up as a change
+    # on the next refresh instead of being missed.
+    stamps = (_stamp(schema_path), _stamp(hints_path))
+    if not schema_path.exists():
+        raise FileNotFoundError(f"Schema file not found: {schema_path}")
+    with schema_path.open(encoding="utf-8") as f:
+        schema = json.load(f)
+    hints = None
+    if hints_path and hints_path.exists():
+        with hints_path.open(encoding="utf-8") as f:
+            hints = json.load(f)
+    return SchemaSnapshot(
+        schema=schema,
+        hints=hints,
+        version=_content_version(schema, hints),
+        schema_path=schema_path,
+        hints_path=hints_path,
+        stamps=stamps,
+    )
+
+
+def get_schema_snapshot() -> SchemaSnapshot:
+    """Return the active snapshot, loading it on first use."""
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
     with _CACHE_LOCK:
-        if _cached_schema is None:
-            schema_path = _get_schema_path()
-            if not schema_path.exists():
-                raise FileNotFoundError(f"Schema file not found: {schema_path}")
-            with schema_path.open(encoding="utf-8") as f:
-                _cached_schema = json.load(f)
-    return _cached_schema
+        if _snapshot is None:
+            _snapshot = load_schema_snapshot()
+        return _snapshot
 
 
-def get_schema_hints() -> Optional[Dict[str, Any]]:
-    """Return schema hints/clarifications if available (cached)."""
-    global _cached_hints, _hints_loaded
-    if _hints_loaded:
-        return _cached_hints
+def publish_schema_snapshot(snapshot: SchemaSnapshot) -> None:
+    """Make ``snapshot`` the active schema."""
+    global _snapshot
     with _CACHE_LOCK:
-        if not _hints_loaded:
-            hints_path = _get_hints_path()
-            if hints_path and hints_path.exists():
-                with hints_path.open(encoding="utf-8") as f:
-                    _cached_hints = json.load(f)
-            _hints_loaded = True
-    return _cached_hints
+        _snapshot = snapshot
+
+
+def refresh_schema() -> Optional[SchemaSnapshot]:
+    """Return a new snapshot if the files' content changed, else None.
+
+    Files are only read when their stamps changed. A snapshot with the same
+    content hash (e.g. the file was touched or rewritten unchanged) is
+    published right away so its stamps are not re-read every time. Files
+    that cannot be read or parsed (e.g. mid-write) are skipped and retried
+    on the next call. The returned snapshot is not published.
+    """
+    current = get_schema_snapshot()
+    paths = (_get_schema_path(), _get_hints_path())
+    if paths == (current.schema_path, current.hints_path) and (
+        (_stamp(paths[0]), _stamp(paths[1])) == current.stamps
+    ):
+        return None
+    try:
+        snapshot = load_schema_snapshot()
+    except (OSError, ValueError) as exc:
+        logger.warning("Schema reload skipped, keeping version %s: %s", current.version, exc)
+        return None
+    if snapshot.version == current.version:
+        publish_schema_snapshot(snapshot)
+        return None
+    return snapshot
+
+
+def reset_schema_cache() -> None:
+    """Forget the active snapshot; the next access reloads from disk."""
+    global _snapshot
+    with _CACHE_LOCK:
+        _snapshot = None
+
+
+def get_schema() -> Dict[str, Any]:
+    """Return the Neo4j schema as a JSON dict (active snapshot)."""
+    return get_schema_snapshot().schema
+
+
+def get_schema_hints() -> Optional[Dict[str, Any]]:
+    """Return schema hints/clarifications if available (active snapshot)."""
+    return get_schema_snapshot().hints
+
+
+def get_schema_version() -> str:
+    """Return a short content hash of the schema and hints (active snapshot)."""
+    return get_schema_snapshot().version
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+schema_pruner.py
+Question-aware selection of the schema subset sent to the LLM.
+
+A small lexical index is built once over node labels, relationship types,
+property names and the ``relationships`` descriptions in the schema hints.
+For each question the matching labels and relationship types are selected,
+together with the relationship types that connect them (from ``_endpoints``).
+When too little of the question can be tied to the schema the full schema is
+used instead.
+
+Usage
+-----
+from src.schema_pruner import SchemaPruner
+pruner = SchemaPruner(schema, hints)
+result = pruner.prune("Which compounds treat hypertension?")
+result.schema, result.hints, result.pruned
+"""
+
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+_STOPWORDS = frozenset(
+    """
+    a about all an and any are as at be been by can do does each every find
+    for from get give has have how i in into is it its list many me more most
+    much my not of on or other show some than that the their them these they
+    this those to was were what when where which who whose why with without
+    would you your return query match count number
+    """.split()
+)
+
+
+def stem(word: str) -> str:
+    """Very small suffix stripper so "treats", "treated" and "treat" meet."""
+    if len(word) > 4 and word.endswith("ies"):
+        word = word[:-3] + "y"
+    elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    for suffix in ("ing", "ed"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            word = word[: -len(suffix)]
+            break
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text and identifiers (CamelCase, snake_case) into stemmed terms."""
+    terms = []
+    for raw in _WORD.findall(text.replace("_", " ")):
+        for part in _CAMEL_BOUNDARY.split(raw):
+            word = part.lower()
+            if word in _STOPWORDS or len(word) < 2:
+                continue
+            terms.append(stem(word))
+    return terms
+
+
+def _relationship_verb(rel_type: str) -> str:
+    """``TREATS_CtD`` -> ``TREATS``; types without a suffix are kept whole."""
+    head, sep, tail = rel_type.rpartition("_")
+    if sep and head and tail and any(c.islower() for c in tail):
+        return head
+    return rel_type
+
+
+@dataclass
+class PruneResult:
+    schema: Dict[str, Any]
+    hints: Optional[Dict[str, Any]]
+    pruned: bool
+    confidence: float
+    labels: List[str]
+    relationships: List[str]
+
+
+class SchemaPruner:
+    """Lexical index over one schema/hints pair."""
+
+    def __init__(
+        self,
+        schema: Dict[str, Any],
+        hints: Optional[Dict[str, Any]] = None,
+        min_confidence: float = 0.15,
+        max_fraction: float = 0.8,
+    ):
+        self.schema = schema
+        self.hints = hints
+        self.min_confidence = min_confidence
+        self.max_fraction = max_fraction
+        self._node_types: Dict[str, Dict[str, Any]] = schema.get("NodeTypes", {})
+        self._rel_types: Dict[str, Dict[str, Any]] = schema.get("RelationshipTypes", {})
+        rel_hints = (hints or {}).get("relationships") or {}
+
+        self._label_terms: Dict[str, Set[str]] = {}
+        self._rel_terms: Dict[str, Set[str]] = {}
+        self._property_terms: Dict[str, Set[str]] = {}
+        self._endpoints: Dict[str, List[str]] = {}
+        self._incident: Dict[str, Set[str]] = {label: set() for label in self._node_types}
+
+        for label, props in self._node_types.items():
+            self._label_terms[label] = set(tokenize(label))
+            self._index_properties(label, props)
+
+        for rel_type, props in self._rel_types.items():
+            endpoints = [
+                ep for ep in (props.get("_endpoints") or []) if ep in self._node_types
+            ]
+            self._endpoints[rel_type] = endpoints
+            for ep in endpoints:
+                self._incident[ep].add(rel_type)
+            endpoint_terms = set()
+            for ep in endpoints:
+                endpoint_terms |= self._label_terms[ep]
+            terms = set(tokenize(_relationship_verb(rel_type)))
+            description = rel_hints.get(rel_type)
+            if isinstance(description, str):
+                terms |= set(tokenize(description)) - endpoint_terms
+            self._rel_terms[rel_type] = terms
+            self._index_properties(rel_type, props)
+
+        # Properties shared by most labels ("name", "identifier", ...) say
+        # nothing about which part of the schema a question is about.
+        shared_limit = max(2, len(self._node_types) // 2)
+        self._property_terms = {
+            term: owners
+            for term, owners in self._property_terms.items()
+            if len(owners) <= shared_limit
+        }
+        self._known_terms: Set[str] = set(self._property_terms)
+        for terms in self._label_terms.values():
+            self._known_terms |= terms
+        for terms in self._rel_terms.values():
+            self._known_terms |= terms
+
+        self._lock = Lock()
+        self.requests = 0
+        self.pruned_requests = 0
+        self.full_schema_tokens = 0
+        self.sent_schema_tokens = 0
+
+    def _index_properties(self, owner: str, props: Dict[str, Any]) -> None:
+        for prop in props:
+            if prop.startswith("_"):
+                continue
+            for term in tokenize(prop):
+                self._property_terms.setdefault(term, set()).add(owner)
+
+    def _select(self, terms: Iterable[str]) -> tuple[Set[str], Set[str]]:
+        term_set = set(terms)
+        labels = {
+            label for label, label_terms in self._label_terms.items()
+            if label_terms & term_set
+        }
+        rels = {rel for rel, rel_terms in self._rel_terms.items() if rel_terms & term_set}
+        for term in term_set:
+            for owner in self._property_terms.get(term, ()):
+                if owner in self._node_types:
+                    labels.add(owner)
+                else:
+                    rels.add(owner)
+
+        # A matched verb only counts when it touches a matched label, unless
+        # the question named no label at all.
+        if labels:
+            rels = {
+                rel for rel in rels
+                if not self._endpoints[rel] or labels & set(self._endpoints[rel])
+            }
+
+        for rel in rels:
+            labels.update(self._endpoints[rel])
+        for rel, endpoints in self._endpoints.items():
+            if endpoints and set(endpoints) <= labels:
+                rels.add(rel)
+        for label in list(labels):
+            if not any(label in self._endpoints[rel] for rel in rels):
+                rels |= self._incident[label]
+        for rel in rels:
+            labels.update(self._endpoints[rel])
+        return labels, rels
+
+    def prune(self, question: str) -> PruneResult:
+        terms = tokenize(question)
+        content_terms = [t for t in terms if not t.isdigit()]
+        matched = [t for t in content_terms if t in self._known_terms]
+        confidence = len(matched) / len(content_terms) if content_terms else 0.0
+        labels, rels = self._select(matched)
+
+        total = len(self._node_types) + len(self._rel_types)
+        too_large = total and (len(labels) + len(rels)) > self.max_fraction * total
+        if (
+            not (labels or rels)
+            or confidence < self.min_confidence
+            or too_large
+        ):
+            return PruneResult(
+                schema=self.schema,
+                hints=self.hints,
+                pruned=False,
+                confidence=confidence,
+                labels=sorted(self._node_types),
+                relationships=sorted(self._rel_types),
+            )
+
+        schema = {
+            "NodeTypes": {l: self._node_types[l] for l in sorted(labels)},
+            "RelationshipTypes": {r: self._rel_types[r] for r in sorted(rels)},
+        }
+        hints = None
+        if self.hints:
+            hints = dict(self.hints)
+            rel_hints = self.hints.get("relationships")
+            if isinstance(rel_hints, dict):
+                hints["relationships"] = {
+                    r: text for r, text in rel_hints.items() if r in rels
+                }
+        return PruneResult(
+            schema=schema,
+            hints=hints,
+            pruned=True,
+            confidence=confidence,
+            labels=sorted(labels),
+            relationships=sorted(rels),
+        )
+
+    def record(self, result: PruneResult, full_tokens: int, sent_tokens: int) -> None:
+        """Accumulate per-request token savings for :meth:`stats`."""
+        with self._lock:
+            self.requests += 1
+            if result.pruned:
+                self.pruned_requests += 1
+            self.full_schema_tokens += full_tokens
+            self.sent_schema_tokens += sent_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            saved = self.full_schema_tokens - self.sent_schema_tokens
+            return {
+                "requests": self.requests,
+                "pruned_requests": self.pruned_requests,
+                "fallbacks": self.requests - self.pruned_requests,
+                "full_schema_tokens": self.full_schema_tokens,
+                "sent_schema_tokens": self.sent_schema_tokens,
+                "saved_tokens": saved,
+                "saved_ratio": (saved / self.full_schema_tokens) if self.full_schema_tokens else 0.0,
+            }
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+schema_render.py
+Renderers that turn the schema JSON and hints into prompt text.
+
+``compact`` (default) emits one line per label and relationship type, with
+properties grouped by type:
+
+    (:Compound {identifier,name:String})
+    (:Compound)-[:TREATS_CtD]->(:Disease)
+
+``json`` keeps the original indented JSON. Additional formats can be added
+with :func:`register_renderer`.
+
+Usage
+-----
+from src.schema_render import render_schema
+text = render_schema(schema, hints, "compact")
+"""
+
+from __future__ import annotations
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+Renderer = Callable[[Dict[str, Any], Optional[Dict[str, Any]]], str]
+
+DEFAULT_FORMAT = "compact"
+_RENDERERS: Dict[str, Renderer] = {}
+
+
+def register_renderer(name: str, renderer: Renderer) -> None:
+    """Register a schema renderer under ``name`` (replaces any existing one)."""
+    _RENDERERS[name] = renderer
+
+
+def available_formats() -> List[str]:
+    return sorted(_RENDERERS)
+
+
+def render_schema(
+    schema: Dict[str, Any],
+    hints: Optional[Dict[str, Any]] = None,
+    fmt: str = DEFAULT_FORMAT,
+) -> str:
+    """Return the schema (and hints, when given) rendered in ``fmt``."""
+    renderer = _RENDERERS.get(fmt)
+    if renderer is None:
+        raise ValueError(
+            f"Unknown schema format: {fmt} (available: {', '.join(available_formats())})"
+        )
+    return renderer(schema, hints)
+
+
+# ── json ─────────────────────────────────────────────────────────────
+def render_json(schema: Dict[str, Any], hints: Optional[Dict[str, Any]] = None) -> str:
+    text = "### Schema\n" + json.dumps(schema, indent=2)
+    if hints:
+        text += "\n\n### Schema Hints\n" + json.dumps(hints, indent=2)
+    return text
+
+
+# ── compact ──────────────────────────────────────────────────────────
+def _format_properties(props: Dict[str, Any]) -> str:
+    """``{a: String, b: String, c: Long}`` -> `` {a,b:String, c:Long}``."""
+    by_type: Dict[str, List[str]] = {}
+    for name, prop_type in props.items():
+        if name.startswith("_"):
+            continue
+        type_name = str(prop_type).replace(", ", "|") or "Unknown"
+        by_type.setdefault(type_name, []).append(name)
+    if not by_type:
+        return ""
+    groups = [f"{','.join(names)}:{type_name}" for type_name, names in by_type.items()]
+    return " {" + ", ".join(groups) + "}"
+
+
+def _node(label: Optional[str]) -> str:
+    if not label or label == "Unknown":
+        return "()"
+    return f"(:{label})"
+
+
+def render_compact(schema: Dict[str, Any], hints: Optional[Dict[str, Any]] = None) -> str:
+    lines = ["### Schema", "Nodes:"]
+    for label, props in schema.get("NodeTypes", {}).items():
+        lines.append(f"(:{label}{_format_properties(props)})")
+    lines.append("Relationships:")
+    for rel_type, props in schema.get("RelationshipTypes", {}).items():
+        endpoints = props.get("_endpoints") or ["Unknown", "Unknown"]
+        source, target = (list(endpoints) + ["Unknown", "Unknown"])[:2]
+        lines.append(
+            f"{_node(source)}-[:{rel_type}{_format_properties(props)}]->{_node(target)}"
+        )
+    if hints:
+        lines.extend(["", "### Schema Hints"])
+        for section, entries in hints.items():
+            if isinstance(entries, dict):
+                lines.append(f"{section}:")
+                lines.extend(f"{key}: {value}" for key, value in entries.items())
+            else:
+                lines.append(f"{section}: {json.dumps(entries, separators=(',', ':'))}")
+    return "\n".join(lines)
+
+
+register_renderer("json", render_json)
+register_renderer("compact", render_compact)
@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+"""
+session_store.py
+Per-session state shared by the agents and the API: chat history, OpenAI
+Assistant thread ids and the per-session run mutex.
+
+Two backends are available, selected with ``SESSION_STORE``:
+
+- ``memory`` (default) keeps everything in process; use one worker.
+- ``redis`` keeps state in any Redis-protocol server (``REDIS_URL``) so
+  several uvicorn workers or pods can serve the same sessions. Run locks are
+  leases (``SET NX PX``) that are renewed while held and expire if the
+  holder dies.
+
+Usage
+-----
+from src.session_store import get_session_store
+store = get_session_store()
+store.append_messages("s1", [HumanMessage("hi"), AIMessage("RETURN 1")])
+async with await store.get_run_lock("s1"):
+    ...
+"""
+
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock, RLock
+from typing import Any, Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+MAX_HISTORY_MESSAGES = max(2, int(os.getenv("MAX_HISTORY_MESSAGES", "40")))
+MAX_HISTORY_SESSIONS = max(1, int(os.getenv("MAX_HISTORY_SESSIONS", "500")))
+# Approximate ceiling on resident history memory across sessions (0 disables).
+MAX_HISTORY_BYTES = max(0, int(os.getenv("MAX_HISTORY_BYTES", str(64 * 1024 * 1024))))
+ASSISTANT_MAX_SESSIONS = max(1, int(os.getenv("ASSISTANT_MAX_SESSIONS", "200")))
+MAX_SESSION_RUN_LOCKS = max(1, int(os.getenv("MAX_SESSION_RUN_LOCKS", "1000")))
+SESSION_TTL_SECONDS = max(60, int(os.getenv("SESSION_TTL_SECONDS", "86400")))
+SESSION_LOCK_LEASE_SECONDS = max(1.0, float(os.getenv("SESSION_LOCK_LEASE_SECONDS", "30")))
+SESSION_LOCK_TIMEOUT_SECONDS = max(1.0, float(os.getenv("SESSION_LOCK_TIMEOUT_SECONDS", "300")))
+
+
+def message_to_dict(msg: BaseMessage) -> Dict[str, Optional[str]]:
+    role = "assistant" if isinstance(msg, AIMessage) else "user"
+    item: Dict[str, Optional[str]] = {"role": role, "content": msg.content}
+    if role == "assistant":
+        item["provider"] = (getattr(msg, "additional_kwargs", {}) or {}).get("provider")
+    return item
+
+
+def message_from_dict(item: Dict[str, Any]) -> BaseMessage:
+    if item.get("role") == "assistant":
+        kwargs = {"provider": item["provider"]} if item.get("provider") else {}
+        return AIMessage(content=item.get("content", ""), additional_kwargs=kwargs)
+    return HumanMessage(content=item.get("content", ""))
+
+
+class HistoryRecord:
+    """Compact stored form of one chat message.
+
+    Provider names are interned so every record shares one string; records
+    become LangChain messages only when a prompt or payload is built.
+    """
+
+    __slots__ = ("role", "content", "provider")
+
+    def __init__(self, role: str, content: str, provider: Optional[str] = None):
+        self.role = sys.intern(role)
+        self.content = content
+        self.provider = sys.intern(provider) if provider else None
+
+    @classmethod
+    def from_message(cls, msg: BaseMessage) -> "HistoryRecord":
+        content = msg.content if isinstance(msg.content, str) else str(msg.content)
+        if isinstance(msg, AIMessage):
+            provider = (msg.additional_kwargs or {}).get("provider")
+            return cls("assistant", content, provider)
+        return cls("user", content)
+
+    def to_message(self) -> BaseMessage:
+        if self.role == "assistant":
+            kwargs = {"provider": self.provider} if self.provider else {}
+            return AIMessage(content=self.content, additional_kwargs=kwargs)
+        return HumanMessage(content=self.content)
+
+    def nbytes(self) -> int:
+        """Approximate resident size: the record, its list slot and its text."""
+        return _RECORD_OVERHEAD + sys.getsizeof(self.content)
+
+
+_RECORD_OVERHEAD = sys.getsizeof(HistoryRecord("user", "")) - sys.getsizeof("") + 8
+# Per-session cost of the list and the OrderedDict entry holding it.
+_SESSION_OVERHEAD = sys.getsizeof([]) + 100
+
+
+class SessionStore(ABC):
+    """Backend interface.
+
+    History methods come in sync and async flavours: the sync ones serve the
+    CLI and helpers, the async ones the API. The default async versions call
+    the sync ones, which is right for in-process backends.
+    """
+
+    max_history_messages: int = MAX_HISTORY_MESSAGES
+
+    # ── history ──────────────────────────────────────────────────────
+    @abstractmethod
+    def get_messages(self, session_id: str) -> List[BaseMessage]:
+        """Return a copy of the session's messages, oldest first."""
+
+    @abstractmethod
+    def append_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        """Append messages and trim the session to ``max_history_messages``."""
+
+    @abstractmethod
+    def clear_history(self, session_id: Optional[str] = None) -> None:
+        """Clear one session, or every session when ``session_id`` is None."""
+
+    async def aget_messages(self, session_id: str) -> List[BaseMessage]:
+        return self.get_messages(session_id)
+
+    async def aappend_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        self.append_messages(session_id, messages)
+
+    async def aclear_history(self, session_id: Optional[str] = None) -> None:
+        self.clear_history(session_id)
+
+    # ── assistant threads ────────────────────────────────────────────
+    @abstractmethod
+    async def get_assistant_thread(self, session_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set_assistant_thread(self, session_id: str, thread_id: str) -> None:
+        ...
+
+    @abstractmethod
+    async def delete_assistant_thread(self, session_id: str) -> None:
+        ...
+
+    # ── run mutex ────────────────────────────────────────────────────
+    @abstractmethod
+    async def get_run_lock(self, session_id: str):
+        """Return the session's run mutex, used as ``async with lock:``."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__}
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store with LRU bounds on sessions, threads and locks.
+
+    Each map is an ``OrderedDict`` kept in recency order (most recent last),
+    so touching and evicting a session are O(1) regardless of how many
+    sessions are held. History is kept as :class:`HistoryRecord` lists under
+    a global byte budget (``max_history_bytes``): least recently used
+    sessions are dropped first, then the oldest messages of the session
+    being written.
+    """
+
+    def __init__(
+        self,
+        max_history_messages: int = MAX_HISTORY_MESSAGES,
+        max_sessions: int = MAX_HISTORY_SESSIONS,
+        max_assistant_sessions: int = ASSISTANT_MAX_SESSIONS,
+        max_run_locks: int = MAX_SESSION_RUN_LOCKS,
+        max_history_bytes: int = MAX_HISTORY_BYTES,
+    ):
+        self.max_history_messages = max_history_messages
+        self.max_sessions = max_sessions
+        self.max_assistant_sessions = max_assistant_sessions
+        self.max_run_locks = max_run_locks
+        self.max_history_bytes = max_history_bytes
+
+        self.histories: "OrderedDict[str, List[HistoryRecord]]" = OrderedDict()
+        self.history_bytes = 0
+        self.history_messages = 0
+        self.byte_evictions = 0
+        self.session_evictions = 0
+        self._history_lock = RLock()
+
+        self.assistant_threads: "OrderedDict[str, str]" = OrderedDict()
+        self.assistant_thread_evictions = 0
+
+        self.run_locks: "OrderedDict[str, asyncio.Lock]" = OrderedDict()
+        self.run_lock_evictions = 0
+        self._run_locks_guard = Lock()
+
+    # ── history ──────────────────────────────────────────────────────
+    @staticmethod
+    def _session_bytes(history: List[HistoryRecord]) -> int:
+        return _SESSION_OVERHEAD + sum(record.nbytes() for record in history)
+
+    def _drop_session_locked(self, session_id: str) -> None:
+        history = self.histories.pop(session_id)
+        self.history_bytes -= self._session_bytes(history)
+        self.history_messages -= len(history)
+
+    def _trim_session_locked(self, history: List[HistoryRecord], count: int) -> None:
+        for record in history[:count]:
+            self.history_bytes -= record.nbytes()
+        self.history_messages -= count
+        del history[:count]
+
+    def _touch_history_locked(self, session_id: str) -> None:
+        """Mark a session most recent and evict the oldest. Caller must hold _history_lock."""
+        self.histories.move_to_end(session_id)
+        while len(self.histories) > self.max_sessions:
+            self._drop_session_locked(next(iter(self.histories)))
+            self.session_evictions += 1
+
+    def _enforce_byte_budget_locked(self, session_id: str) -> None:
+        """Evict LRU sessions, then trim ``session_id``, until under budget."""
+        if not self.max_history_bytes:
+            return
+        while self.history_bytes > self.max_history_bytes and len(self.histories) > 1:
+            oldest = next(iter(self.histories))
+            if oldest == session_id:
+                break
+            self._drop_session_locked(oldest)
+            self.byte_evictions += 1
+        history = self.histories.get(session_id)
+        while history and len(history) > 2 and self.history_bytes > self.max_history_bytes:
+            self._trim_session_locked(history, 2)
+
+    def get_messages(self, session_id: str) -> List[BaseMessage]:
+        with self._history_lock:
+            history = self.histories.get(session_id)
+            if history is None:
+                return []
+            self._touch_history_locked(session_id)
+            records = list(history)
+        return [record.to_message() for record in records]
+
+    def append_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        records = [HistoryRecord.from_message(msg) for msg in messages]
+        with self._history_lock:
+            history = self.histories.get(session_id)
+            if history is None:
+                history = self.histories[session_id] = []
+                self.history_bytes += _SESSION_OVERHEAD
+            history.extend(records)
+            self.history_bytes += sum(record.nbytes() for record in records)
+            self.history_messages += len(records)
+            excess = len(history) - self.max_history_messages
+            if excess > 0:
+                self._trim_session_locked(history, excess)
+            self._touch_history_locked(session_id)
+            self._enforce_byte_budget_locked(session_id)
+
+    def clear_history(self, session_id: Optional[str] = None) -> None:
+        with self._history_lock:
+            if session_id is None:
+                self.histories.clear()
+                self.history_bytes = 0
+                self.history_messages = 0
+            elif session_id in self.histories:
+                self._drop_session_locked(session_id)
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Approximate resident size of the stored histories."""
+        with self._history_lock:
+            return {
+                "history_sessions": len(self.histories),
+                "history_messages": self.history_messages,
+                "history_bytes": self.history_bytes,
+                "max_history_bytes": self.max_history_bytes,
+                "byte_evictions": self.byte_evictions,
+                "session_evictions": self.session_evictions,
+            }
+
+    # ── assistant threads ────────────────────────────────────────────
+    async def get_assistant_thread(self, session_id: str) -> Optional[str]:
+        thread_id = self.assistant_threads.get(session_id)
+        if thread_id is not None:
+            self.assistant_threads.move_to_end(session_id)
+        return thread_id
+
+    async def set_assistant_thread(self, session_id: str, thread_id: str) -> None:
+        self.assistant_threads[session_id] = thread_id
+        self.assistant_threads.move_to_end(session_id)
+        while len(self.assistant_threads) > self.max_assistant_sessions:
+            self.assistant_threads.popitem(last=False)
+            self.assistant_thread_evictions += 1
+
+    async def delete_assistant_thread(self, session_id: str) -> None:
+        self.assistant_threads.pop(session_id, None)
+
+    # ── run mutex ────────────────────────────────────────────────────
+    def _evict_run_locks_locked(self) -> None:
+        """Evict the oldest idle run locks. Caller must hold _run_locks_guard.
+
+        A held lock is in use, so it is rotated to the recent end rather
+        than evicted; the newest entry (the caller's) is never reached.
+        """
+        skipped = 0
+        while len(self.run_locks) > self.max_run_locks and skipped < len(self.run_locks) - 1:
+            session_id, lock = next(iter(self.run_locks.items()))
+            if lock.locked():
+                self.run_locks.move_to_end(session_id)
+                skipped += 1
+                continue
+            del self.run_locks[session_id]
+            self.run_lock_evictions += 1
+
+    async def get_run_lock(self, session_id: str) -> asyncio.Lock:
+        with self._run_locks_guard:
+            lock = self.run_locks.get(session_id)
+            if lock is None:
+                lock = asyncio.Lock()
+                self.run_locks[session_id] = lock
+            else:
+                self.run_locks.move_to_end(session_id)
+            self._evict_run_locks_locked()
+            return lock
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            **self.memory_stats(),
+            "assistant_threads": len(self.assistant_threads),
+            "assistant_thread_evictions": self.assistant_thread_evictions,
+            "run_locks": len(self.run_locks),
+            "run_lock_evictions": self.run_lock_evictions,
+        }
+
+
+# ── Redis backend ────────────────────────────────────────────────────
+# Delete / extend the lock only while it still holds our token.
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+_EXTEND_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisLeaseLock:
+    """Distributed session mutex backed by a leased Redis key.
+
+    While held, the lease is renewed every third of its length; if the
+    holder dies the key expires and another worker can take over.
+    """
+
+    def __init__(
+        self,
+        client,
+        key: str,
+        lease_seconds: float = SESSION_LOCK_LEASE_SECONDS,
+        timeout_seconds: float = SESSION_LOCK_TIMEOUT_SECONDS,
+        min_retry_seconds: float = 0.01,
+        max_retry_seconds: float = 0.2,
+    ):
+        self._client = client
+        self.key = key
+        self.lease_ms = int(lease_seconds * 1000)
+        self.timeout_seconds = timeout_seconds
+        self.min_retry_seconds = min_retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._token: Optional[str] = None
+        self._renewer: Optional[asyncio.Task] = None
+
+    def locked(self) -> bool:
+        """Return True while this lock object holds the lease."""
+        return self._token is not None
+
+    async def acquire(self) -> bool:
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.timeout_seconds
+        delay = self.min_retry_seconds
+        while not await self._client.set(self.key, token, nx=True, px=self.lease_ms):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out waiting for session lock {self.key}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_seconds)
+        self._token = token
+        self._renewer = asyncio.create_task(self._renew(token))
+        return True
+
+    async def _renew(self, token: str) -> None:
+        interval = self.lease_ms / 3000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                renewed = await self._client.eval(
+                    _EXTEND_LOCK_SCRIPT, 1, self.key, token, self.lease_ms
+                )
+            except Exception:
+                logger.warning("Failed to renew session lock %s", self.key, exc_info=True)
+                continue
+            if not renewed:
+                logger.warning("Session lock %s lease was lost", self.key)
+                return
+
+    async def release(self) -> None:
+        token, self._token = self._token, None
+        if self._renewer is not None:
+            self._renewer.cancel()
+            self._renewer = None
+        if token is not None:
+            await self._client.eval(_RELEASE_LOCK_SCRIPT, 1, self.key, token)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+
+
+class RedisSessionStore(SessionStore):
+    """Store for any Redis-protocol server.
+
+    History is a capped list of JSON messages per session, thread ids are
+    plain strings, and both expire after ``ttl_seconds`` of inactivity
+    instead of being LRU-evicted. ``client``/``async_client`` can be passed
+    in directly (e.g. a local stand-in); otherwise they are created from
+    ``url`` with redis-py.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        prefix: str = "t2c",
+        max_history_messages: int = MAX_HISTORY_MESSAGES,
+        ttl_seconds: int = SESSION_TTL_SECONDS,
+        lock_lease_seconds: float = SESSION_LOCK_LEASE_SECONDS,
+        lock_timeout_seconds: float = SESSION_LOCK_TIMEOUT_SECONDS,
+        client=None,
+        async_client=None,
+    ):
+        if client is None or async_client is None:
+            try:
+                import redis
+                import redis.asyncio
+            except ImportError as exc:  # pragma: no cover - optional dependency
+                raise RuntimeError(
+                    "SESSION_STORE=redis requires the 'redis' package (pip install redis)."
+                ) from exc
+            url = url or "redis://localhost:6379/0"
+            client = client or redis.Redis.from_url(url, decode_responses=True)
+            async_client = async_client or redis.asyncio.Redis.from_url(
+                url, decode_responses=True
+            )
+        self._client = client
+        self._async_client = async_client
+        self.prefix = prefix
+        self.max_history_messages = max_history_messages
+        self.ttl_seconds = ttl_seconds
+        self.lock_lease_seconds = lock_lease_seconds
+        self.lock_timeout_seconds = lock_timeout_seconds
+
+    def _key(self, kind: str, session_id: str) -> str:
+        return f"{self.prefix}:{kind}:{session_id}"
+
+    @staticmethod
+    def _decode(raw_items) -> List[BaseMessage]:
+        return [message_from_dict(json.loads(raw)) for raw in raw_items]
+
+    def _append_pipeline(self, pipe, session_id: str, messages: Sequence[BaseMessage]):
+        key = self._key("hist", session_id)
+        pipe.rpush(key, *(json.dumps(message_to_dict(m)) for m in messages))
+        pipe.ltrim(key, -self.max_history_messages, -1)
+        pipe.expire(key, self.ttl_seconds)
+        return pipe
+
+    # ── history ──────────────────────────────────────────────────────
+    def get_messages(self, session_id: str) -> List[BaseMessage]:
+        return self._decode(self._client.lrange(self._key("hist", session_id), 0, -1))
+
+    def append_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        if messages:
+            self._append_pipeline(self._client.pipeline(transaction=True), session_id, messages).execute()
+
+    def clear_history(self, session_id: Optional[str] = None) -> None:
+        if session_id is not None:
+            self._client.delete(self._key("hist", session_id))
+            return
+        keys = list(self._client.scan_iter(match=self._key("hist", "*")))
+        if keys:
+            self._client.delete(*keys)
+
+    async def aget_messages(self, session_id: str) -> List[BaseMessage]:
+        return self._decode(await self._async_client.lrange(self._key("hist", session_id), 0, -1))
+
+    async def aappend_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        if messages:
+            pipe = self._async_client.pipeline(transaction=True)
+            await self._append_pipeline(pipe, session_id, messages).execute()
+
+    async def aclear_history(self, session_id: Optional[str] = None) -> None:
+        if session_id is not None:
+            await self._async_client.delete(self._key("hist", session_id))
+            return
+        keys = [key async for key in self._async_client.scan_iter(match=self._key("hist", "*"))]
+        if keys:
+            await self._async_client.delete(*keys)
+
+    # ── assistant threads ────────────────────────────────────────────
+    async def get_assistant_thread(self, session_id: str) -> Optional[str]:
+        key = self._key("asst", session_id)
+        thread_id = await self._async_client.get(key)
+        if thread_id is not None:
+            await self._async_client.expire(key, self.ttl_seconds)
+        return thread_id
+
+    async def set_assistant_thread(self, session_id: str, thread_id: str) -> None:
+        await self._async_client.set(self._key("asst", session_id), thread_id, ex=self.ttl_seconds)
+
+    async def delete_assistant_thread(self, session_id: str) -> None:
+        await self._async_client.delete(self._key("asst", session_id))
+
+    # ── run mutex ────────────────────────────────────────────────────
+    async def get_run_lock(self, session_id: str) -> RedisLeaseLock:
+        return RedisLeaseLock(
+            self._async_client,
+            self._key("lock", session_id),
+            lease_seconds=self.lock_lease_seconds,
+            timeout_seconds=self.lock_timeout_seconds,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "prefix": self.prefix}
+
+
+_STORE: Optional[SessionStore] = None
+_STORE_LOCK = Lock()
+
+
+def create_session_store(backend: Optional[str] = None) -> SessionStore:
+    backend = (backend or os.getenv("SESSION_STORE", "memory")).strip().lower()
+    if backend == "memory":
+        return InMemorySessionStore()
+    if backend == "redis":
+        return RedisSessionStore(
+            url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            prefix=os.getenv("SESSION_STORE_PREFIX", "t2c"),
+        )
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store (created on first use)."""
+    global _STORE
+    if _STORE is not None:
+        return _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = create_session_store()
+    return _STORE
+
+
+def set_session_store(store: SessionStore) -> None:
+    """Replace the process-wide session store (tests, embedding)."""
+    global _STORE
+    with _STORE_LOCK:
+        _STORE = store
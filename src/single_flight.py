@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+single_flight.py
+Share one in-flight call among concurrent callers asking for the same key.
+
+The first caller for a key becomes the leader and does the work; callers
+arriving while it runs wait for the leader's result instead of starting
+their own call. Nothing is kept once the call finishes (that is the
+response cache's job), so only truly concurrent requests are coalesced.
+If the leader fails, its followers see the same error; if the leader is
+cancelled (e.g. its client went away), a follower takes over.
+
+A disabled instance never coalesces: every caller leads its own call.
+
+Usage
+-----
+from src.single_flight import SingleFlight
+flight = SingleFlight()
+answer, shared = await flight.do(key, lambda: agent.arespond(question, session_id))
+"""
+
+from __future__ import annotations
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _LeaderCancelled(Exception):
+    """The leader was cancelled before it produced a result."""
+
+
+class Call:
+    """The leader's handle: set ``result`` before leaving :meth:`SingleFlight.lead`."""
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.result: Any = None
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def follow(self, key: Hashable) -> Tuple[bool, Any]:
+        """Wait for an in-flight call on ``key``: ``(True, result)``, or
+        ``(False, None)`` when there is none and the caller should lead."""
+        while self.enabled:
+            future = self._calls.get(key)
+            if future is None:
+                return False, None
+            try:
+                # Shielded: a follower giving up must not cancel the leader.
+                result = await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+            self.followers += 1
+            return True, result
+        return False, None
+
+    @asynccontextmanager
+    async def lead(self, key: Hashable) -> AsyncIterator[Call]:
+        """Register the caller as the leader for ``key`` for the block.
+
+        Call :meth:`follow` first, with no await in between, so only one
+        leader per key is ever registered.
+        """
+        future = asyncio.get_running_loop().create_future()
+        call = Call(future)
+        if not self.enabled:
+            yield call
+            return
+        self._calls[key] = future
+        self.leaders += 1
+        try:
+            yield call
+        except BaseException as exc:
+            error = exc if isinstance(exc, Exception) else _LeaderCancelled()
+            future.set_exception(error)
+            future.exception()  # retrieved here so an unawaited error is not logged
+            raise
+        else:
+            future.set_result(call.result)
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return ``(result, shared)``: ``fn()``'s result, or the in-flight
+        leader's result (``shared=True``) when one is already running."""
+        shared, result = await self.follow(key)
+        if shared:
+            return result, True
+        async with self.lead(key) as call:
+            call.result = await fn()
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "leaders": self.leaders, "followers": self.followers}
@@ -1,55 +1,275 @@
 #!/usr/bin/env python3
-import json
+import asyncio
+import hashlib
+import logging
 import os
+import re
 import sys
-import time
-from threading import RLock
-from typing import Dict, Optional
+from contextvars import ContextVar
+from functools import lru_cache
+from threading import Lock, RLock
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_core.messages import AIMessage, HumanMessage
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.messages.ai import add_usage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-from src.utils import get_env_variable
-from src.schema_loader import get_schema, get_schema_hints
+from src.cypher_validator import get_cypher_validator, looks_like_cypher
+from src.example_store import (
+    EXAMPLE_DIRECT_MIN_SIMILARITY,
+    EXAMPLE_DIRECT_RETURN,
+    EXAMPLES_ENABLED,
+    FEW_SHOT_EXAMPLES,
+    aget_example_store,
+    get_example_store,
+)
+from src.query_executor import get_query_executor
+from src.query_plan import VERDICT_UNKNOWN, PlanCost, analyze_plan
+from src.history_window import HistoryAssembler, HistoryWindow, count_tokens
+from src.metrics import TOKENS, timed
+from src.utils import estimate_tokens, get_env_variable, parse_bool
+from src.schema_loader import (
+    SchemaSnapshot,
+    get_schema,
+    get_schema_hints,
+    get_schema_snapshot,
+    get_schema_version,
+)
+from src.schema_pruner import SchemaPruner
+from src.schema_render import DEFAULT_FORMAT, render_schema
+from src.session_store import get_session_store, message_to_dict
 
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-# Histories are keyed by browser session id and shared across providers.
-_SESSION_HISTORIES: Dict[str, ChatMessageHistory] = {}
-_SESSION_LAST_USED: Dict[str, float] = {}
-_HISTORY_LOCK = RLock()
-MAX_HISTORY_MESSAGES = max(2, int(os.getenv("MAX_HISTORY_MESSAGES", "40")))
-MAX_HISTORY_SESSIONS = max(1, int(os.getenv("MAX_HISTORY_SESSIONS", "500")))
+# Histories are keyed by browser session id and shared across providers; they
+# live in the session store (src/session_store.py).
+SCHEMA_PRUNING = parse_bool(os.getenv("SCHEMA_PRUNING", "false"))
+SCHEMA_PRUNING_MIN_CONFIDENCE = float(os.getenv("SCHEMA_PRUNING_MIN_CONFIDENCE", "0.15"))
+SCHEMA_FORMAT = os.getenv("SCHEMA_FORMAT", DEFAULT_FORMAT)
+# Provider-side prompt caching controls (OpenAI prompt_cache_key routing).
+PROMPT_CACHING = parse_bool(os.getenv("PROMPT_CACHING", "true"), default=True)
+# Local schema check of generated Cypher; failures get targeted repair calls.
+CYPHER_VALIDATION = parse_bool(os.getenv("CYPHER_VALIDATION", "true"), default=True)
+CYPHER_REPAIR_ATTEMPTS = max(0, int(os.getenv("CYPHER_REPAIR_ATTEMPTS", "1")))
+# EXPLAIN cost check of generated Cypher on Neo4j (async paths only).
+QUERY_PREFLIGHT = parse_bool(os.getenv("QUERY_PREFLIGHT", "false"))
+PREFLIGHT_REGENERATE_ATTEMPTS = max(0, int(os.getenv("PREFLIGHT_REGENERATE_ATTEMPTS", "1")))
+
+# Token-budgeted history windows; summaries are shared across providers like
+# the histories themselves.
+_HISTORY_ASSEMBLER = HistoryAssembler()
+
+# Prompt token breakdown of the latest request in the current task/context.
+_PROMPT_USAGE: ContextVar[Optional[dict]] = ContextVar("prompt_usage", default=None)
+
+# Full system prompts keyed by (schema version, format), shared by all agents.
+_SYSTEM_PROMPTS: Dict[tuple, str] = {}
+_SYSTEM_PROMPTS_LOCK = RLock()
+_MAX_SYSTEM_PROMPTS = 8
 
 SYSTEM_RULES = (
     "You are a Cypher-generating assistant. Follow these rules:\n"
-    "1. Use *only* the node labels, relationship types and property names that appear in the JSON schema.\n"
+    "1. Use *only* the node labels, relationship types and property names that appear in the schema.\n"
     "2. If the user is revising a previous Cypher draft, update that draft; otherwise, generate a fresh query.\n"
     "3. Respond with **Cypher only** – no commentary or explanation.\n"
     "4. Return nodes and relationships only (omit scalar property values in RETURN).\n"
     "5. When the user mentions a label/relationship/property absent from the schema, first map it to the closest existing element (exact synonym, substring, or highest-similarity fuzzy match). Ask for clarification only if multiple matches are equally plausible, offering up to three suggestions.\n"
 )
 
-def make_llm(provider: str = "openai"):
-    """Return a Chat instance for the specified provider."""
+REPAIR_PROMPT = (
+    "The Cypher query above does not match the schema:\n{errors}\n"
+    "Fix these problems and respond with the corrected Cypher only."
+)
+PLAN_FEEDBACK_PROMPT = (
+    "EXPLAIN shows the Cypher query above would be expensive on the database:\n{findings}\n"
+    "Rewrite it so all patterns are connected, start from a specific node where the "
+    "question allows, and give variable-length paths an upper bound. "
+    "Respond with the rewritten Cypher only."
+)
+
+_PROVIDER_MODEL_ENV = {
+    "openai": "OPENAI_API_MODEL",
+    "google": "GOOGLE_MODEL",
+}
+
+
+def get_provider_model(provider: str) -> str:
+    """Return the configured model name for a provider ("" when unset)."""
+    env_name = _PROVIDER_MODEL_ENV.get(provider)
+    if env_name is None:
+        raise ValueError(f"Unknown provider: {provider}")
+    return os.getenv(env_name, "")
+
+
+def get_prompt_usage() -> Optional[dict]:
+    """Return the prompt token breakdown of the last request in this context."""
+    return _PROMPT_USAGE.get()
+
+
+def reset_prompt_usage() -> None:
+    """Forget the last request's token breakdown (e.g. before a cache lookup)."""
+    _PROMPT_USAGE.set(None)
+
+
+def set_prompt_usage(usage: Optional[dict]) -> None:
+    """Adopt a token breakdown recorded in another task (e.g. a hedged call)."""
+    _PROMPT_USAGE.set(usage)
+
+
+def clean_answer(text: str) -> str:
+    """Strip whitespace and Markdown code fences around a model answer."""
+    return text.strip().strip("` ")
+
+
+class RepairedAnswer(str):
+    """Final :meth:`Text2CypherAgent.astream` item replacing the text streamed so far.
+
+    Yielded after the stream when the streamed query failed validation or
+    the cost preflight and a follow-up call produced a better one.
+    """
+
+
+class StreamingAnswerCleaner:
+    """Incremental equivalent of :func:`clean_answer` for streamed chunks.
+
+    Leading whitespace/fence characters are dropped as they arrive; trailing
+    ones are held back until more text shows they are not the end.
+    """
+
+    _TRAILING = re.compile(r"[` ]*\s*\Z")
+
+    def __init__(self):
+        self._phase = 0  # 0: leading whitespace, 1: leading "` ", 2: body
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        if self._phase < 2:
+            idx = 0
+            while idx < len(text):
+                char = text[idx]
+                if self._phase == 0 and char.isspace():
+                    idx += 1
+                elif char in "` ":
+                    self._phase = 1
+                    idx += 1
+                else:
+                    self._phase = 2
+                    break
+            text = text[idx:]
+            if self._phase < 2:
+                return ""
+        buffered = self._pending + text
+        match = self._TRAILING.search(buffered)
+        self._pending = buffered[match.start():]
+        return buffered[:match.start()]
+
+
+async def aaccept_example(question: str, answer: str) -> bool:
+    """Keep ``answer`` to the standalone ``question`` as an example.
+
+    Called on an explicit acceptance only (a query that ran and returned
+    rows, or a user confirmation): an answer that merely passes the schema
+    check may still be wrong, and stored examples are reused as few-shot
+    examples and direct answers. The Cypher must pass the current schema
+    check. False when examples are off or nothing was stored.
+    """
+    if not EXAMPLES_ENABLED:
+        return False
+    cypher = clean_answer(answer)
+    snapshot = get_schema_snapshot()
+    if not looks_like_cypher(cypher) or get_cypher_validator(snapshot).validate(cypher).errors:
+        return False
+    store = await aget_example_store()
+    return await store.aadd(question, cypher, snapshot.version)
+
+
+def build_system_prompt(
+    schema: dict,
+    hints: Optional[dict] = None,
+    schema_format: Optional[str] = None,
+) -> str:
+    """Return the system prompt for a (possibly pruned) schema and hints."""
+    return SYSTEM_RULES + "\n" + render_schema(schema, hints, schema_format or SCHEMA_FORMAT)
+
+
+def get_system_prompt(
+    schema_format: Optional[str] = None,
+    snapshot: Optional[SchemaSnapshot] = None,
+) -> str:
+    """Return the full-schema system prompt, rendered once per schema version.
+
+    Uses ``snapshot`` when given (e.g. one not yet published during a
+    reload), otherwise the active schema.
+    """
+    version = snapshot.version if snapshot is not None else get_schema_version()
+    key = (version, schema_format or SCHEMA_FORMAT)
+    prompt = _SYSTEM_PROMPTS.get(key)
+    if prompt is not None:
+        return prompt
+    with _SYSTEM_PROMPTS_LOCK:
+        prompt = _SYSTEM_PROMPTS.get(key)
+        if prompt is None:
+            if snapshot is not None:
+                prompt = build_system_prompt(snapshot.schema, snapshot.hints, key[1])
+            else:
+                prompt = build_system_prompt(get_schema(), get_schema_hints(), key[1])
+            _SYSTEM_PROMPTS[key] = prompt
+            # Only the active version and the one being replaced are in use.
+            while len(_SYSTEM_PROMPTS) > _MAX_SYSTEM_PROMPTS:
+                del _SYSTEM_PROMPTS[next(iter(_SYSTEM_PROMPTS))]
+    return prompt
+
+
+def prompt_cache_key(schema_version: Optional[str] = None) -> str:
+    """Return the provider cache routing key for the current system prompt prefix."""
+    return f"text2cypher-{schema_version or get_schema_version()}-{SCHEMA_FORMAT}"
+
+
+@lru_cache(maxsize=64)
+def prompt_prefix_hash(system_prompt: str) -> str:
+    """Short digest of a system prompt, to check the cached prefix is byte-stable."""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def make_llm(provider: str = "openai", schema_version: Optional[str] = None):
+    """Return a Chat instance for the specified provider.
+
+    Both providers cache a repeated prompt prefix on their side: OpenAI
+    automatically for prompts over 1024 tokens (``prompt_cache_key`` keeps
+    requests with the same schema on the same cache), Gemini 2.5 implicitly.
+    The agent always sends the system prompt first and unchanged so the
+    prefix can hit those caches.
+
+    Provider packages are imported here, on first use, so a process only
+    pays for the providers it actually serves.
+    """
     if provider == "openai":
+        from langchain_openai import ChatOpenAI
+
+        base_url = get_env_variable(
+            "OPENAI_API_BASE_URL",
+            default="https://api.openai.com/v1",
+        )
+        kwargs = {}
+        # OpenAI-compatible servers may reject parameters they do not know.
+        if base_url.startswith("https://api.openai.com"):
+            kwargs["stream_usage"] = True
+            if PROMPT_CACHING:
+                kwargs["model_kwargs"] = {"prompt_cache_key": prompt_cache_key(schema_version)}
         return ChatOpenAI(
-            base_url=get_env_variable(
-                "OPENAI_API_BASE_URL",
-                default="https://api.openai.com/v1",
-            ),
+            base_url=base_url,
             api_key=get_env_variable("OPENAI_API_KEY"),
-            model=get_env_variable("OPENAI_API_MODEL")
+            model=get_env_variable(_PROVIDER_MODEL_ENV["openai"]),
+            **kwargs,
         )
     elif provider == "google":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
         return ChatGoogleGenerativeAI(
-            model=get_env_variable("GOOGLE_MODEL"),
+            model=get_env_variable(_PROVIDER_MODEL_ENV["google"]),
             google_api_key=get_env_variable("GOOGLE_API_KEY"),
             temperature=0
         )
@@ -59,100 +279,74 @@ def make_llm(provider: str = "openai"):
 class Text2CypherAgent:
     """Single‑LLM agent that remembers conversation context + schema."""
 
-    def __init__(self, provider: str = "openai"):
+    def __init__(self, provider: str = "openai", snapshot: Optional[SchemaSnapshot] = None):
         self.provider = provider
-        self.schema_json = get_schema()
-        self.schema_str = json.dumps(self.schema_json, indent=2)
-        self.hints = get_schema_hints()
-        
-        # Build system prompt with schema and optional hints
-        whole_schema = self.schema_str.replace('{', '{{').replace('}', '}}')
-        system_prompt = SYSTEM_RULES + "\n### Schema\n" + whole_schema
-        
-        if self.hints:
-            hints_str = json.dumps(self.hints, indent=2).replace('{', '{{').replace('}', '}}')
-            system_prompt += "\n\n### Schema Hints\n" + hints_str
-
-        self.llm = make_llm(provider)
-
-        # build prompt template with history placeholder
+        # The agent is pinned to one schema version; a reload builds new agents.
+        self.snapshot = snapshot
+        if snapshot is not None:
+            self.schema_json, self.hints = snapshot.schema, snapshot.hints
+            self.schema_version = snapshot.version
+        else:
+            self.schema_json = get_schema()
+            self.hints = get_schema_hints()
+            self.schema_version = get_schema_version()
+
+        # System prompt with schema and optional hints, shared across agents
+        self.system_prompt = get_system_prompt(snapshot=snapshot)
+        self.pruner: Optional[SchemaPruner] = None
+        if SCHEMA_PRUNING:
+            self.pruner = SchemaPruner(
+                self.schema_json,
+                self.hints,
+                min_confidence=SCHEMA_PRUNING_MIN_CONFIDENCE,
+            )
+            self.system_prompt_tokens = estimate_tokens(self.system_prompt)
+
+        self.llm = make_llm(provider, schema_version=self.schema_version)
+
+        # build prompt template with history placeholder; the system prompt is
+        # passed as a variable so it can be pruned per question.
         self.prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
+            ("system", "{system_prompt}"),
             MessagesPlaceholder(variable_name="history"),
             ("human", "{user_input}")
         ])
 
-        chain_core = self.prompt | self.llm
-
-        def get_history(session_id: str):
-            return self._get_or_create_history(session_id)
+        self.chain = self.prompt | self.llm
 
-        self.chain = RunnableWithMessageHistory(
-            chain_core,
-            get_history,
-            input_messages_key="user_input",
-            history_messages_key="history",
-        )
+        self._usage_lock = Lock()
+        self._usage_stats = {"requests": 0, "total": 0, "last": 0, "max": 0, "summarized_requests": 0}
+        self._cache_stats = {
+            "reported_requests": 0,
+            "input_tokens": 0,
+            "cached_input_tokens": 0,
+            "cache_hit_requests": 0,
+        }
+        self._validation_stats = {
+            "validated": 0,
+            "invalid": 0,
+            "repair_calls": 0,
+            "repaired": 0,
+            "unrepaired": 0,
+        }
+        self._preflight_stats = {
+            "checked": 0,
+            "unknown": 0,
+            "expensive": 0,
+            "regenerated": 0,
+        }
+        self._example_stats = {"prompts_with_examples": 0, "examples_sent": 0, "direct": 0}
 
     @staticmethod
-    def _touch_session_locked(session_id: str) -> None:
-        """Update session recency and evict old sessions. Caller must hold _HISTORY_LOCK."""
-        _SESSION_LAST_USED[session_id] = time.time()
-        while len(_SESSION_HISTORIES) > MAX_HISTORY_SESSIONS:
-            if not _SESSION_LAST_USED:
-                stale_session = next(
-                    (sid for sid in _SESSION_HISTORIES if sid != session_id),
-                    None,
-                )
-                if stale_session is None:
-                    break
-                _SESSION_HISTORIES.pop(stale_session, None)
-                continue
-            candidate_sessions = [
-                sid for sid in _SESSION_LAST_USED if sid != session_id
-            ]
-            if not candidate_sessions:
-                break
-            oldest_session = min(
-                candidate_sessions,
-                key=lambda sid: _SESSION_LAST_USED.get(sid, 0),
-            )
-            _SESSION_HISTORIES.pop(oldest_session, None)
-            _SESSION_LAST_USED.pop(oldest_session, None)
-
-    @staticmethod
-    def _get_or_create_history(session_id: str) -> ChatMessageHistory:
-        with _HISTORY_LOCK:
-            history = _SESSION_HISTORIES.get(session_id)
-            if history is None:
-                history = ChatMessageHistory()
-                _SESSION_HISTORIES[session_id] = history
-            Text2CypherAgent._touch_session_locked(session_id)
-            return history
-
-    @staticmethod
-    def _trim_history(session_id: str) -> None:
-        if MAX_HISTORY_MESSAGES <= 0:
-            return
-        with _HISTORY_LOCK:
-            history = _SESSION_HISTORIES.get(session_id)
-            if history is None:
-                return
-            Text2CypherAgent._touch_session_locked(session_id)
-            excess = len(history.messages) - MAX_HISTORY_MESSAGES
-            if excess > 0:
-                del history.messages[:excess]
+    def _history_to_payload(history_messages: list) -> list[dict[str, Optional[str]]]:
+        return [message_to_dict(msg) for msg in history_messages]
 
     @staticmethod
-    def _history_to_payload(history_messages: list) -> list[dict[str, Optional[str]]]:
-        payload = []
-        for msg in history_messages:
-            role = "assistant" if getattr(msg, "type", "") == "ai" else "user"
-            item = {"role": role, "content": msg.content}
-            if role == "assistant":
-                item["provider"] = getattr(msg, "additional_kwargs", {}).get("provider")
-            payload.append(item)
-        return payload
+    def _exchange(user_text: str, assistant_text: str, provider: str) -> List[BaseMessage]:
+        return [
+            HumanMessage(content=user_text),
+            AIMessage(content=assistant_text, additional_kwargs={"provider": provider}),
+        ]
 
     @staticmethod
     def append_external_exchange(
@@ -162,54 +356,445 @@ class Text2CypherAgent:
         provider: str = "assistant",
     ) -> None:
         """Append non-LangChain exchanges (OpenAI Assistant endpoint) to history."""
-        history = Text2CypherAgent._get_or_create_history(session_id)
-        with _HISTORY_LOCK:
-            history.messages.append(HumanMessage(content=user_text))
-            history.messages.append(
-                AIMessage(content=assistant_text, additional_kwargs={"provider": provider})
-            )
-        Text2CypherAgent._trim_history(session_id)
+        get_session_store().append_messages(
+            session_id,
+            Text2CypherAgent._exchange(user_text, assistant_text, provider),
+        )
+
+    @staticmethod
+    async def aappend_external_exchange(
+        session_id: str,
+        user_text: str,
+        assistant_text: str,
+        provider: str = "assistant",
+    ) -> None:
+        await get_session_store().aappend_messages(
+            session_id,
+            Text2CypherAgent._exchange(user_text, assistant_text, provider),
+        )
 
     @staticmethod
     def get_session_history(session_id: str) -> list[dict[str, Optional[str]]]:
         """Return history payload for one session without requiring an agent instance."""
-        with _HISTORY_LOCK:
-            history = _SESSION_HISTORIES.get(session_id)
-            history_messages = list(history.messages) if history else []
-            if history is not None:
-                Text2CypherAgent._touch_session_locked(session_id)
-        return Text2CypherAgent._history_to_payload(history_messages)
+        return Text2CypherAgent._history_to_payload(get_session_store().get_messages(session_id))
+
+    @staticmethod
+    async def aget_session_history(session_id: str) -> list[dict[str, Optional[str]]]:
+        messages = await get_session_store().aget_messages(session_id)
+        return Text2CypherAgent._history_to_payload(messages)
 
     @staticmethod
     def clear_session_history(session_id: Optional[str] = None) -> None:
         """Clear one session or all sessions without requiring an agent instance."""
-        with _HISTORY_LOCK:
-            if session_id is None:
-                _SESSION_HISTORIES.clear()
-                _SESSION_LAST_USED.clear()
-            else:
-                _SESSION_HISTORIES.pop(session_id, None)
-                _SESSION_LAST_USED.pop(session_id, None)
+        get_session_store().clear_history(session_id)
+        _HISTORY_ASSEMBLER.forget(session_id)
 
-    def respond(self, user_text: str, session_id: str) -> str:
-        result = self.chain.invoke(
-            {"user_input": user_text},
-            config={"configurable": {"session_id": session_id}}
+    @staticmethod
+    async def aclear_session_history(session_id: Optional[str] = None) -> None:
+        await get_session_store().aclear_history(session_id)
+        _HISTORY_ASSEMBLER.forget(session_id)
+
+    def _system_prompt_for(self, user_text: str) -> str:
+        """Return the system prompt for one question, pruned when enabled."""
+        if self.pruner is None:
+            return self.system_prompt
+        result = self.pruner.prune(user_text)
+        if not result.pruned:
+            self.pruner.record(result, self.system_prompt_tokens, self.system_prompt_tokens)
+            logger.info(
+                "Schema pruning (%s): full schema used (confidence %.2f)",
+                self.provider,
+                result.confidence,
+            )
+            return self.system_prompt
+        system_prompt = build_system_prompt(result.schema, result.hints)
+        sent_tokens = estimate_tokens(system_prompt)
+        self.pruner.record(result, self.system_prompt_tokens, sent_tokens)
+        logger.info(
+            "Schema pruning (%s): %d labels, %d relationships, %d of %d prompt tokens "
+            "(saved %d, confidence %.2f)",
+            self.provider,
+            len(result.labels),
+            len(result.relationships),
+            sent_tokens,
+            self.system_prompt_tokens,
+            self.system_prompt_tokens - sent_tokens,
+            result.confidence,
         )
-        with _HISTORY_LOCK:
-            history = _SESSION_HISTORIES.get(session_id)
-            if history:
-                for msg in reversed(history.messages):
-                    if getattr(msg, "type", "") != "ai":
-                        continue
-                    kwargs = dict(getattr(msg, "additional_kwargs", {}) or {})
-                    if kwargs.get("provider"):
-                        continue
-                    kwargs["provider"] = self.provider
-                    msg.additional_kwargs = kwargs
-                    break
-        self._trim_history(session_id)
-        return result.content.strip().strip("` ")
+        return system_prompt
+
+    def prompt_stats(self) -> dict:
+        """Return schema pruning counters, token savings and prompt sizes."""
+        stats = {"pruning": False}
+        if self.pruner is not None:
+            stats = {"pruning": True, **self.pruner.stats()}
+        with self._usage_lock:
+            stats["prompt_tokens"] = dict(self._usage_stats)
+            cache = dict(self._cache_stats)
+        cache["cached_ratio"] = (
+            round(cache["cached_input_tokens"] / cache["input_tokens"], 4)
+            if cache["input_tokens"] else 0.0
+        )
+        cache["prefix_hash"] = prompt_prefix_hash(self.system_prompt)
+        stats["prompt_cache"] = cache
+        with self._usage_lock:
+            stats["validation"] = {"enabled": CYPHER_VALIDATION, **self._validation_stats}
+            stats["preflight"] = {"enabled": QUERY_PREFLIGHT, **self._preflight_stats}
+            stats["examples"] = {
+                "few_shot": FEW_SHOT_EXAMPLES,
+                "direct_return": EXAMPLE_DIRECT_RETURN,
+                **self._example_stats,
+            }
+        if EXAMPLES_ENABLED:
+            stats["examples"]["store"] = get_example_store().stats()
+        stats["history"] = _HISTORY_ASSEMBLER.stats()
+        return stats
+
+    def _record_usage(
+        self,
+        system_prompt: str,
+        user_text: str,
+        window: HistoryWindow,
+        examples: List[BaseMessage] = (),
+    ) -> dict:
+        usage = {
+            "system_tokens": count_tokens(system_prompt),
+            "example_tokens": sum(count_tokens(message.content) for message in examples),
+            "history_tokens": window.tokens,
+            "question_tokens": count_tokens(user_text),
+            "history_messages": window.verbatim,
+            "summarized_messages": window.folded,
+            "prefix_hash": prompt_prefix_hash(system_prompt),
+        }
+        usage["prompt_tokens"] = (
+            usage["system_tokens"] + usage["example_tokens"] + usage["history_tokens"] + usage["question_tokens"]
+        )
+        _PROMPT_USAGE.set(usage)
+        with self._usage_lock:
+            self._usage_stats["requests"] += 1
+            self._usage_stats["total"] += usage["prompt_tokens"]
+            self._usage_stats["last"] = usage["prompt_tokens"]
+            self._usage_stats["max"] = max(self._usage_stats["max"], usage["prompt_tokens"])
+            if window.folded:
+                self._usage_stats["summarized_requests"] += 1
+            if examples:
+                self._example_stats["prompts_with_examples"] += 1
+                self._example_stats["examples_sent"] += len(examples) // 2
+        logger.info(
+            "Prompt tokens (%s): %d total = system %d + examples %d + history %d (%d verbatim, "
+            "%d summarized) + question %d",
+            self.provider,
+            usage["prompt_tokens"],
+            usage["system_tokens"],
+            usage["example_tokens"],
+            usage["history_tokens"],
+            window.verbatim,
+            window.folded,
+            usage["question_tokens"],
+        )
+        return usage
+
+    def _record_provider_usage(self, usage_metadata: Optional[dict]) -> None:
+        """Record provider-reported input tokens, split into cached and uncached."""
+        if not usage_metadata:
+            return
+        input_tokens = usage_metadata.get("input_tokens", 0) or 0
+        cached = (usage_metadata.get("input_token_details") or {}).get("cache_read", 0) or 0
+        TOKENS.inc(self.provider, "input", amount=input_tokens)
+        TOKENS.inc(self.provider, "cached_input", amount=cached)
+        TOKENS.inc(self.provider, "output", amount=usage_metadata.get("output_tokens", 0) or 0)
+        usage = _PROMPT_USAGE.get()
+        if usage is not None:
+            # Summed so repair calls count towards the request they belong to.
+            usage["input_tokens"] = usage.get("input_tokens", 0) + input_tokens
+            usage["cached_input_tokens"] = usage.get("cached_input_tokens", 0) + cached
+            usage["uncached_input_tokens"] = usage["input_tokens"] - usage["cached_input_tokens"]
+            usage["output_tokens"] = usage.get("output_tokens", 0) + (usage_metadata.get("output_tokens", 0) or 0)
+        with self._usage_lock:
+            self._cache_stats["reported_requests"] += 1
+            self._cache_stats["input_tokens"] += input_tokens
+            self._cache_stats["cached_input_tokens"] += cached
+            if cached:
+                self._cache_stats["cache_hit_requests"] += 1
+        logger.info(
+            "Provider input tokens (%s): %d (%d cached, %d uncached)",
+            self.provider,
+            input_tokens,
+            cached,
+            input_tokens - cached,
+        )
+
+    def _chain_inputs(self, user_text: str, session_id: str, history: List[BaseMessage]) -> dict:
+        system_prompt = self._system_prompt_for(user_text)
+        window = _HISTORY_ASSEMBLER.assemble(session_id, history)
+        examples = self._examples_for(user_text)
+        self._record_usage(system_prompt, user_text, window, examples)
+        return {
+            "user_input": user_text,
+            "system_prompt": system_prompt,
+            # Examples go after the system prompt so its cached prefix is unchanged.
+            "history": [*examples, *window.messages],
+        }
+
+    @staticmethod
+    def _examples_for(user_text: str) -> List[BaseMessage]:
+        """Stored exchanges for the most similar past questions, best match first."""
+        if not FEW_SHOT_EXAMPLES:
+            return []
+        messages: List[BaseMessage] = []
+        for example in get_example_store().search(user_text, FEW_SHOT_EXAMPLES):
+            messages += [HumanMessage(content=example.question), AIMessage(content=example.cypher)]
+        return messages
+
+    def _direct_answer(self, user_text: str, history: List[BaseMessage]) -> Optional[str]:
+        """The stored answer to a near-exact repeat of a standalone question."""
+        if not EXAMPLE_DIRECT_RETURN or history:
+            return None
+        example = get_example_store().match(user_text, EXAMPLE_DIRECT_MIN_SIMILARITY)
+        if example is None:
+            return None
+        # Stored under another schema version: reuse it only if it still checks out.
+        if example.schema_version != self.schema_version and self._schema_errors(example.cypher):
+            return None
+        with self._usage_lock:
+            self._example_stats["direct"] += 1
+        logger.info("Answered (%s) from a stored example: %r", self.provider, example.question)
+        return example.cypher
+
+    def _schema_errors(self, answer: str) -> Optional[List[str]]:
+        """Return schema errors in a generated query; None if it is not checked.
+
+        Replies that are not Cypher (e.g. a clarifying question) are not checked.
+        """
+        answer = clean_answer(answer)
+        if not CYPHER_VALIDATION or not looks_like_cypher(answer):
+            return None
+        return get_cypher_validator(self.snapshot).validate(answer).errors
+
+    @staticmethod
+    def _followup_inputs(inputs: dict, raw: str, instruction: str) -> dict:
+        """Chain inputs continuing the exchange with ``raw`` by one more instruction."""
+        return {
+            "system_prompt": inputs["system_prompt"],
+            "history": [
+                *inputs["history"],
+                HumanMessage(content=inputs["user_input"]),
+                AIMessage(content=raw),
+            ],
+            "user_input": instruction,
+        }
+
+    @staticmethod
+    def _repair_inputs(inputs: dict, raw: str, errors: List[str]) -> dict:
+        """Chain inputs asking the model to fix ``raw`` given the validator's errors."""
+        return Text2CypherAgent._followup_inputs(
+            inputs, raw, REPAIR_PROMPT.format(errors="\n".join(f"- {e}" for e in errors))
+        )
+
+    def _better_answer(
+        self, raw: str, errors: List[str], candidate: str
+    ) -> Tuple[str, List[str]]:
+        """Keep a repair candidate only when it is Cypher with fewer errors."""
+        candidate_errors = self._schema_errors(candidate)
+        if candidate_errors is not None and len(candidate_errors) < len(errors):
+            return candidate, candidate_errors
+        return raw, errors
+
+    def _record_validation(self, errors: Optional[List[str]], final: List[str], attempts: int) -> None:
+        if errors is None:
+            return
+        with self._usage_lock:
+            self._validation_stats["validated"] += 1
+            if errors:
+                self._validation_stats["invalid"] += 1
+                self._validation_stats["repair_calls"] += attempts
+                self._validation_stats["repaired" if not final else "unrepaired"] += 1
+        if errors:
+            logger.warning(
+                "Generated Cypher failed validation (%s): %s; %d repair call(s), %d error(s) left",
+                self.provider,
+                "; ".join(errors),
+                attempts,
+                len(final),
+            )
+
+    def _repair(self, inputs: dict, raw: str) -> str:
+        """Validate ``raw`` and make up to CYPHER_REPAIR_ATTEMPTS repair calls."""
+        errors = self._schema_errors(raw)
+        final = errors or []
+        attempts = 0
+        while final and attempts < CYPHER_REPAIR_ATTEMPTS:
+            attempts += 1
+            result = self.chain.invoke(self._repair_inputs(inputs, raw, final))
+            self._record_provider_usage(result.usage_metadata)
+            raw, final = self._better_answer(raw, final, result.content)
+        self._record_validation(errors, final, attempts)
+        return raw
+
+    async def _arepair(self, inputs: dict, raw: str) -> str:
+        errors = self._schema_errors(raw)
+        final = errors or []
+        attempts = 0
+        while final and attempts < CYPHER_REPAIR_ATTEMPTS:
+            attempts += 1
+            result = await self.chain.ainvoke(self._repair_inputs(inputs, raw, final))
+            self._record_provider_usage(result.usage_metadata)
+            raw, final = self._better_answer(raw, final, result.content)
+        self._record_validation(errors, final, attempts)
+        return raw
+
+    async def _plan_cost(self, query: str) -> PlanCost:
+        """EXPLAIN ``query`` on Neo4j; ``unknown`` when the plan is unavailable."""
+        try:
+            executor = await get_query_executor()
+            return analyze_plan(await executor.explain(query))
+        except Exception as exc:
+            logger.warning("Query preflight failed (%s): %s", self.provider, exc)
+            return PlanCost(VERDICT_UNKNOWN)
+
+    async def _apreflight(self, inputs: dict, raw: str) -> str:
+        """Check the plan cost of ``raw``; regenerate with the findings if expensive."""
+        if not QUERY_PREFLIGHT or not looks_like_cypher(clean_answer(raw)):
+            return raw
+        cost = await self._plan_cost(clean_answer(raw))
+        first = cost
+        attempts = 0
+        while cost.expensive and attempts < PREFLIGHT_REGENERATE_ATTEMPTS:
+            attempts += 1
+            instruction = PLAN_FEEDBACK_PROMPT.format(findings=cost.feedback())
+            result = await self.chain.ainvoke(self._followup_inputs(inputs, raw, instruction))
+            self._record_provider_usage(result.usage_metadata)
+            # A cheaper query that no longer matches the schema is no better.
+            if self._schema_errors(result.content) or not looks_like_cypher(clean_answer(result.content)):
+                continue
+            candidate = await self._plan_cost(clean_answer(result.content))
+            if candidate.is_better_than(cost):
+                raw, cost = result.content, candidate
+        regenerated = cost is not first
+        usage = _PROMPT_USAGE.get()
+        if usage is not None:
+            usage["cost"] = {**cost.to_dict(), "regenerated": regenerated}
+        with self._usage_lock:
+            self._preflight_stats["checked"] += 1
+            if first.verdict == VERDICT_UNKNOWN:
+                self._preflight_stats["unknown"] += 1
+            if first.expensive:
+                self._preflight_stats["expensive"] += 1
+            if regenerated:
+                self._preflight_stats["regenerated"] += 1
+        if first.expensive:
+            logger.warning(
+                "Expensive query plan (%s): %s; regenerated: %s, final verdict %s",
+                self.provider,
+                "; ".join(first.risks) or f"~{first.estimated_rows:,.0f} rows",
+                regenerated,
+                cost.verdict,
+            )
+        return raw
+
+    async def _arefine(self, inputs: dict, raw: str) -> str:
+        """Schema repair, then plan cost preflight, of a generated answer."""
+        return await self._apreflight(inputs, await self._arepair(inputs, raw))
+
+    async def awarm_up(self) -> None:
+        """Build what the first request would otherwise build lazily.
+
+        Loads the tokenizer, this schema version's validator and the example
+        store off the event loop and, for OpenAI, opens the HTTPS connection
+        with a model lookup.
+        """
+        await asyncio.to_thread(estimate_tokens, self.system_prompt)
+        await asyncio.to_thread(get_cypher_validator, self.snapshot)
+        if EXAMPLES_ENABLED:
+            await aget_example_store()
+        client = getattr(self.llm, "root_async_client", None)
+        if client is not None:
+            await client.models.retrieve(self.llm.model_name)
+
+    def respond(self, user_text: str, session_id: str) -> str:
+        store = get_session_store()
+        history = store.get_messages(session_id)
+        answer = self._direct_answer(user_text, history)
+        if answer is None:
+            inputs = self._chain_inputs(user_text, session_id, history)
+            result = self.chain.invoke(inputs)
+            self._record_provider_usage(result.usage_metadata)
+            answer = self._repair(inputs, result.content)
+        store.append_messages(session_id, self._exchange(user_text, answer, self.provider))
+        return clean_answer(answer)
+
+    async def agenerate(self, user_text: str, session_id: str) -> str:
+        """Generate the raw (uncleaned) answer without recording it in history.
+
+        Used where the caller decides whether the answer is kept, e.g. when
+        the same question races on two providers.
+        """
+        with timed("history", self.provider):
+            history = await get_session_store().aget_messages(session_id)
+            if EXAMPLES_ENABLED:
+                await aget_example_store()
+            direct = self._direct_answer(user_text, history)
+            if direct is not None:
+                return direct
+            inputs = self._chain_inputs(user_text, session_id, history)
+        with timed("llm", self.provider):
+            result = await self.chain.ainvoke(inputs)
+        self._record_provider_usage(result.usage_metadata)
+        with timed("refine", self.provider):
+            answer = await self._arefine(inputs, result.content)
+        return answer
+
+    async def arespond(self, user_text: str, session_id: str) -> str:
+        """Async :meth:`respond` built on the chain's native async invocation.
+
+        No executor thread is held while waiting on the provider, and history
+        goes through the session store's async methods.
+        """
+        answer = await self.agenerate(user_text, session_id)
+        await get_session_store().aappend_messages(session_id, self._exchange(user_text, answer, self.provider))
+        return clean_answer(answer)
+
+    async def astream(self, user_text: str, session_id: str) -> AsyncIterator[str]:
+        """Yield the answer as it is generated, cleaned like :meth:`respond`.
+
+        The concatenated chunks equal what :meth:`respond` would return; the
+        exchange is committed to history once the stream completes. If the
+        streamed query is repaired or regenerated after validation or the
+        cost preflight, a final :class:`RepairedAnswer` carries the
+        replacement answer.
+        """
+        store = get_session_store()
+        with timed("history", self.provider):
+            history = await store.aget_messages(session_id)
+            if EXAMPLES_ENABLED:
+                await aget_example_store()
+            direct = self._direct_answer(user_text, history)
+            if direct is None:
+                inputs = self._chain_inputs(user_text, session_id, history)
+        if direct is not None:
+            await store.aappend_messages(session_id, self._exchange(user_text, direct, self.provider))
+            yield clean_answer(direct)
+            return
+        cleaner = StreamingAnswerCleaner()
+        raw_parts = []
+        usage = None
+        # Includes the time the client takes to read the streamed tokens.
+        with timed("llm", self.provider):
+            async for chunk in self.chain.astream(inputs):
+                if chunk.usage_metadata:
+                    usage = add_usage(usage, chunk.usage_metadata)
+                content = chunk.content if isinstance(chunk.content, str) else ""
+                raw_parts.append(content)
+                text = cleaner.feed(content)
+                if text:
+                    yield text
+        self._record_provider_usage(usage)
+        streamed = "".join(raw_parts)
+        with timed("refine", self.provider):
+            answer = await self._arefine(inputs, streamed)
+        await store.aappend_messages(session_id, self._exchange(user_text, answer, self.provider))
+        if answer != streamed:
+            yield RepairedAnswer(clean_answer(answer))
 
     def add_external_exchange(
         self,
@@ -1,5 +1,6 @@
 import logging
 import os
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -21,6 +22,15 @@ def get_project_root() -> Path:
     return current_path.parents[1]
 
 
+def parse_bool(value: str, default: bool = False) -> bool:
+    normalized = value.strip().lower()
+    if normalized in {"1", "true", "yes", "on"}:
+        return True
+    if normalized in {"0", "false", "no", "off"}:
+        return False
+    return default
+
+
 def get_env_variable(name: str, default=None, resolve_path=False) -> str:
     """Return the value of ``name`` from the environment.
 
@@ -51,3 +61,28 @@ def get_env_variable(name: str, default=None, resolve_path=False) -> str:
         resolved_path = (project_root / value).resolve()
         return str(resolved_path)
     return value
+
+
+@lru_cache(maxsize=1)
+def _get_token_encoder():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # pragma: no cover - tiktoken missing or offline
+        logger.debug("tiktoken unavailable; using character-based token estimate")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Return the prompt token count of ``text``.
+
+    Uses tiktoken's ``cl100k_base`` encoding when available and falls back to
+    the usual ~4 characters per token approximation otherwise.
+    """
+    if not text:
+        return 0
+    encoder = _get_token_encoder()
+    if encoder is None:
+        return max(1, len(text) // 4)
+    return len(encoder.encode(text, disallowed_special=()))
@@ -0,0 +1,109 @@
+"""In-process stand-in for the async neo4j driver used by the executor tests."""
+
+from typing import Any, Dict, List, Optional
+
+from neo4j import Record
+from neo4j.exceptions import Neo4jError
+from neo4j.graph import Graph, Node
+
+_GRAPH = Graph()
+
+
+def make_node(element_id: str, labels: List[str], **properties) -> Node:
+    return Node(_GRAPH, element_id, 0, labels, properties)
+
+
+class FakeSummary:
+    def __init__(self, plan: Optional[dict]):
+        self.plan = plan
+
+
+class FakeResult:
+    def __init__(self, driver: "FakeDriver", keys: List[str], rows: List[List[Any]]):
+        self.driver = driver
+        self._keys = keys
+        self._rows = rows
+
+    async def consume(self) -> FakeSummary:
+        plan = self.driver.plans.pop(0) if self.driver.plans else None
+        return FakeSummary(plan)
+
+    def keys(self):
+        return tuple(self._keys)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in self._rows:
+            self.driver.pulled += 1
+            yield Record(zip(self._keys, row))
+
+
+class FakeTransaction:
+    def __init__(self, driver: "FakeDriver"):
+        self.driver = driver
+        self.closed = False
+
+    async def run(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> FakeResult:
+        self.driver.queries.append((query, parameters))
+        if self.driver.error is not None:
+            raise self.driver.error
+        return FakeResult(self.driver, self.driver.keys, self.driver.rows)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, driver: "FakeDriver", config: Dict[str, Any]):
+        self.driver = driver
+        self.config = config
+
+    async def __aenter__(self):
+        self.driver.open_sessions += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.driver.open_sessions -= 1
+
+    async def begin_transaction(self, timeout: Optional[float] = None) -> FakeTransaction:
+        self.driver.timeouts.append(timeout)
+        tx = FakeTransaction(self.driver)
+        self.driver.transactions.append(tx)
+        return tx
+
+
+class FakeDriver:
+    def __init__(
+        self,
+        keys: List[str],
+        rows: List[List[Any]],
+        error: Optional[Exception] = None,
+        plans: Optional[List[dict]] = None,
+    ):
+        self.keys = keys
+        self.rows = rows
+        self.error = error
+        # EXPLAIN plans returned by successive ``consume()`` calls.
+        self.plans = list(plans or [])
+        self.sessions: List[FakeSession] = []
+        self.transactions: List[FakeTransaction] = []
+        self.queries: List[tuple] = []
+        self.timeouts: List[Optional[float]] = []
+        self.open_sessions = 0
+        self.pulled = 0
+        self.closed = False
+
+    def session(self, **config) -> FakeSession:
+        session = FakeSession(self, config)
+        self.sessions.append(session)
+        return session
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def syntax_error(message: str) -> Neo4jError:
+    """Build the error the driver raises for a server-side failure."""
+    return Neo4jError._hydrate_neo4j(code="Neo.ClientError.Statement.SyntaxError", message=message)
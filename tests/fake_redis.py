@@ -0,0 +1,146 @@
+"""Minimal in-process stand-in for the redis-py clients used by RedisSessionStore.
+
+``FakeRedis`` (sync) and ``FakeAsyncRedis`` share one keyspace, the way two
+workers share one server. Only the commands the session store issues are
+implemented; the two lock scripts are recognised by their text.
+"""
+
+import fnmatch
+import time
+
+from src.session_store import _EXTEND_LOCK_SCRIPT, _RELEASE_LOCK_SCRIPT
+
+
+class FakeServer:
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.calls = []
+
+    def _alive(self, key):
+        deadline = self.expiry.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return key in self.data
+
+    def execute(self, name, *args, **kwargs):
+        self.calls.append(name)
+        return getattr(self, f"cmd_{name}")(*args, **kwargs)
+
+    def cmd_get(self, key):
+        return self.data.get(key) if self._alive(key) else None
+
+    def cmd_set(self, key, value, nx=False, px=None, ex=None):
+        if nx and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expiry.pop(key, None)
+        if px is not None:
+            self.expiry[key] = time.monotonic() + px / 1000
+        if ex is not None:
+            self.expiry[key] = time.monotonic() + ex
+        return True
+
+    def cmd_delete(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                removed += 1
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return removed
+
+    def cmd_rpush(self, key, *values):
+        if not self._alive(key):
+            self.data[key] = []
+        self.data[key].extend(values)
+        return len(self.data[key])
+
+    def cmd_lrange(self, key, start, end):
+        if not self._alive(key):
+            return []
+        items = self.data[key]
+        end = len(items) if end == -1 else end + 1
+        return list(items[start:end])
+
+    def cmd_ltrim(self, key, start, end):
+        if self._alive(key):
+            items = self.data[key]
+            start = max(0, len(items) + start) if start < 0 else start
+            end = len(items) if end == -1 else end + 1
+            self.data[key] = items[start:end]
+        return True
+
+    def cmd_expire(self, key, seconds):
+        return self.cmd_pexpire(key, seconds * 1000)
+
+    def cmd_pexpire(self, key, millis):
+        if not self._alive(key):
+            return 0
+        self.expiry[key] = time.monotonic() + int(millis) / 1000
+        return 1
+
+    def cmd_scan(self, match="*"):
+        return [key for key in list(self.data) if self._alive(key) and fnmatch.fnmatchcase(key, match)]
+
+    def cmd_eval(self, script, numkeys, key, token, *args):
+        if self.cmd_get(key) != token:
+            return 0
+        if script == _RELEASE_LOCK_SCRIPT:
+            return self.cmd_delete(key)
+        if script == _EXTEND_LOCK_SCRIPT:
+            return self.cmd_pexpire(key, args[0])
+        raise NotImplementedError(script)
+
+
+class FakePipeline:
+    def __init__(self, server, is_async):
+        self._server = server
+        self._is_async = is_async
+        self._queued = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._queued.append((name, args, kwargs))
+            return self
+        return queue
+
+    def _run(self):
+        queued, self._queued = self._queued, []
+        return [self._server.execute(name, *args, **kwargs) for name, args, kwargs in queued]
+
+    def execute(self):
+        if self._is_async:
+            async def run():
+                return self._run()
+            return run()
+        return self._run()
+
+
+class FakeRedis:
+    def __init__(self, server=None):
+        self.server = server or FakeServer()
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.server.execute(name, *args, **kwargs)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.server, is_async=False)
+
+    def scan_iter(self, match="*"):
+        return iter(self.server.execute("scan", match=match))
+
+
+class FakeAsyncRedis(FakeRedis):
+    def __getattr__(self, name):
+        async def command(*args, **kwargs):
+            return self.server.execute(name, *args, **kwargs)
+        return command
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.server, is_async=True)
+
+    async def scan_iter(self, match="*"):
+        for key in self.server.execute("scan", match=match):
+            yield key
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import AsyncMock, patch
+
+from fastapi import HTTPException
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.admission as admission
+import src.api_server as api_server
+from src.admission import AdmissionController, Saturated, create_admission_controller, set_admission_controller
+from src.text2cypher_agent import Text2CypherAgent
+
+
+class AdmissionControllerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_queue_then_reject_when_full(self):
+        controller = AdmissionController("openai", max_concurrent=1, max_queue=1, queue_timeout_seconds=1)
+        release = asyncio.Event()
+        order = []
+
+        async def call(name):
+            async with controller.slot():
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.create_task(call("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(call("second"))
+        await asyncio.sleep(0)
+        self.assertEqual((controller.active, controller.waiting), (1, 1))
+
+        with self.assertRaises(Saturated) as ctx:
+            await call("third")
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+
+        release.set()
+        await asyncio.gather(first, second)
+        self.assertEqual(order, ["first", "second"])
+        self.assertEqual(controller.stats()["admitted"], 2)
+        self.assertEqual(controller.stats()["rejected"], 1)
+
+    async def test_queue_deadline(self):
+        controller = AdmissionController("google", max_concurrent=1, max_queue=5, queue_timeout_seconds=0.05)
+        async with controller.slot():
+            with self.assertRaises(Saturated) as ctx:
+                async with controller.slot():
+                    pass
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertEqual((controller.timed_out, controller.waiting, controller.active), (1, 0, 0))
+
+        # The slot is free again and the deadline did not leak a permit.
+        async with controller.slot():
+            self.assertEqual(controller.active, 1)
+
+    async def test_unlimited(self):
+        controller = AdmissionController("openai", max_concurrent=0, max_queue=0, queue_timeout_seconds=0)
+        async with controller.slot(), controller.slot():
+            controller.check()
+
+    def test_per_provider_settings(self):
+        env = {"MAX_CONCURRENT_LLM_CALLS": "8", "MAX_CONCURRENT_LLM_CALLS_GOOGLE": "2", "MAX_QUEUED_LLM_CALLS": "3"}
+        with patch.dict(os.environ, env):
+            openai_controller = create_admission_controller("openai")
+            google_controller = create_admission_controller("google")
+        self.assertEqual((openai_controller.max_concurrent, openai_controller.max_queue), (8, 3))
+        self.assertEqual((google_controller.max_concurrent, google_controller.max_queue), (2, 3))
+
+
+class SlowAgent:
+    async def arespond(self, user_text: str, session_id: str) -> str:
+        await asyncio.sleep(0.1)
+        return "MATCH (g:Gene) RETURN g"
+
+
+class AskAdmissionTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+        self.controller = AdmissionController("openai", max_concurrent=1, max_queue=0, queue_timeout_seconds=1)
+        set_admission_controller("openai", self.controller)
+
+    async def asyncTearDown(self):
+        admission._CONTROLLERS.pop("openai", None)
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+
+    async def test_excess_request_is_shed_with_retry_after(self):
+        with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=SlowAgent())):
+            results = await asyncio.gather(
+                api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id="a1")),
+                api_server.ask_llm_agent(api_server.QueryRequest(query="list diseases", session_id="a2")),
+                return_exceptions=True,
+            )
+        answers = [r for r in results if isinstance(r, dict)]
+        errors = [r for r in results if isinstance(r, HTTPException)]
+        self.assertEqual(len(answers), 1)
+        self.assertEqual(errors[0].status_code, 429)
+        self.assertEqual(errors[0].headers["Retry-After"], "1")
+
+    async def test_stream_is_refused_before_it_starts(self):
+        async with self.controller.slot():
+            with self.assertRaises(HTTPException) as ctx:
+                await api_server.ask_llm_agent_stream(api_server.QueryRequest(query="q", session_id="a3"))
+        self.assertEqual(ctx.exception.status_code, 429)
+
+    async def test_cache_hits_do_not_take_a_slot(self):
+        with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=SlowAgent())):
+            await api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id="a4"))
+            async with self.controller.slot():
+                result = await api_server.ask_llm_agent(
+                    api_server.QueryRequest(query="list genes", session_id="a5")
+                )
+        self.assertEqual(result["answer"], "MATCH (g:Gene) RETURN g")
+
+
+if __name__ == "__main__":
+    unittest.main()
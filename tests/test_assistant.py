@@ -0,0 +1,149 @@
+import unittest
+from pathlib import Path
+import sys
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import openai
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+from src.session_store import InMemorySessionStore, get_session_store, set_session_store
+from src.text2cypher_agent import Text2CypherAgent
+
+
+def text_message(text: str, role: str = "assistant"):
+    block = SimpleNamespace(type="text", text=SimpleNamespace(value=text))
+    return SimpleNamespace(role=role, content=[block])
+
+
+class FakeEventStream:
+    def __init__(self, events):
+        self._events = list(events)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._events:
+            raise StopAsyncIteration
+        name, data = self._events.pop(0)
+        return SimpleNamespace(event=name, data=data)
+
+
+class FakeRuns:
+    def __init__(self, events=None, statuses=None, streaming_status=None):
+        self.events = events or []
+        self.statuses = list(statuses or [])
+        self.streaming_status = streaming_status
+        self.retrieve_calls = 0
+
+    async def create(self, thread_id, assistant_id, stream=False):
+        if stream:
+            if self.streaming_status is not None:
+                request = httpx.Request("POST", "https://example.test/runs")
+                raise openai.APIStatusError(
+                    "streaming unsupported",
+                    response=httpx.Response(self.streaming_status, request=request),
+                    body=None,
+                )
+            return FakeEventStream(self.events)
+        return SimpleNamespace(id="run_poll", status=self.statuses.pop(0))
+
+    async def retrieve(self, run_id, thread_id):
+        self.retrieve_calls += 1
+        return SimpleNamespace(id=run_id, status=self.statuses.pop(0))
+
+    async def cancel(self, run_id, thread_id):
+        return SimpleNamespace(id=run_id, status="cancelling")
+
+
+class FakeClient:
+    def __init__(self, runs, listed=None):
+        self.list_kwargs = None
+        self.listed = listed or []
+        messages = SimpleNamespace(create=AsyncMock(), list=self._list)
+        threads = SimpleNamespace(
+            create=AsyncMock(return_value=SimpleNamespace(id="thread_1")),
+            messages=messages,
+            runs=runs,
+        )
+        self.beta = SimpleNamespace(threads=threads)
+
+    async def _list(self, **kwargs):
+        self.list_kwargs = kwargs
+        return SimpleNamespace(data=self.listed)
+
+
+class AssistantTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._old_store = get_session_store()
+        self.store = InMemorySessionStore()
+        set_session_store(self.store)
+        api_server._assistant_streaming_supported = True
+        self.env = patch.dict("os.environ", {"OPENAI_ASSISTANT_ID": "asst_1"})
+        self.env.start()
+
+    async def asyncTearDown(self):
+        self.env.stop()
+        set_session_store(self._old_store)
+        api_server._assistant_streaming_supported = True
+
+    async def ask(self, client):
+        req = api_server.QueryRequest(query="list genes", session_id="asst")
+        with patch("src.api_server.get_openai_client", AsyncMock(return_value=client)):
+            return await api_server.ask_assistant(req)
+
+    async def test_streamed_run_returns_current_run_output(self):
+        runs = FakeRuns(events=[
+            ("thread.run.created", SimpleNamespace(id="run_1")),
+            ("thread.message.completed", text_message("list genes", role="user")),
+            ("thread.message.completed", text_message("MATCH (g:Gene) RETURN g")),
+            ("thread.run.completed", SimpleNamespace(id="run_1")),
+        ])
+        client = FakeClient(runs)
+
+        result = await self.ask(client)
+
+        self.assertEqual(result, {"answer": "MATCH (g:Gene) RETURN g"})
+        self.assertIsNone(client.list_kwargs)
+        history = Text2CypherAgent.get_session_history("asst")
+        self.assertEqual(history[1]["provider"], "assistant")
+        self.assertEqual(self.store.assistant_threads, {"asst": "thread_1"})
+
+    async def test_failed_streamed_run_returns_502(self):
+        runs = FakeRuns(events=[
+            ("thread.run.created", SimpleNamespace(id="run_1")),
+            ("thread.run.failed", SimpleNamespace(id="run_1")),
+        ])
+        with self.assertRaises(api_server.HTTPException) as ctx:
+            await self.ask(FakeClient(runs))
+        self.assertEqual(ctx.exception.status_code, 502)
+
+    async def test_falls_back_to_backoff_polling_of_current_run(self):
+        runs = FakeRuns(statuses=["queued", "in_progress", "completed"], streaming_status=404)
+        client = FakeClient(runs, listed=[text_message("MATCH (d:Disease) RETURN d")])
+
+        with patch.object(api_server, "ASSISTANT_POLL_MIN_SECONDS", 0.001):
+            result = await self.ask(client)
+
+        self.assertEqual(result, {"answer": "MATCH (d:Disease) RETURN d"})
+        self.assertEqual(runs.retrieve_calls, 2)
+        self.assertEqual(client.list_kwargs["run_id"], "run_poll")
+        self.assertFalse(api_server._assistant_streaming_supported)
+
+    async def test_request_error_does_not_disable_streaming(self):
+        runs = FakeRuns(statuses=["completed"], streaming_status=400)
+        with self.assertRaises(api_server.HTTPException) as ctx:
+            await self.ask(FakeClient(runs))
+        self.assertEqual(ctx.exception.status_code, 500)
+        self.assertEqual(runs.retrieve_calls, 0)
+        self.assertTrue(api_server._assistant_streaming_supported)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import AsyncMock, patch
+
+from pydantic import ValidationError
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+from src.session_store import get_session_store
+from src.text2cypher_agent import Text2CypherAgent
+
+
+class TrackingAgent:
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+
+    async def arespond(self, query: str, session_id: str) -> str:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.02)
+            if query == "boom":
+                raise RuntimeError("provider error")
+            Text2CypherAgent.append_external_exchange(
+                session_id, query, f"RETURN '{query}'", provider="openai"
+            )
+            return f"RETURN '{query}'"
+        finally:
+            self.in_flight -= 1
+
+
+async def collect_lines(response) -> list[dict]:
+    lines = []
+    async for chunk in response.body_iterator:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        lines.extend(json.loads(line) for line in text.splitlines() if line)
+    return lines
+
+
+class BatchTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+
+    async def asyncTearDown(self):
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+
+    async def run_batch(self, agent, **kwargs) -> list[dict]:
+        req = api_server.BatchRequest(**kwargs)
+        with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=agent)):
+            response = await api_server.ask_llm_agent_batch(req)
+            self.assertEqual(response.media_type, "application/x-ndjson")
+            return await collect_lines(response)
+
+    async def test_stateless_batch_respects_cap_and_reports_errors(self):
+        agent = TrackingAgent()
+        questions = [f"q{i}" for i in range(7)] + ["boom"]
+
+        lines = await self.run_batch(agent, questions=questions, max_concurrency=3)
+
+        self.assertEqual(sorted(line["index"] for line in lines), list(range(8)))
+        self.assertLessEqual(agent.peak, 3)
+        by_index = {line["index"]: line for line in lines}
+        self.assertEqual(by_index[0]["answer"], "RETURN 'q0'")
+        self.assertIn("error", by_index[7])
+        self.assertTrue(all("elapsed_ms" in line for line in lines))
+        self.assertEqual(get_session_store().histories, {})
+
+    async def test_session_mode_keeps_per_item_history(self):
+        lines = await self.run_batch(
+            TrackingAgent(),
+            questions=["a", "b"],
+            mode="session",
+            session_id="report",
+        )
+
+        sessions = {line["index"]: line["session_id"] for line in lines}
+        self.assertEqual(sessions, {0: "report-0", 1: "report-1"})
+        history = Text2CypherAgent.get_session_history("report-1")
+        self.assertEqual([m["content"] for m in history], ["b", "RETURN 'b'"])
+
+    async def test_batch_size_is_validated(self):
+        with self.assertRaises(ValidationError):
+            api_server.BatchRequest(questions=[])
+        with self.assertRaises(ValidationError):
+            api_server.BatchRequest(questions=["q"] * (api_server.BATCH_MAX_ITEMS + 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
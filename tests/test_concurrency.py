@@ -5,32 +5,34 @@ from pathlib import Path
 import sys
 from unittest.mock import AsyncMock, patch
 
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
 ROOT = Path(__file__).resolve().parent.parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 import src.api_server as api_server
+import src.text2cypher_agent as text2cypher_agent
+from src.session_store import InMemorySessionStore, get_session_store, set_session_store
 from src.text2cypher_agent import Text2CypherAgent
 
 
 class SlowAgent:
-    def respond(self, query: str, session_id: str) -> str:
-        time.sleep(0.25)
+    async def arespond(self, query: str, session_id: str) -> str:
+        await asyncio.sleep(0.25)
         return f"RETURN '{query}' AS q"
 
 
 class ConcurrencyTests(unittest.IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
-        Text2CypherAgent.clear_session_history()
-        api_server._SESSION_RUN_LOCKS.clear()
-        api_server._SESSION_RUN_LAST_USED.clear()
-        self._old_max_session_run_locks = api_server.MAX_SESSION_RUN_LOCKS
+        self._old_store = get_session_store()
+        self.store = InMemorySessionStore()
+        set_session_store(self.store)
+        api_server._RESPONSE_CACHE.clear()
 
     async def asyncTearDown(self):
-        Text2CypherAgent.clear_session_history()
-        api_server._SESSION_RUN_LOCKS.clear()
-        api_server._SESSION_RUN_LAST_USED.clear()
-        api_server.MAX_SESSION_RUN_LOCKS = self._old_max_session_run_locks
+        set_session_store(self._old_store)
+        api_server._RESPONSE_CACHE.clear()
 
     async def test_llm_requests_run_concurrently_across_sessions(self):
         req0 = api_server.QueryRequest(query="q0", session_id="s1", provider="openai")
@@ -68,6 +70,18 @@ class ConcurrencyTests(unittest.IsolatedAsyncioTestCase):
 
         self.assertGreater(elapsed, 0.45)
 
+    async def test_arespond_uses_async_chain_and_tags_history(self):
+        llm = FakeListChatModel(responses=["```MATCH (g:Gene) RETURN g```"])
+        with patch.object(text2cypher_agent, "make_llm", return_value=llm):
+            agent = Text2CypherAgent(provider="openai")
+
+        with patch.object(FakeListChatModel, "invoke", side_effect=AssertionError("sync path used")):
+            answer = await agent.arespond("list genes", "async_session")
+
+        self.assertEqual(answer, "MATCH (g:Gene) RETURN g")
+        history = Text2CypherAgent.get_session_history("async_session")
+        self.assertEqual(history[1]["provider"], "openai")
+
     async def test_history_isolated_by_session(self):
         Text2CypherAgent.append_external_exchange("session_a", "user_a", "assistant_a")
         Text2CypherAgent.append_external_exchange("session_b", "user_b", "assistant_b")
@@ -81,7 +95,7 @@ class ConcurrencyTests(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(history_b["history"][0]["content"], "user_b")
 
     async def test_session_lock_not_evicted_for_new_session(self):
-        api_server.MAX_SESSION_RUN_LOCKS = 2
+        self.store.max_run_locks = 2
 
         lock_s1 = await api_server.get_session_run_lock("s1")
         lock_s2 = await api_server.get_session_run_lock("s2")
@@ -89,7 +103,7 @@ class ConcurrencyTests(unittest.IsolatedAsyncioTestCase):
         await lock_s2.acquire()
         try:
             lock_s3_first = await api_server.get_session_run_lock("s3")
-            self.assertIs(api_server._SESSION_RUN_LOCKS.get("s3"), lock_s3_first)
+            self.assertIs(self.store.run_locks.get("s3"), lock_s3_first)
 
             lock_s3_second = await api_server.get_session_run_lock("s3")
             self.assertIs(lock_s3_first, lock_s3_second)
@@ -0,0 +1,183 @@
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import AsyncMock, patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+import src.text2cypher_agent as text2cypher_agent
+from src.cypher_validator import CypherValidator, get_cypher_validator, looks_like_cypher, tokenize
+from src.text2cypher_agent import Text2CypherAgent
+
+SCHEMA = {
+    "NodeTypes": {
+        "Disease": {"name": "STRING", "identifier": "STRING"},
+        "Compound": {"name": "STRING"},
+        "Gene": {"name": "STRING"},
+    },
+    "RelationshipTypes": {
+        "TREATS_CtD": {"_endpoints": ["Compound", "Disease"], "source": "STRING"},
+        "ASSOCIATES_DaG": {"_endpoints": ["Disease", "Gene"]},
+        "MYSTERY": {"_endpoints": ["Unknown", "Unknown"]},
+    },
+}
+
+INVALID = "MATCH (d:Disease)-[:TREATS_CtD]->(c:Compound) RETURN c"
+VALID = "MATCH (c:Compound)-[:TREATS_CtD]->(d:Disease) RETURN c"
+
+
+class TokenizerTests(unittest.TestCase):
+    def test_strings_comments_and_backticks(self):
+        tokens, errors = tokenize("MATCH (`my var`:Disease) // :Nope\nWHERE n.name = ':Fake' RETURN 1")
+        self.assertEqual(errors, [])
+        values = [t.value for t in tokens]
+        self.assertIn("my var", values)
+        self.assertNotIn("Nope", values)
+        self.assertIn("':Fake'", values)
+
+    def test_unterminated_string_is_reported(self):
+        _, errors = tokenize("MATCH (d:Disease {name: 'asthma}) RETURN d")
+        self.assertEqual(len(errors), 1)
+        self.assertIn("Unterminated", errors[0])
+
+    def test_looks_like_cypher(self):
+        self.assertTrue(looks_like_cypher("match (n) return n"))
+        self.assertTrue(looks_like_cypher("OPTIONAL MATCH (n) RETURN n"))
+        self.assertFalse(looks_like_cypher("Did you mean Disease or Compound?"))
+
+
+class CypherValidatorTests(unittest.TestCase):
+    def setUp(self):
+        self.validator = CypherValidator(SCHEMA)
+
+    def errors(self, query):
+        return self.validator.validate(query).errors
+
+    def test_valid_queries(self):
+        for query in (
+            VALID,
+            "MATCH (d:Disease)<-[r:TREATS_CtD]-(c) WHERE r.source = 'x' RETURN d, c",
+            "MATCH (d:Disease)-[:TREATS_CtD]-(c:Compound) RETURN d",
+            "MATCH (d:Disease {name: 'asthma'}) WHERE toLower(d.name) CONTAINS 'a' RETURN d",
+            "MATCH p=(:Disease)-[:ASSOCIATES_DaG*1..2]->(:Gene) RETURN p LIMIT 5",
+            "MATCH (a)-[:MYSTERY]->(b:Gene) RETURN a",
+            "MATCH (d:Disease) WHERE EXISTS { (d)-[:ASSOCIATES_DaG]->(:Gene) } RETURN d",
+            "MATCH (d:Disease) RETURN d {.name, total: 1}",
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(self.errors(query), [])
+
+    def test_unknown_label_and_type_with_suggestions(self):
+        errors = self.errors("MATCH (d:Diseases)-[:TREAT_CtD]->(c:Compound) RETURN d")
+        self.assertIn("Unknown node label :Diseases (did you mean Disease?)", errors)
+        self.assertIn("Unknown relationship type :TREAT_CtD (did you mean TREATS_CtD?)", errors)
+
+    def test_wrong_direction(self):
+        errors = self.errors(INVALID)
+        self.assertEqual(len(errors), 1)
+        self.assertIn("(:Compound)-[:TREATS_CtD]->(:Disease)", errors[0])
+        self.assertIn("relationships from Compound to Disease: TREATS_CtD", errors[0])
+
+    def test_unknown_properties(self):
+        errors = self.errors(
+            "MATCH (d:Disease {title: 'x'})<-[r:TREATS_CtD]-(c:Compound) "
+            "WHERE r.score > 1 AND c.nmae = 'y' RETURN d"
+        )
+        self.assertIn("Property title is not defined on :Disease", errors)
+        self.assertIn("Property score is not defined on :TREATS_CtD (did you mean source?)", errors)
+        self.assertIn("Property nmae is not defined on :Compound (did you mean name?)", errors)
+
+    def test_label_predicate_in_where(self):
+        self.assertEqual(
+            self.errors("MATCH (n) WHERE n:Desease RETURN n"),
+            ["Unknown node label :Desease (did you mean Disease?)"],
+        )
+
+    def test_index_is_built_once_per_schema_version(self):
+        loaded = get_cypher_validator()
+        self.assertIs(get_cypher_validator(), loaded)
+        with patch("src.cypher_validator.get_schema_version", return_value="other"), \
+                patch("src.cypher_validator.get_schema", return_value=SCHEMA):
+            other = get_cypher_validator()
+        self.assertIsNot(other, loaded)
+        self.assertEqual(other.rel_endpoints["TREATS_CtD"], ("Compound", "Disease"))
+
+
+class RepairRetryTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+        self._validator = patch(
+            "src.text2cypher_agent.get_cypher_validator", return_value=CypherValidator(SCHEMA)
+        )
+        self._validator.start()
+
+    async def asyncTearDown(self):
+        self._validator.stop()
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+
+    def make_agent(self, responses):
+        llm = FakeListChatModel(responses=responses)
+        with patch.object(text2cypher_agent, "make_llm", return_value=llm):
+            return Text2CypherAgent(provider="openai")
+
+    async def test_invalid_answer_is_repaired_once(self):
+        agent = self.make_agent([INVALID, VALID])
+        with patch.object(
+            Text2CypherAgent, "_repair_inputs", wraps=Text2CypherAgent._repair_inputs
+        ) as spy:
+            answer = await agent.arespond("what treats asthma", "s1")
+
+        self.assertEqual(answer, VALID)
+        self.assertEqual(spy.call_count, 1)
+        repair = Text2CypherAgent._repair_inputs(*spy.call_args.args)
+        self.assertIn("TREATS_CtD", repair["user_input"])
+        self.assertEqual(repair["history"][-1].content, INVALID)
+        # History keeps only the question and the final answer.
+        self.assertEqual(
+            [m["content"] for m in Text2CypherAgent.get_session_history("s1")],
+            ["what treats asthma", VALID],
+        )
+        stats = agent.prompt_stats()["validation"]
+        self.assertEqual((stats["invalid"], stats["repaired"], stats["repair_calls"]), (1, 1, 1))
+
+    def test_sync_respond_keeps_original_when_repair_is_worse(self):
+        agent = self.make_agent([INVALID, "MATCH (x:Nope)-[:NOPE]->(y:Nada) RETURN x"])
+        self.assertEqual(agent.respond("what treats asthma", "s2"), INVALID)
+        self.assertEqual(agent.prompt_stats()["validation"]["unrepaired"], 1)
+
+    async def test_valid_and_non_cypher_answers_make_one_call(self):
+        agent = self.make_agent([VALID, "Did you mean Disease or Gene?"])
+        with patch.object(
+            Text2CypherAgent, "_repair_inputs", wraps=Text2CypherAgent._repair_inputs
+        ) as spy:
+            await agent.arespond("what treats asthma", "s3")
+            await agent.arespond("list disorders", "s3")
+        spy.assert_not_called()
+        self.assertEqual(agent.prompt_stats()["validation"]["validated"], 1)
+
+    async def test_repair_can_be_disabled(self):
+        agent = self.make_agent([INVALID, VALID])
+        with patch.object(text2cypher_agent, "CYPHER_REPAIR_ATTEMPTS", 0):
+            self.assertEqual(await agent.arespond("what treats asthma", "s4"), INVALID)
+
+    async def test_stream_sends_replace_event(self):
+        agent = self.make_agent([INVALID, VALID])
+        req = api_server.QueryRequest(query="what treats asthma", session_id="s5")
+        with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=agent)):
+            response = await api_server.ask_llm_agent_stream(req)
+            chunks = [chunk async for chunk in response.body_iterator]
+
+        events = [chunk.split("\n", 1)[0] for chunk in chunks]
+        self.assertEqual(events[-2:], ["event: replace", "event: done"])
+        self.assertIn(VALID, chunks[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,219 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+import src.example_store as example_store
+import src.text2cypher_agent as text2cypher_agent
+from src.example_store import Example, ExampleStore, aget_example_store, set_example_store
+from src.text2cypher_agent import Text2CypherAgent
+
+GENES = "MATCH (g:Gene) RETURN g"
+DISEASES = "MATCH (d:Disease) RETURN d"
+COUNT_GENES = "MATCH (g:Gene) RETURN count(g)"
+
+
+class ExampleStoreTests(unittest.TestCase):
+    def test_search_ranks_by_similarity(self):
+        store = ExampleStore()
+        store.add("Which genes are associated with asthma?", GENES)
+        store.add("Which diseases are treated by aspirin?", DISEASES)
+        store.add("List all compounds", "MATCH (c:Compound) RETURN c")
+        hits = store.search("genes associated with asthma", k=2)
+        self.assertEqual(hits[0].cypher, GENES)
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(store.search("anything about pathways", k=3), [])
+
+    def test_newer_answer_replaces_the_old_one(self):
+        store = ExampleStore()
+        self.assertTrue(store.add("list genes", "MATCH (g) RETURN g"))
+        self.assertFalse(store.add("list genes?", "MATCH (g) RETURN g"))
+        self.assertTrue(store.add("list genes", GENES))
+        self.assertEqual(len(store), 1)
+        self.assertEqual([hit.cypher for hit in store.search("genes", k=5)], [GENES])
+
+    def test_replaced_examples_do_not_keep_index_slots(self):
+        store = ExampleStore()
+        store.add("list diseases", DISEASES)
+        with patch.object(example_store, "_COMPACT_MIN_SUPERSEDED", 2):
+            for i in range(20):
+                store.add("list genes", f"MATCH (g:Gene) RETURN g LIMIT {i}")
+        self.assertLessEqual(len(store._examples), 4)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.match("list genes").cypher, "MATCH (g:Gene) RETURN g LIMIT 19")
+        self.assertEqual(store.search("diseases", k=1)[0].cypher, DISEASES)
+
+    def test_common_terms_use_champion_lists(self):
+        store = ExampleStore()
+        for i in range(3000):
+            store.add(f"genes linked to disease{i}", f"MATCH (g:Gene) RETURN g LIMIT {i}")
+        store.add("genes", GENES)
+        self.assertEqual(store.search("genes", k=1)[0].cypher, GENES)
+        hit = store.search("genes linked to disease2999", k=1)[0]
+        self.assertEqual(hit.cypher, "MATCH (g:Gene) RETURN g LIMIT 2999")
+
+    def test_examples_persist_and_reload(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "examples.jsonl"
+            store = ExampleStore(path)
+            store.add("list genes", "MATCH (g) RETURN g", schema_version="v1")
+            store.add("list genes", GENES, schema_version="v2")
+            store.add("list diseases", DISEASES)
+            store.close()
+            with path.open("a", encoding="utf-8") as fh:
+                fh.write("not json\n")
+
+            reloaded = ExampleStore(path)
+            self.assertEqual(len(reloaded), 2)
+            self.assertEqual(reloaded.match("list genes"), Example("list genes", GENES, "v2"))
+
+    def test_superseded_lines_are_compacted(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch.object(example_store, "_COMPACT_MIN_SUPERSEDED", 2):
+            path = Path(tmp) / "examples.jsonl"
+            store = ExampleStore(path)
+            store.add("list genes", "MATCH (g) RETURN g")
+            store.add("list genes", "MATCH (n:Gene) RETURN n")
+            self.assertEqual(len(path.read_text().splitlines()), 2)
+            store.add("list genes", GENES)
+            store.add("list diseases", DISEASES)
+            store.close()
+            self.assertEqual(len(path.read_text().splitlines()), 2)
+            self.assertEqual(store.stats()["superseded_lines"], 0)
+
+            # A file left mostly superseded is compacted when it is loaded.
+            with path.open("a", encoding="utf-8") as fh:
+                fh.write(path.read_text() + "not json\n")
+            reloaded = ExampleStore(path)
+            reloaded.close()
+            self.assertEqual(len(path.read_text().splitlines()), 2)
+            self.assertEqual(reloaded.match("list genes").cypher, GENES)
+
+    def test_workers_sharing_a_file_keep_each_others_examples(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch.object(example_store, "_COMPACT_MIN_SUPERSEDED", 2):
+            path = Path(tmp) / "examples.jsonl"
+            first, second = ExampleStore(path), ExampleStore(path)
+            second.add("list diseases", DISEASES)
+            first.add("list genes", "MATCH (g) RETURN g")
+            first.add("list genes", "MATCH (n:Gene) RETURN n")
+            # Compacts: the other worker's line stays in the rewritten file.
+            first.add("list genes", GENES)
+            self.assertEqual(len(path.read_text().splitlines()), 2)
+            # The other worker's handle pointed at the replaced file; it reopens.
+            second.add("list compounds", "MATCH (c:Compound) RETURN c")
+            first.close()
+            second.close()
+
+            reloaded = ExampleStore(path)
+            reloaded.close()
+            self.assertEqual(len(reloaded), 3)
+            self.assertEqual(reloaded.match("list genes").cypher, GENES)
+            self.assertEqual([p.name for p in Path(tmp).iterdir() if p.name.endswith(".tmp")], [])
+
+    def test_match_needs_near_exact_wording(self):
+        store = ExampleStore()
+        store.add("List genes", GENES)
+        self.assertEqual(store.match("list genes?").cypher, GENES)
+        self.assertEqual(store.match("list the genes", min_similarity=0.6).cypher, GENES)
+        self.assertIsNone(store.match("how many genes"))
+        self.assertIsNone(store.match("list the genes"))
+
+
+class AgentExampleTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Text2CypherAgent.clear_session_history()
+        self.store = ExampleStore()
+        set_example_store(self.store)
+
+    async def asyncTearDown(self):
+        set_example_store(None)
+        Text2CypherAgent.clear_session_history()
+
+    def make_agent(self, responses):
+        self.llm = FakeListChatModel(responses=responses)
+        with patch.object(text2cypher_agent, "make_llm", return_value=self.llm):
+            return Text2CypherAgent(provider="openai")
+
+    async def test_only_accepted_answers_are_kept_and_sent(self):
+        agent = self.make_agent([GENES])
+        with patch.object(text2cypher_agent, "EXAMPLES_ENABLED", True), \
+                patch.object(text2cypher_agent, "FEW_SHOT_EXAMPLES", 2):
+            # An answer that passes the schema check is not kept by itself.
+            await agent.arespond("Which genes exist?", "e1")
+            self.assertEqual(len(self.store), 0)
+
+            self.assertTrue(await text2cypher_agent.aaccept_example("Which genes exist?", GENES))
+            self.assertFalse(await text2cypher_agent.aaccept_example("Which genes exist?", GENES))
+            self.assertFalse(await text2cypher_agent.aaccept_example("and unicorns?", "MATCH (u:Unicorn) RETURN u"))
+            self.assertFalse(await text2cypher_agent.aaccept_example("the gene", "Which gene do you mean?"))
+            self.assertEqual(len(self.store), 1)
+
+            inputs = agent._chain_inputs("list the genes", "e3", [])
+            self.assertEqual(agent.prompt_stats()["examples"]["store"]["added"], 1)
+        self.assertEqual([m.content for m in inputs["history"]], ["Which genes exist?", GENES])
+
+    async def test_confirmation_endpoint(self):
+        with patch.object(api_server, "EXAMPLES_ENABLED", False), self.assertRaises(HTTPException) as ctx:
+            await api_server.accept_example(api_server.ExampleRequest(question="list genes", cypher=GENES))
+        self.assertEqual(ctx.exception.status_code, 404)
+        with patch.object(api_server, "EXAMPLES_ENABLED", True), \
+                patch.object(text2cypher_agent, "EXAMPLES_ENABLED", True):
+            result = await api_server.accept_example(api_server.ExampleRequest(question="list genes", cypher=GENES))
+        self.assertEqual(result, {"stored": True})
+        self.assertEqual(self.store.match("list genes").cypher, GENES)
+
+    async def test_store_is_loaded_and_written_off_the_event_loop(self):
+        threads = []
+
+        def record_thread(method):
+            def wrapper(*args, **kwargs):
+                threads.append(threading.current_thread())
+                return method(*args, **kwargs)
+            return wrapper
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "examples.jsonl"
+            path.write_text('{"question": "list genes", "cypher": "%s"}\n' % GENES, encoding="utf-8")
+            set_example_store(None)
+            with patch.dict("os.environ", {"EXAMPLE_STORE_PATH": str(path)}), \
+                    patch.object(ExampleStore, "_load", record_thread(ExampleStore._load)), \
+                    patch.object(ExampleStore, "_persist", record_thread(ExampleStore._persist)):
+                store = await aget_example_store()
+                self.assertIs(await aget_example_store(), store)
+                self.assertTrue(await store.aadd("list diseases", DISEASES))
+                self.assertFalse(await store.aadd("list diseases", DISEASES))
+            store.close()
+            self.assertEqual(len(store), 2)
+            self.assertEqual(len(path.read_text().splitlines()), 2)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.main_thread(), threads)
+
+    async def test_direct_return_skips_the_llm(self):
+        self.store.add("list genes", GENES, schema_version="old")
+        self.store.add("list unicorns", "MATCH (u:Unicorn) RETURN u", schema_version="old")
+        agent = self.make_agent([COUNT_GENES, DISEASES, GENES])
+        with patch.object(text2cypher_agent, "EXAMPLE_DIRECT_RETURN", True):
+            self.assertEqual(await agent.arespond("List genes.", "d1"), GENES)
+            # Standalone questions only: with history the model is asked.
+            self.assertEqual(await agent.arespond("list genes", "d1"), COUNT_GENES)
+            # A stored query that no longer fits the schema is not reused.
+            self.assertEqual(await agent.arespond("list unicorns", "d2"), DISEASES)
+        self.assertEqual(self.llm.i, 2)
+        history = Text2CypherAgent.get_session_history("d1")
+        self.assertEqual([m["content"] for m in history][:2], ["List genes.", GENES])
+        self.assertEqual(agent.prompt_stats()["examples"]["direct"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
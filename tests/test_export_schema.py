@@ -0,0 +1,156 @@
+import io
+import json
+import re
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+import sys
+from unittest.mock import patch
+
+from neo4j import Record
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.export_neo4j_schema as exporter
+
+GRAPH = {
+    "TREATS_CtD": ("Compound", "Disease"),
+    "BINDS_CbG": ("Compound", "Gene"),
+    "ASSOCIATES_DaG": ("Disease", "Gene"),
+}
+NODE_PROPS = [("Compound", "name", ["String"]), ("Disease", "name", ["String"]), ("Gene", "name", ["String"])]
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, params=None):
+        params = params or {}
+        with self.driver.lock:
+            self.driver.queries.append(query)
+        if "nodeTypeProperties" in query:
+            rows = [{"nodeType": f":`{l}`", "propertyName": p, "propertyTypes": t} for l, p, t in NODE_PROPS]
+        elif "db.labels" in query:
+            rows = [{"label": label} for label in ("Compound", "Disease", "Gene", "Empty")]
+        elif "relTypeProperties" in query:
+            rows = [{"relType": ":`TREATS_CtD`", "propertyName": "source", "propertyTypes": ["String"]}]
+        elif "db.relationshipTypes" in query:
+            rows = [{"relationshipType": rtype} for rtype in [*GRAPH, "UNUSED"]]
+        else:
+            rows = []
+            for branch in query.split("\nUNION ALL\n"):
+                rtype = params[re.search(r"\$(t\d+)", branch).group(1)]
+                pair = GRAPH.get(rtype)
+                if pair is None:
+                    continue
+                if branch.startswith("MATCH (s)"):
+                    rows.append({"rtype": rtype, "src": pair[0], "tgt": pair[1]})
+                elif f"(:`{pair[0]}`)" in branch and f"(:`{pair[1]}`)" in branch:
+                    rows.append({"rtype": rtype})
+        return [Record(row) for row in rows]
+
+
+class FakeDriver:
+    def __init__(self):
+        self.queries = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def session(self, database=None):
+        return FakeSession(self)
+
+    def close(self):
+        self.closed = True
+
+
+class SampleEndpointsTests(unittest.TestCase):
+    def test_sample_query_has_no_sort_and_one_branch_per_type(self):
+        query, params = exporter.build_sample_query(["A", "we`ird"])
+        self.assertNotIn("ORDER BY", query)
+        self.assertEqual(query.count("LIMIT 1"), 2)
+        self.assertIn("[:`we``ird`]", query)
+        self.assertEqual(params, {"t0": "A", "t1": "we`ird"})
+
+    def test_types_are_sampled_in_batches(self):
+        driver = FakeDriver()
+        endpoints = exporter.sample_endpoints(driver, "neo4j", [*GRAPH, "UNUSED"], batch_size=2, workers=2)
+        self.assertEqual(endpoints["TREATS_CtD"], ["Compound", "Disease"])
+        self.assertEqual(endpoints["UNUSED"], ["Unknown", "Unknown"])
+        self.assertEqual(len(driver.queries), 2)
+
+    def test_previous_endpoints_are_verified_not_resampled(self):
+        driver = FakeDriver()
+        previous = {
+            "TREATS_CtD": ["Compound", "Disease"],
+            "BINDS_CbG": ["Compound", "Anatomy"],  # no longer exists
+            "ASSOCIATES_DaG": ["Unknown", "Unknown"],
+        }
+        endpoints = exporter.sample_endpoints(driver, "neo4j", list(GRAPH), previous=previous)
+        self.assertEqual(endpoints, {rtype: list(pair) for rtype, pair in GRAPH.items()})
+        verify, sample = driver.queries
+        self.assertIn("(:`Compound`)-[:`TREATS_CtD`]->(:`Disease`)", verify)
+        self.assertNotIn("TREATS_CtD", sample)
+
+
+class ExportMainTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {
+            "DB_URL": "bolt://localhost:7687", "DB_NAME": "neo4j", "DB_PASSWORD": "secret",
+        })
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def export(self, *flags) -> str:
+        out = io.StringIO()
+        argv = ["export_neo4j_schema.py", "--output_dir", self.tmp.name, *flags]
+        with patch.object(exporter.GraphDatabase, "driver", return_value=FakeDriver()), \
+                patch.object(sys, "argv", argv), redirect_stdout(out):
+            exporter.main()
+        return out.getvalue()
+
+    def test_full_export_reports_phases(self):
+        output = self.export()
+        for phase in ("schema properties", "endpoint sampling", "write", "total"):
+            self.assertIn(phase, output)
+        schema = json.loads((Path(self.tmp.name) / "neo4j_schema.json").read_text())
+        self.assertEqual(schema["RelationshipTypes"]["TREATS_CtD"], {
+            "_endpoints": ["Compound", "Disease"], "source": "String",
+        })
+        self.assertEqual(schema["NodeTypes"]["Empty"], {})
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [Path(self.tmp.name) / "neo4j_schema.json"])
+
+    def test_incremental_export_skips_unchanged_and_reports_diff(self):
+        self.export()
+        path = Path(self.tmp.name) / "neo4j_schema.json"
+        before = path.stat().st_mtime_ns
+
+        self.assertIn("Schema unchanged", self.export("--incremental"))
+        self.assertEqual(path.stat().st_mtime_ns, before)
+
+        schema = json.loads(path.read_text())
+        del schema["NodeTypes"]["Gene"]
+        schema["RelationshipTypes"]["TREATS_CtD"]["source"] = "Integer"
+        exporter.write_schema(path, schema)
+        output = self.export("--incremental")
+        self.assertIn("+ NodeTypes Gene", output)
+        self.assertIn("~ RelationshipTypes TREATS_CtD: source", output)
+        self.assertIn("Schema dumped", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
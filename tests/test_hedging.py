@@ -0,0 +1,205 @@
+import asyncio
+from contextlib import asynccontextmanager
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+from src.hedging import Hedger
+from src.response_cache import ResponseCache
+from src.text2cypher_agent import Text2CypherAgent
+
+
+class HedgerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_fast_primary_is_not_hedged(self):
+        hedger = Hedger(enabled=True, delay="0.05")
+        calls = []
+
+        async def call(provider):
+            calls.append(provider)
+            return provider
+
+        self.assertEqual(await hedger.race("openai", call), ("openai", "openai"))
+        self.assertEqual(calls, ["openai"])
+        self.assertEqual(hedger.stats()["openai"]["not_hedged"], 1)
+
+    async def test_slow_primary_loses_and_is_cancelled(self):
+        hedger = Hedger(enabled=True, delay="0.02")
+        cancelled = []
+
+        async def call(provider):
+            try:
+                await asyncio.sleep(1.0 if provider == "openai" else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(provider)
+                raise
+            return provider
+
+        self.assertEqual(await hedger.race("openai", call), ("google", "google"))
+        self.assertEqual(cancelled, ["openai"])
+        stats = hedger.stats()["openai"]
+        self.assertEqual((stats["secondary_won"], stats["hedge_rate"]), (1, 1.0))
+
+    async def test_slow_primary_can_still_win(self):
+        hedger = Hedger(enabled=True, delay="0.02")
+
+        async def call(provider):
+            await asyncio.sleep(0.04 if provider == "openai" else 1.0)
+            return provider
+
+        self.assertEqual(await hedger.race("openai", call), ("openai", "openai"))
+        self.assertEqual(hedger.stats()["openai"]["primary_won"], 1)
+
+    async def test_failed_primary_hedges_at_once(self):
+        hedger = Hedger(enabled=True, delay="10")
+
+        async def call(provider):
+            if provider == "google":
+                raise RuntimeError("provider down")
+            return provider
+
+        self.assertEqual(await hedger.race("google", call), ("openai", "openai"))
+
+    async def test_both_failing_raises_the_primary_error(self):
+        hedger = Hedger(enabled=True, delay="0")
+
+        async def call(provider):
+            raise RuntimeError(provider)
+
+        with self.assertRaisesRegex(RuntimeError, "openai"):
+            await hedger.race("openai", call)
+        self.assertEqual(hedger.stats()["openai"]["failed"], 1)
+
+    async def test_disabled_only_calls_the_primary(self):
+        hedger = Hedger(enabled=False, delay="0")
+        calls = []
+
+        async def call(provider):
+            calls.append(provider)
+            return provider
+
+        await hedger.race("openai", call)
+        self.assertEqual(calls, ["openai"])
+
+    def test_delay_follows_observed_quantile(self):
+        hedger = Hedger(enabled=True, delay="p90", min_delay_seconds=0.5, min_samples=10)
+        for seconds in range(1, 10):
+            hedger.observe("openai", seconds)
+        self.assertEqual(hedger.delay_for("openai"), 0.5)
+        hedger.observe("openai", 10)
+        self.assertEqual(hedger.delay_for("openai"), 9)
+        self.assertEqual(hedger.delay_for("google"), 0.5)
+
+    async def test_cancelled_slow_primaries_keep_the_delay_up(self):
+        hedger = Hedger(enabled=True, delay="p90", min_delay_seconds=0.001, min_samples=5)
+        for _ in range(5):
+            hedger.observe("openai", 0.02)
+        calls = []
+
+        async def call(provider):
+            if provider == "google":
+                await asyncio.sleep(0.002)
+            else:
+                calls.append(provider)
+                # One primary call in five is in the slow tail and loses.
+                await asyncio.sleep(10 if len(calls) % 5 == 1 else 0.001)
+            return provider
+
+        for _ in range(60):
+            await hedger.race("openai", call)
+        self.assertGreaterEqual(hedger.delay_for("openai"), 0.02)
+        self.assertEqual(hedger.stats()["openai"]["secondary_won"], 12)
+
+
+class DelayedAgent:
+    def __init__(self, provider, seconds):
+        self.provider = provider
+        self.seconds = seconds
+        self.calls = 0
+
+    async def agenerate(self, user_text: str, session_id: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        return f"MATCH (n:{self.provider.capitalize()}) RETURN n"
+
+
+class AskHedgingTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Text2CypherAgent.clear_session_history()
+        self._cache = patch.object(api_server, "_RESPONSE_CACHE", ResponseCache(max_entries=0))
+        self._cache.start()
+        self.hedger = Hedger(enabled=True, delay="0.02")
+        self._hedger = patch.object(api_server, "_HEDGER", self.hedger)
+        self._hedger.start()
+        self.agents = {"openai": DelayedAgent("openai", 1.0), "google": DelayedAgent("google", 0.01)}
+
+        async def get_agent(provider="openai"):
+            return self.agents[provider]
+
+        self._agent = patch("src.api_server.get_or_create_agent", get_agent)
+        self._agent.start()
+
+    async def asyncTearDown(self):
+        self._agent.stop()
+        self._hedger.stop()
+        self._cache.stop()
+        Text2CypherAgent.clear_session_history()
+
+    async def test_only_the_winner_enters_history(self):
+        result = await api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id="h1"))
+        self.assertEqual(result["answer"], "MATCH (n:Google) RETURN n")
+        history = Text2CypherAgent.get_session_history("h1")
+        self.assertEqual([m["role"] for m in history], ["user", "assistant"])
+        self.assertEqual(history[1]["provider"], "google")
+        self.assertEqual(self.agents["openai"].calls, 1)
+
+        text = (await api_server.metrics()).body.decode()
+        self.assertIn('text2cypher_hedges_total{primary="openai",outcome="secondary_won"} 1', text)
+
+    async def test_usage_of_the_winner_is_reported(self):
+        async def agenerate(user_text, session_id):
+            api_server.set_prompt_usage({"prompt_tokens": 42})
+            return "MATCH (g:Gene) RETURN g"
+
+        self.agents["google"].agenerate = agenerate
+        result = await api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id="h2"))
+        self.assertEqual((result["prompt_tokens"], result["provider"]), (42, "google"))
+
+    async def test_cache_hit_keeps_the_winning_provider(self):
+        with patch.object(api_server, "_RESPONSE_CACHE", ResponseCache(max_entries=10)):
+            await api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id="h3"))
+            result = await api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id="h4"))
+        self.assertEqual(result, {"answer": "MATCH (n:Google) RETURN n", "provider": "google"})
+        self.assertEqual(self.agents["google"].calls, 1)
+        history = Text2CypherAgent.get_session_history("h4")
+        self.assertEqual(history[1]["provider"], "google")
+
+    async def test_queue_wait_and_agent_build_are_not_timed(self):
+        self.agents["openai"].seconds = 0.01
+
+        async def get_agent(provider="openai"):
+            await asyncio.sleep(0.05)
+            return self.agents[provider]
+
+        @asynccontextmanager
+        async def slow_slot(provider):
+            await asyncio.sleep(0.05)
+            yield
+
+        hedger = Hedger(enabled=True, delay="p90", min_delay_seconds=0.5)
+        with patch.object(api_server, "_HEDGER", hedger), \
+                patch("src.api_server.get_or_create_agent", get_agent), \
+                patch.object(api_server, "_llm_slot", slow_slot):
+            await api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id="h5"))
+        samples = list(hedger._durations["openai"])
+        self.assertEqual(len(samples), 1)
+        self.assertLess(samples[0], 0.04)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.history_window as history_window
+import src.text2cypher_agent as text2cypher_agent
+from src.history_window import HistoryAssembler, message_tokens
+from src.text2cypher_agent import Text2CypherAgent, get_prompt_usage
+
+
+def conversation(turns: int, filler: int = 40) -> list:
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(f"question {i} " + "about genes " * filler))
+        messages.append(AIMessage(f"MATCH (g:Gene) WHERE g.id = {i} RETURN g", additional_kwargs={"provider": "openai"}))
+    return messages
+
+
+class HistoryAssemblerTests(unittest.TestCase):
+    def test_short_history_is_sent_unchanged(self):
+        messages = conversation(2, filler=1)
+        window = HistoryAssembler(budget_tokens=2000).assemble("s", messages)
+        self.assertEqual(window.messages, messages)
+        self.assertEqual(window.folded, 0)
+        self.assertEqual(window.tokens, sum(message_tokens(m) for m in messages))
+
+    def test_window_stays_within_budget_and_keeps_latest_draft(self):
+        assembler = HistoryAssembler(budget_tokens=500, summary_tokens=150)
+        for turns in (5, 20, 200):
+            window = assembler.assemble(f"s{turns}", conversation(turns))
+            self.assertLessEqual(window.tokens, 500)
+            self.assertIsInstance(window.messages[0], SystemMessage)
+            self.assertIsInstance(window.messages[1], HumanMessage)
+            self.assertIn(f"g.id = {turns - 1}", window.messages[-1].content)
+            self.assertEqual(window.folded + window.verbatim, turns * 2)
+
+    def test_summary_lists_folded_turns(self):
+        window = HistoryAssembler(budget_tokens=500, summary_tokens=300).assemble("s", conversation(6))
+        summary = window.messages[0].content
+        self.assertTrue(summary.startswith(history_window.SUMMARY_HEADER))
+        self.assertIn("question 0 about genes", summary)
+        self.assertIn("-> MATCH (g:Gene) WHERE g.id = 0 RETURN g", summary)
+
+    def test_oversized_latest_exchange_is_still_kept(self):
+        messages = conversation(3) + [HumanMessage("q"), AIMessage("MATCH (n) RETURN n " * 400)]
+        window = HistoryAssembler(budget_tokens=300, summary_tokens=100).assemble("s", messages)
+        self.assertEqual(window.messages[-1], messages[-1])
+        self.assertEqual(window.verbatim, 2)
+
+    def test_rolling_summary_is_extended_not_rebuilt(self):
+        assembler = HistoryAssembler(budget_tokens=700, summary_tokens=500)
+        messages = conversation(6)
+        first = assembler.assemble("s", messages)
+        self.assertFalse(first.summary_cached)
+
+        messages += conversation(8)[12:]
+        with patch.object(history_window, "summarize_turns", wraps=history_window.summarize_turns) as spy:
+            second = assembler.assemble("s", messages)
+        self.assertTrue(second.summary_cached)
+        folded_now = spy.call_args.args[0]
+        self.assertEqual(len(folded_now), second.folded - first.folded)
+        self.assertIn("question 0", second.messages[0].content)
+
+        # History trimmed from the front keeps the cached lines for dropped turns.
+        third = assembler.assemble("s", messages[4:])
+        self.assertTrue(third.summary_cached)
+        self.assertIn("question 0", third.messages[0].content)
+
+        assembler.forget("s")
+        self.assertFalse(assembler.assemble("s", messages[4:]).summary_cached)
+
+    def test_summary_is_capped(self):
+        assembler = HistoryAssembler(budget_tokens=400, summary_tokens=120)
+        window = assembler.assemble("s", conversation(300, filler=2))
+        self.assertLessEqual(window.summary_tokens, 120)
+        self.assertIn("older turns omitted", window.messages[0].content)
+
+
+class AgentPromptUsageTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Text2CypherAgent.clear_session_history()
+
+    async def asyncTearDown(self):
+        Text2CypherAgent.clear_session_history()
+
+    async def test_prompt_size_is_bounded_and_reported(self):
+        llm = FakeListChatModel(responses=["MATCH (g:Gene) RETURN g"])
+        assembler = HistoryAssembler(budget_tokens=600, summary_tokens=150)
+        with patch.object(text2cypher_agent, "make_llm", return_value=llm), \
+                patch.object(text2cypher_agent, "_HISTORY_ASSEMBLER", assembler):
+            agent = Text2CypherAgent(provider="openai")
+            sizes = []
+            for i in range(15):
+                await agent.arespond(f"question {i} " + "about genes " * 40, "long")
+                sizes.append(get_prompt_usage()["history_tokens"])
+
+        self.assertLessEqual(max(sizes), 600)
+        usage = get_prompt_usage()
+        self.assertGreater(usage["summarized_messages"], 0)
+        self.assertEqual(
+            usage["prompt_tokens"],
+            usage["system_tokens"] + usage["history_tokens"] + usage["question_tokens"],
+        )
+        stats = agent.prompt_stats()["prompt_tokens"]
+        self.assertEqual(stats["requests"], 15)
+        self.assertEqual(stats["last"], usage["prompt_tokens"])
+
+
+if __name__ == "__main__":
+    unittest.main()
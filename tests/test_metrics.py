@@ -0,0 +1,131 @@
+import asyncio
+import re
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import AsyncMock, patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+import src.text2cypher_agent as text2cypher_agent
+from src.metrics import Counter, Histogram, IN_FLIGHT, STAGE_SECONDS, TOKENS, reset_metrics
+from src.session_store import InMemorySessionStore, get_session_store, set_session_store
+from src.text2cypher_agent import Text2CypherAgent
+
+
+def sample(text: str, name: str, **labels) -> float:
+    selector = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    series = f"{name}{{{selector}}}" if labels else name
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.MULTILINE)
+    if match is None:
+        raise AssertionError(f"{series} not in metrics")
+    return float(match.group(1))
+
+
+class ExpositionTests(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("t_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, "llm")
+        self.assertEqual(list(histogram.lines()), [
+            "# HELP t_seconds Test.",
+            "# TYPE t_seconds histogram",
+            't_seconds_bucket{stage="llm",le="0.1"} 2',
+            't_seconds_bucket{stage="llm",le="1"} 3',
+            't_seconds_bucket{stage="llm",le="+Inf"} 4',
+            't_seconds_sum{stage="llm"} 3.65',
+            't_seconds_count{stage="llm"} 4',
+        ])
+
+    def test_labels_are_escaped_and_checked(self):
+        counter = Counter("t_total", "Test.", ("name",))
+        counter.inc('a "b"\n')
+        self.assertEqual(list(counter.lines())[-1], 't_total{name="a \\"b\\"\\n"} 1')
+        with self.assertRaises(ValueError):
+            counter.inc("a", "b")
+
+
+class SlowAgent:
+    async def arespond(self, user_text: str, session_id: str) -> str:
+        await asyncio.sleep(0.05)
+        return "MATCH (g:Gene) RETURN g"
+
+
+class MetricsEndpointTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        reset_metrics()
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+
+    async def asyncTearDown(self):
+        reset_metrics()
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+
+    async def scrape(self) -> str:
+        response = await api_server.metrics()
+        self.assertTrue(response.media_type.startswith("text/plain; version=0.0.4"))
+        return response.body.decode()
+
+    async def test_request_stages_and_tokens(self):
+        llm = FakeListChatModel(responses=["MATCH (g:Gene) RETURN g"])
+        with patch.object(text2cypher_agent, "make_llm", return_value=llm):
+            agent = Text2CypherAgent(provider="openai")
+        misses = api_server._RESPONSE_CACHE.stats()["misses"]
+        with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=agent)):
+            await api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id="m1"))
+        agent._record_provider_usage(
+            {"input_tokens": 100, "output_tokens": 7, "input_token_details": {"cache_read": 60}}
+        )
+
+        text = await self.scrape()
+        for stage in ("session_lock", "agent", "history", "llm", "refine", "total"):
+            self.assertEqual(
+                sample(text, "text2cypher_stage_seconds_count", stage=stage, provider="openai"), 1, stage
+            )
+        self.assertEqual(sample(text, "text2cypher_requests_in_flight", endpoint="ask"), 0)
+        self.assertEqual(sample(text, "text2cypher_tokens_total", provider="openai", type="input"), 100)
+        self.assertEqual(sample(text, "text2cypher_tokens_total", provider="openai", type="cached_input"), 60)
+        self.assertEqual(sample(text, "text2cypher_tokens_total", provider="openai", type="output"), 7)
+        self.assertEqual(sample(text, "text2cypher_response_cache_events_total", event="misses"), misses + 1)
+
+    async def test_in_flight_gauge(self):
+        with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=SlowAgent())):
+            request = asyncio.create_task(
+                api_server.ask_llm_agent(api_server.QueryRequest(query="q", session_id="m2"))
+            )
+            await asyncio.sleep(0.01)
+            self.assertEqual(IN_FLIGHT.value("ask"), 1)
+            await request
+        self.assertEqual(IN_FLIGHT.value("ask"), 0)
+        self.assertEqual(STAGE_SECONDS.count("total", "openai"), 1)
+        self.assertEqual(TOKENS.value("openai", "input"), 0)
+
+    async def test_session_store_sizes_and_evictions(self):
+        previous = get_session_store()
+        store = InMemorySessionStore(max_sessions=1, max_assistant_sessions=1, max_run_locks=1)
+        set_session_store(store)
+        try:
+            for session_id in ("a", "b"):
+                store.append_messages(session_id, [HumanMessage("q"), AIMessage("a")])
+                await store.set_assistant_thread(session_id, f"thread-{session_id}")
+                await store.get_run_lock(session_id)
+            text = await self.scrape()
+        finally:
+            set_session_store(previous)
+
+        for name in ("histories", "assistant_threads", "run_locks"):
+            self.assertEqual(sample(text, "text2cypher_session_store_entries", map=name), 1)
+            self.assertEqual(sample(text, "text2cypher_session_store_evictions_total", map=name), 1)
+        self.assertEqual(sample(text, "text2cypher_session_store_evictions_total", map="history_bytes"), 0)
+        self.assertGreater(sample(text, "text2cypher_session_history_bytes"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
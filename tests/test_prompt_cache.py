@@ -0,0 +1,136 @@
+import unittest
+from pathlib import Path
+import sys
+from typing import Any, Iterator, List
+from unittest.mock import AsyncMock, patch
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+import src.text2cypher_agent as text2cypher_agent
+from src.history_window import HistoryAssembler
+from src.text2cypher_agent import Text2CypherAgent, get_prompt_usage
+
+
+class PrefixCachingChatModel(BaseChatModel):
+    """Reports the system prompt as cached once it has been seen before."""
+
+    seen_prefixes: List[str] = []
+    calls: List[List[BaseMessage]] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "prefix-caching-fake"
+
+    def _usage(self, messages: List[BaseMessage]) -> dict:
+        self.calls.append(messages)
+        prefix = messages[0].content
+        cached = len(prefix) // 4 if prefix in self.seen_prefixes else 0
+        self.seen_prefixes.append(prefix)
+        input_tokens = sum(len(m.content) for m in messages) // 4
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": 5,
+            "total_tokens": input_tokens + 5,
+            "input_token_details": {"cache_read": cached},
+        }
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message = AIMessage(content="MATCH (g:Gene) RETURN g", usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        yield ChatGenerationChunk(message=AIMessageChunk(content="MATCH (g:Gene) "))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="RETURN g"))
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(content="", usage_metadata=self._usage(messages))
+        )
+
+
+class PromptCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+        self.llm = PrefixCachingChatModel(seen_prefixes=[], calls=[])
+        with patch.object(text2cypher_agent, "make_llm", return_value=self.llm):
+            self.agent = Text2CypherAgent(provider="openai")
+
+    async def asyncTearDown(self):
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+
+    async def test_system_prompt_is_a_byte_stable_first_message(self):
+        assembler = HistoryAssembler(budget_tokens=200, summary_tokens=100)
+        with patch.object(text2cypher_agent, "_HISTORY_ASSEMBLER", assembler):
+            for i in range(4):
+                await self.agent.arespond(f"question {i} " + "about genes " * 40, "stable")
+            await self.agent.arespond("other session", "other")
+
+        prefixes = {call[0].content for call in self.llm.calls}
+        self.assertEqual(prefixes, {self.agent.system_prompt})
+        self.assertTrue(all(isinstance(call[0], SystemMessage) for call in self.llm.calls))
+        # The history summary follows the prefix instead of changing it.
+        self.assertIn("Summary of earlier conversation", self.llm.calls[3][1].content)
+
+    async def test_cached_and_uncached_tokens_are_recorded(self):
+        await self.agent.arespond("list genes", "c1")
+        first = dict(get_prompt_usage())
+        await self.agent.arespond("list diseases", "c2")
+        second = get_prompt_usage()
+
+        self.assertEqual(first["cached_input_tokens"], 0)
+        self.assertGreater(second["cached_input_tokens"], 0)
+        self.assertEqual(
+            second["uncached_input_tokens"],
+            second["input_tokens"] - second["cached_input_tokens"],
+        )
+        self.assertEqual(first["prefix_hash"], second["prefix_hash"])
+
+        cache = self.agent.prompt_stats()["prompt_cache"]
+        self.assertEqual(cache["reported_requests"], 2)
+        self.assertEqual(cache["cache_hit_requests"], 1)
+        self.assertGreater(cache["cached_ratio"], 0)
+
+    async def test_api_reports_cached_tokens_for_streams_and_requests(self):
+        with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=self.agent)):
+            first = await api_server.ask_llm_agent(
+                api_server.QueryRequest(query="list genes", session_id="api1")
+            )
+            response = await api_server.ask_llm_agent_stream(
+                api_server.QueryRequest(query="list compounds", session_id="api2")
+            )
+            chunks = [chunk async for chunk in response.body_iterator]
+
+        self.assertEqual(first["cached_prompt_tokens"], 0)
+        done = [c for c in chunks if c.startswith("event: done")][0]
+        self.assertIn('"cached_prompt_tokens": ', done)
+        self.assertNotIn('"cached_prompt_tokens": 0', done)
+
+
+class MakeLlmTests(unittest.TestCase):
+    def test_openai_gets_cache_key_and_stream_usage(self):
+        env = {"OPENAI_API_KEY": "sk-test", "OPENAI_API_MODEL": "gpt-5-mini"}
+        with patch.dict("os.environ", env):
+            llm = text2cypher_agent.make_llm("openai")
+        self.assertTrue(llm.stream_usage)
+        self.assertEqual(llm.model_kwargs["prompt_cache_key"], text2cypher_agent.prompt_cache_key())
+
+    def test_compatible_servers_get_no_extra_parameters(self):
+        env = {
+            "OPENAI_API_KEY": "sk-test",
+            "OPENAI_API_MODEL": "local",
+            "OPENAI_API_BASE_URL": "http://localhost:8080/v1",
+        }
+        with patch.dict("os.environ", env):
+            llm = text2cypher_agent.make_llm("openai")
+        self.assertNotIn("prompt_cache_key", llm.model_kwargs)
+
+
+if __name__ == "__main__":
+    unittest.main()
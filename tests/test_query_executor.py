@@ -0,0 +1,187 @@
+import json
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from neo4j import READ_ACCESS
+from pydantic import ValidationError
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+from src.example_store import ExampleStore, set_example_store
+from src.query_executor import (
+    QueryExecutor,
+    ReadOnlyViolation,
+    check_read_only,
+    close_query_executor,
+    get_query_executor,
+    set_query_executor,
+)
+from tests.fake_neo4j import FakeDriver, make_node, syntax_error
+
+
+async def collect_lines(response) -> list[dict]:
+    lines = []
+    async for chunk in response.body_iterator:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        lines.extend(json.loads(line) for line in text.splitlines() if line)
+    return lines
+
+
+class ReadOnlyCheckTests(unittest.TestCase):
+    def test_write_clauses_are_rejected(self):
+        for query in (
+            "CREATE (n:Disease {name: 'x'})",
+            "MATCH (n) DETACH DELETE n",
+            "MATCH (n:Disease) SET n.name = 'x' RETURN n",
+            "merge (n:Gene {name: 'x'}) return n",
+            "LOAD CSV FROM 'file:///x.csv' AS row RETURN row",
+            "MATCH (a) WITH a AS start SET start.flag = true",
+            "MATCH (n) RETURN n UNION CREATE (m:Gene) RETURN m",
+            "DROP INDEX gene_name",
+        ):
+            with self.subTest(query=query), self.assertRaises(ReadOnlyViolation):
+                check_read_only(query)
+
+    def test_reads_that_mention_write_words_pass(self):
+        for query in (
+            "MATCH (n:Disease) WHERE n.name = 'CREATE' RETURN n",
+            "MATCH (n) WHERE n.set IS NOT NULL RETURN n {set: n.set}",
+            "MATCH (n:Delete) RETURN n // DELETE everything",
+            "MATCH (start:Disease)-[r]->(x) RETURN start",
+            "MATCH (a:Gene) WITH a AS start MATCH (start)-[:END]->(end) RETURN start, end",
+            "MATCH (n) RETURN n.name AS set ORDER BY set",
+            "MATCH (set:Gene)-[create]->(m) WHERE set.name = 'x' RETURN set, create LIMIT 5",
+            "MATCH (n) RETURN n.name AS `delete`",
+        ):
+            with self.subTest(query=query):
+                check_read_only(query)
+
+
+class QueryExecutorTests(unittest.IsolatedAsyncioTestCase):
+    async def test_streams_columns_rows_and_summary(self):
+        driver = FakeDriver(
+            ["d", "name"],
+            [[make_node("4:x:1", ["Disease"], name="asthma"), "asthma"]],
+        )
+        executor = QueryExecutor(driver, database="neo4j", timeout_seconds=5, fetch_size=10)
+        items = [item async for item in executor.stream("MATCH (d:Disease) RETURN d, d.name AS name")]
+
+        self.assertEqual(items[0], {"columns": ["d", "name"]})
+        self.assertEqual(
+            items[1]["row"]["d"],
+            {"element_id": "4:x:1", "labels": ["Disease"], "properties": {"name": "asthma"}},
+        )
+        self.assertEqual(items[-1]["rows"], 1)
+        self.assertFalse(items[-1]["truncated"])
+        config = driver.sessions[0].config
+        self.assertEqual(config["default_access_mode"], READ_ACCESS)
+        self.assertEqual((config["database"], config["fetch_size"]), ("neo4j", 10))
+        self.assertEqual(driver.timeouts, [5])
+        self.assertTrue(driver.transactions[0].closed)
+
+    async def test_row_limit_stops_pulling(self):
+        driver = FakeDriver(["n"], [[i] for i in range(10_000)])
+        executor = QueryExecutor(driver, max_rows=50)
+        items = [item async for item in executor.stream("UNWIND range(1, 10000) AS n RETURN n", max_rows=500)]
+
+        self.assertEqual(len(items), 52)
+        self.assertTrue(items[-1]["truncated"])
+        self.assertLessEqual(driver.pulled, 51)
+
+    async def test_time_limit(self):
+        driver = FakeDriver(["n"], [[i] for i in range(100)])
+        executor = QueryExecutor(driver, timeout_seconds=0)
+        items = [item async for item in executor.stream("UNWIND range(1, 100) AS n RETURN n")]
+        self.assertTrue(items[-1]["timed_out"])
+        self.assertEqual(items[-1]["rows"], 1)
+
+    async def test_consumer_that_stops_early_closes_the_transaction(self):
+        driver = FakeDriver(["n"], [[i] for i in range(100)])
+        stream = QueryExecutor(driver).stream("UNWIND range(1, 100) AS n RETURN n")
+        await stream.__anext__()
+        await stream.__anext__()
+        await stream.aclose()
+        self.assertTrue(driver.transactions[0].closed)
+        self.assertEqual(driver.open_sessions, 0)
+        self.assertEqual(driver.pulled, 1)
+
+    async def test_shared_executor_is_created_once_and_closed(self):
+        set_query_executor(None)
+        with patch("src.query_executor.create_query_executor", return_value=QueryExecutor(FakeDriver([], []))) as create:
+            first = await get_query_executor()
+            self.assertIs(await get_query_executor(), first)
+        create.assert_called_once()
+        await close_query_executor()
+        self.assertTrue(first.driver.closed)
+
+
+class ExecuteEndpointTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.driver = FakeDriver(["n"], [[1], [2], [3]])
+        set_query_executor(QueryExecutor(self.driver))
+        self._enabled = patch("src.api_server.QUERY_EXECUTION", True)
+        self._enabled.start()
+
+    async def asyncTearDown(self):
+        self._enabled.stop()
+        set_query_executor(None)
+
+    async def test_streams_ndjson(self):
+        req = api_server.ExecuteRequest(query="UNWIND [1, 2, 3] AS n RETURN n", parameters={"x": 1}, max_rows=2)
+        response = await api_server.execute_query(req)
+        self.assertEqual(response.media_type, "application/x-ndjson")
+        lines = await collect_lines(response)
+
+        self.assertEqual([line["row"]["n"] for line in lines[1:-1]], [1, 2])
+        self.assertTrue(lines[-1]["truncated"])
+        self.assertEqual(self.driver.queries, [("UNWIND [1, 2, 3] AS n RETURN n", {"x": 1})])
+
+    async def test_run_with_rows_accepts_the_question_as_an_example(self):
+        store = ExampleStore()
+        set_example_store(store)
+        self.addCleanup(set_example_store, None)
+        query = "UNWIND [1, 2, 3] AS n RETURN n"
+        with patch("src.text2cypher_agent.EXAMPLES_ENABLED", True):
+            await collect_lines(await api_server.execute_query(api_server.ExecuteRequest(query=query)))
+            self.assertEqual(len(store), 0)
+            req = api_server.ExecuteRequest(query=query, question="count to three")
+            await collect_lines(await api_server.execute_query(req))
+            self.assertEqual(store.match("count to three").cypher, query)
+
+            # No rows: not an acceptance.
+            set_query_executor(QueryExecutor(FakeDriver(["n"], [])))
+            req = api_server.ExecuteRequest(query="UNWIND [] AS n RETURN n", question="nothing")
+            await collect_lines(await api_server.execute_query(req))
+        self.assertEqual(len(store), 1)
+
+    async def test_write_query_is_rejected_before_connecting(self):
+        with self.assertRaises(HTTPException) as ctx:
+            await api_server.execute_query(api_server.ExecuteRequest(query="MATCH (n) DELETE n"))
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertEqual(self.driver.sessions, [])
+
+    async def test_server_error_ends_the_stream(self):
+        self.driver.error = syntax_error("Invalid input 'RETRN'")
+        response = await api_server.execute_query(api_server.ExecuteRequest(query="MATCH (n) RETRN n"))
+        lines = await collect_lines(response)
+        self.assertEqual(lines, [{
+            "error": "Invalid input 'RETRN'",
+            "code": "Neo.ClientError.Statement.SyntaxError",
+        }])
+
+    async def test_disabled_and_invalid_requests(self):
+        with patch("src.api_server.QUERY_EXECUTION", False), self.assertRaises(HTTPException) as ctx:
+            await api_server.execute_query(api_server.ExecuteRequest(query="RETURN 1"))
+        self.assertEqual(ctx.exception.status_code, 404)
+        with self.assertRaises(ValidationError):
+            api_server.ExecuteRequest(query="RETURN 1", max_rows=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import json
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import AsyncMock, patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+import src.text2cypher_agent as text2cypher_agent
+from src.query_executor import QueryExecutor, set_query_executor
+from src.query_plan import analyze_plan
+from src.text2cypher_agent import Text2CypherAgent
+from tests.fake_neo4j import FakeDriver
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "plans"
+
+EXPENSIVE = "MATCH (g:Gene), (c:Compound) RETURN g, c"
+CHEAPER = "MATCH (c:Compound)-[:BINDS_CbG]->(g:Gene) RETURN c, g LIMIT 10"
+
+
+def load_plan(name: str) -> dict:
+    return json.loads((FIXTURES / f"{name}.json").read_text(encoding="utf-8"))
+
+
+class AnalyzePlanTests(unittest.TestCase):
+    def test_anchored_query_is_ok(self):
+        cost = analyze_plan(load_plan("anchored"))
+        self.assertEqual(cost.verdict, "ok")
+        self.assertEqual((cost.risks, cost.warnings), ([], []))
+        self.assertAlmostEqual(cost.estimated_rows, 2.3)
+
+    def test_cartesian_product(self):
+        cost = analyze_plan(load_plan("cartesian"))
+        self.assertEqual(cost.verdict, "expensive")
+        self.assertEqual(cost.risks, ["Cartesian product of unconnected patterns (g) x (c)"])
+        self.assertEqual(cost.estimated_rows, 4.0e8)
+        self.assertIn("Cartesian product", cost.feedback())
+        self.assertIn("400,000,000 rows", cost.feedback())
+
+    def test_all_nodes_scan(self):
+        cost = analyze_plan(load_plan("all_nodes_scan"))
+        self.assertEqual(cost.verdict, "expensive")
+        self.assertIn("scan of all nodes", cost.risks[0])
+
+    def test_unbounded_variable_length_path(self):
+        cost = analyze_plan(load_plan("unbounded_var_length"))
+        self.assertEqual(cost.verdict, "expensive")
+        self.assertEqual(len(cost.risks), 1)
+        self.assertIn("without an upper bound", cost.risks[0])
+
+    def test_label_scan_is_a_warning_and_bounded_paths_pass(self):
+        cost = analyze_plan(load_plan("label_scan_bounded_var_length"))
+        self.assertEqual(cost.verdict, "warn")
+        self.assertEqual(cost.risks, [])
+        self.assertEqual(cost.warnings, ["full label scan g:Gene (about 20,945 rows)"])
+
+    def test_row_threshold_and_missing_plan(self):
+        self.assertEqual(analyze_plan(load_plan("anchored"), max_estimated_rows=2).verdict, "expensive")
+        self.assertEqual(analyze_plan(None).verdict, "unknown")
+
+    def test_ranking(self):
+        expensive = analyze_plan(load_plan("cartesian"))
+        warn = analyze_plan(load_plan("label_scan_bounded_var_length"))
+        self.assertTrue(warn.is_better_than(expensive))
+        self.assertFalse(expensive.is_better_than(warn))
+        self.assertFalse(analyze_plan(None).is_better_than(expensive))
+
+
+class PreflightTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+        self._enabled = patch.object(text2cypher_agent, "QUERY_PREFLIGHT", True)
+        self._enabled.start()
+
+    async def asyncTearDown(self):
+        self._enabled.stop()
+        set_query_executor(None)
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+
+    def make_agent(self, responses, plans):
+        self.driver = FakeDriver([], [], plans=[load_plan(name) for name in plans])
+        set_query_executor(QueryExecutor(self.driver))
+        llm = FakeListChatModel(responses=responses)
+        with patch.object(text2cypher_agent, "make_llm", return_value=llm):
+            return Text2CypherAgent(provider="openai")
+
+    async def test_expensive_query_is_regenerated_with_plan_feedback(self):
+        agent = self.make_agent([EXPENSIVE, CHEAPER], ["cartesian", "anchored"])
+        with patch.object(
+            Text2CypherAgent, "_followup_inputs", wraps=Text2CypherAgent._followup_inputs
+        ) as spy, patch("src.api_server.get_or_create_agent", AsyncMock(return_value=agent)):
+            result = await api_server.ask_llm_agent(
+                api_server.QueryRequest(query="genes and compounds", session_id="p1")
+            )
+
+        self.assertEqual(result["answer"], CHEAPER)
+        self.assertEqual(result["cost"], {
+            "verdict": "ok", "estimated_rows": 2, "risks": [], "regenerated": True,
+        })
+        self.assertIn("Cartesian product", spy.call_args.args[2])
+        self.assertEqual(
+            [query for query, _ in self.driver.queries],
+            [f"EXPLAIN {EXPENSIVE}", f"EXPLAIN {CHEAPER}"],
+        )
+        self.assertEqual(agent.prompt_stats()["preflight"]["regenerated"], 1)
+
+    async def test_regeneration_that_is_not_cheaper_is_discarded(self):
+        agent = self.make_agent([EXPENSIVE, CHEAPER], ["cartesian", "cartesian"])
+        self.assertEqual(await agent.arespond("genes and compounds", "p2"), EXPENSIVE)
+        cost = text2cypher_agent.get_prompt_usage()["cost"]
+        self.assertEqual((cost["verdict"], cost["regenerated"]), ("expensive", False))
+
+    async def test_cheap_query_makes_one_call_and_unavailable_db_is_unknown(self):
+        agent = self.make_agent([CHEAPER], ["anchored"])
+        self.assertEqual(await agent.arespond("compounds binding genes", "p3"), CHEAPER)
+        self.assertEqual(text2cypher_agent.get_prompt_usage()["cost"]["verdict"], "ok")
+
+        with patch.object(QueryExecutor, "explain", AsyncMock(side_effect=OSError("refused"))):
+            await agent.arespond("compounds binding genes", "p4")
+        self.assertEqual(text2cypher_agent.get_prompt_usage()["cost"]["verdict"], "unknown")
+        self.assertEqual(agent.prompt_stats()["preflight"]["unknown"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
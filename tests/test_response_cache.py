@@ -0,0 +1,103 @@
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import AsyncMock, patch
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+from src.response_cache import ResponseCache, make_cache_key, normalize_question
+from src.text2cypher_agent import Text2CypherAgent
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingAgent:
+    def __init__(self):
+        self.calls = 0
+
+    async def arespond(self, query: str, session_id: str) -> str:
+        self.calls += 1
+        Text2CypherAgent.append_external_exchange(
+            session_id, query, f"RETURN '{query}' AS q", provider="openai"
+        )
+        return f"RETURN '{query}' AS q"
+
+
+class ResponseCacheTests(unittest.TestCase):
+    def test_lru_eviction_and_counters(self):
+        cache = ResponseCache(max_entries=2, ttl_seconds=60)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        self.assertEqual(cache.get("a"), "A")
+        cache.put("c", "C")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "C")
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = ResponseCache(max_entries=10, ttl_seconds=5, clock=clock)
+        cache.put("a", "A")
+        clock.now = 4.9
+        self.assertEqual(cache.get("a"), "A")
+        clock.now = 5.0
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_disabled_cache_never_stores(self):
+        cache = ResponseCache(max_entries=0)
+        cache.put("a", "A")
+        self.assertIsNone(cache.get("a"))
+
+    def test_key_normalizes_question_and_tracks_history(self):
+        self.assertEqual(normalize_question("  Show   genes? "), "Show genes")
+        key_a = make_cache_key("openai", "m", "Show genes?", "v1", [])
+        key_b = make_cache_key("openai", "m", "Show  genes", "v1", [])
+        key_c = make_cache_key(
+            "openai", "m", "Show genes", "v1", [{"role": "user", "content": "x"}]
+        )
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(key_a, key_c)
+
+
+class AskCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+
+    async def asyncTearDown(self):
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+
+    async def test_cache_hit_skips_llm_and_updates_history(self):
+        agent = CountingAgent()
+        with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=agent)):
+            first = await api_server.ask_llm_agent(
+                api_server.QueryRequest(query="list genes", session_id="c1")
+            )
+            second = await api_server.ask_llm_agent(
+                api_server.QueryRequest(query="list genes", session_id="c2")
+            )
+
+        self.assertEqual(first, second)
+        self.assertEqual(agent.calls, 1)
+        history = Text2CypherAgent.get_session_history("c2")
+        self.assertEqual([m["role"] for m in history], ["user", "assistant"])
+        self.assertEqual(history[1]["provider"], "openai")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -17,22 +17,21 @@ import src.schema_loader as schema_loader
 
 class SchemaEndpointTest(unittest.TestCase):
     def test_schema_keys(self):
-        schema = asyncio.run(api_server.fetch_schema())
+        response = api_server.Response()
+        schema = asyncio.run(api_server.fetch_schema(response))
         self.assertIn("NodeTypes", schema)
         self.assertIn("RelationshipTypes", schema)
+        self.assertEqual(response.headers["X-Schema-Version"], schema_loader.get_schema_version())
 
     def test_schema_hints_path_is_optional(self):
-        old_cached_hints = schema_loader._cached_hints
-        old_hints_loaded = schema_loader._hints_loaded
+        old_snapshot = schema_loader.get_schema_snapshot()
         try:
-            schema_loader._cached_hints = None
-            schema_loader._hints_loaded = False
+            schema_loader.reset_schema_cache()
             with patch.dict(os.environ, {}, clear=False):
                 os.environ.pop("SCHEMA_HINTS_PATH", None)
                 self.assertIsNone(schema_loader.get_schema_hints())
         finally:
-            schema_loader._cached_hints = old_cached_hints
-            schema_loader._hints_loaded = old_hints_loaded
+            schema_loader.publish_schema_snapshot(old_snapshot)
 
     def test_session_id_validation(self):
         with self.assertRaises(ValidationError):
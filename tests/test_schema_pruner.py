@@ -0,0 +1,100 @@
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.text2cypher_agent as text2cypher_agent
+from src.schema_pruner import SchemaPruner, tokenize
+from src.text2cypher_agent import Text2CypherAgent
+
+SCHEMA = {
+    "NodeTypes": {
+        "Compound": {"identifier": "String", "name": "String", "inchikey": "String"},
+        "Disease": {"identifier": "String", "name": "String"},
+        "Gene": {"identifier": "Long", "name": "String", "chromosome": "String"},
+        "Pathway": {"identifier": "String", "name": "String"},
+    },
+    "RelationshipTypes": {
+        "TREATS_CtD": {"_endpoints": ["Compound", "Disease"]},
+        "PALLIATES_CpD": {"_endpoints": ["Compound", "Disease"]},
+        "ASSOCIATES_DaG": {"_endpoints": ["Disease", "Gene"]},
+        "PARTICIPATES_GpPW": {"_endpoints": ["Gene", "Pathway"]},
+    },
+}
+HINTS = {
+    "relationships": {
+        "TREATS_CtD": "Compound treats Disease",
+        "PALLIATES_CpD": "Compound palliates Disease",
+        "ASSOCIATES_DaG": "Disease associates with Gene",
+        "PARTICIPATES_GpPW": "Gene participates in Pathway",
+    }
+}
+
+
+class SchemaPrunerTests(unittest.TestCase):
+    def test_tokenize_splits_identifiers_and_stems(self):
+        self.assertEqual(tokenize("BiologicalProcess"), ["biological", "process"])
+        self.assertEqual(tokenize("treats treated"), ["treat", "treat"])
+        self.assertEqual(tokenize("TREATS_CtD"), ["treat", "ct"])
+
+    def test_selects_matching_subschema_with_neighbours(self):
+        pruner = SchemaPruner(SCHEMA, HINTS)
+        result = pruner.prune("Which compounds treat hypertension?")
+
+        self.assertTrue(result.pruned)
+        self.assertEqual(result.labels, ["Compound", "Disease"])
+        self.assertEqual(result.relationships, ["PALLIATES_CpD", "TREATS_CtD"])
+        self.assertNotIn("Gene", result.schema["NodeTypes"])
+        self.assertEqual(
+            set(result.hints["relationships"]), {"PALLIATES_CpD", "TREATS_CtD"}
+        )
+
+    def test_label_without_matched_relationship_pulls_incident_types(self):
+        pruner = SchemaPruner(SCHEMA, HINTS)
+        result = pruner.prune("Show the pathways of BRCA1")
+        self.assertEqual(result.relationships, ["PARTICIPATES_GpPW"])
+        self.assertEqual(result.labels, ["Gene", "Pathway"])
+
+    def test_low_confidence_falls_back_to_full_schema(self):
+        pruner = SchemaPruner(SCHEMA, HINTS)
+        result = pruner.prune("hello there, anything interesting?")
+        self.assertFalse(result.pruned)
+        self.assertIs(result.schema, SCHEMA)
+
+    def test_record_reports_savings(self):
+        pruner = SchemaPruner(SCHEMA, HINTS)
+        pruner.record(pruner.prune("compounds treating disease"), 100, 40)
+        stats = pruner.stats()
+        self.assertEqual(stats["pruned_requests"], 1)
+        self.assertEqual(stats["saved_tokens"], 60)
+
+
+class AgentPruningTests(unittest.TestCase):
+    def tearDown(self):
+        Text2CypherAgent.clear_session_history()
+
+    def test_agent_sends_pruned_system_prompt(self):
+        llm = FakeListChatModel(responses=["```MATCH (c:Compound) RETURN c```"])
+        with patch.object(text2cypher_agent, "SCHEMA_PRUNING", True), \
+                patch.object(text2cypher_agent, "get_schema", return_value=SCHEMA), \
+                patch.object(text2cypher_agent, "get_schema_hints", return_value=HINTS), \
+                patch.object(text2cypher_agent, "get_schema_version", return_value="test"), \
+                patch.object(text2cypher_agent, "make_llm", return_value=llm):
+            agent = Text2CypherAgent(provider="openai")
+            prompt = agent._system_prompt_for("Which compounds treat asthma?")
+            answer = agent.respond("Which compounds treat asthma?", "prune-session")
+
+        self.assertIn("(:Compound)-[:TREATS_CtD]->(:Disease)", prompt)
+        self.assertNotIn("Pathway", prompt)
+        self.assertEqual(answer, "MATCH (c:Compound) RETURN c")
+        self.assertEqual(agent.prompt_stats()["pruned_requests"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+import src.schema_loader as schema_loader
+import src.text2cypher_agent as text2cypher_agent
+from src.cypher_validator import get_cypher_validator
+from src.text2cypher_agent import Text2CypherAgent
+
+SCHEMA = {
+    "NodeTypes": {"Gene": {"name": "String"}, "Disease": {"name": "String"}},
+    "RelationshipTypes": {"ASSOCIATES_DaG": {"_endpoints": ["Disease", "Gene"]}},
+}
+
+
+def with_compound(schema: dict) -> dict:
+    return {**schema, "NodeTypes": {**schema["NodeTypes"], "Compound": {"name": "String"}}}
+
+
+class TempSchemaMixin:
+    def use_temp_schema(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "neo4j_schema.json"
+        self.write(SCHEMA)
+        self.env = patch.dict(os.environ, {"NEO4J_SCHEMA_PATH": str(self.path)})
+        self.env.start()
+        os.environ.pop("SCHEMA_HINTS_PATH", None)
+        self.old_snapshot = schema_loader.get_schema_snapshot()
+        schema_loader.reset_schema_cache()
+
+    def restore_schema(self):
+        self.env.stop()
+        schema_loader.publish_schema_snapshot(self.old_snapshot)
+        self.tmp.cleanup()
+
+    def write(self, schema: dict, indent=None):
+        # Bump the mtime explicitly; coarse filesystem clocks may not.
+        previous = self.path.stat().st_mtime_ns if self.path.exists() else 0
+        self.path.write_text(json.dumps(schema, indent=indent), encoding="utf-8")
+        os.utime(self.path, ns=(previous + 10**9, previous + 10**9))
+
+
+class SchemaRefreshTests(TempSchemaMixin, unittest.TestCase):
+    def setUp(self):
+        self.use_temp_schema()
+
+    def tearDown(self):
+        self.restore_schema()
+
+    def test_unchanged_files_are_not_reread(self):
+        schema_loader.get_schema_snapshot()
+        with patch.object(schema_loader, "load_schema_snapshot") as load:
+            self.assertIsNone(schema_loader.refresh_schema())
+        load.assert_not_called()
+
+    def test_rewrite_with_same_content_keeps_the_version(self):
+        before = schema_loader.get_schema_snapshot()
+        self.write(SCHEMA, indent=2)
+        self.assertIsNone(schema_loader.refresh_schema())
+        after = schema_loader.get_schema_snapshot()
+        self.assertEqual(after.version, before.version)
+        self.assertNotEqual(after.stamps, before.stamps)
+
+    def test_changed_content_returns_an_unpublished_snapshot(self):
+        before = schema_loader.get_schema_snapshot()
+        self.write(with_compound(SCHEMA))
+        snapshot = schema_loader.refresh_schema()
+        self.assertIn("Compound", snapshot.schema["NodeTypes"])
+        self.assertNotEqual(snapshot.version, before.version)
+        self.assertEqual(schema_loader.get_schema_version(), before.version)
+
+    def test_unparsable_file_keeps_the_current_schema(self):
+        before = schema_loader.get_schema_version()
+        self.path.write_text('{"NodeTypes": {', encoding="utf-8")
+        os.utime(self.path, ns=(1, 1))
+        with self.assertLogs("src.schema_loader", level="WARNING"):
+            self.assertIsNone(schema_loader.refresh_schema())
+        self.assertEqual(schema_loader.get_schema_version(), before)
+
+
+class SchemaReloadTests(TempSchemaMixin, unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.use_temp_schema()
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+        self.llm = FakeListChatModel(responses=["MATCH (g:Gene) RETURN g"], sleep=0.2)
+        self._llm = patch.object(text2cypher_agent, "make_llm", return_value=self.llm)
+        self._llm.start()
+        self._agents = patch.dict(api_server._AGENT_INSTANCES, {"openai": None, "google": None})
+        self._agents.start()
+
+    async def asyncTearDown(self):
+        self._agents.stop()
+        self._llm.stop()
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+        self.restore_schema()
+
+    async def test_in_flight_request_finishes_on_the_old_agent(self):
+        old_agent = await api_server.get_or_create_agent("openai")
+        old_version = old_agent.schema_version
+        request = asyncio.create_task(api_server.generate_answer("openai", "list genes", "r1"))
+        await asyncio.sleep(0.05)
+
+        self.write(with_compound(SCHEMA))
+        new_version = await api_server.reload_schema_if_changed()
+
+        new_agent = api_server._AGENT_INSTANCES["openai"]
+        self.assertIsNot(new_agent, old_agent)
+        self.assertFalse(request.done())
+        self.assertEqual(await request, "MATCH (g:Gene) RETURN g")
+        self.assertEqual(old_agent.schema_version, old_version)
+        self.assertNotIn("Compound", old_agent.system_prompt)
+        self.assertEqual(new_agent.schema_version, new_version)
+        self.assertIn("Compound", new_agent.system_prompt)
+        self.assertEqual(schema_loader.get_schema_version(), new_version)
+        self.assertIsNone(api_server._AGENT_INSTANCES["google"])
+
+        # Both versions' validators stay usable until the next reload.
+        self.assertTrue(get_cypher_validator(old_agent.snapshot).validate("MATCH (g:Gene) RETURN g").ok)
+        self.assertFalse(get_cypher_validator(old_agent.snapshot).validate("MATCH (c:Compound) RETURN c").ok)
+        self.assertTrue(get_cypher_validator(new_agent.snapshot).validate("MATCH (c:Compound) RETURN c").ok)
+
+    async def test_unchanged_schema_keeps_agents_and_ready_reports_version(self):
+        agent = await api_server.get_or_create_agent("openai")
+        self.assertIsNone(await api_server.reload_schema_if_changed())
+        self.assertIs(api_server._AGENT_INSTANCES["openai"], agent)
+
+        ready = await api_server.readiness_check()
+        self.assertEqual(ready["schema_version"], agent.schema_version)
+        self.assertEqual(ready["node_types"], 2)
+
+        response = api_server.Response()
+        self.assertEqual(await api_server.fetch_schema(response), SCHEMA)
+        self.assertEqual(response.headers["X-Schema-Version"], agent.schema_version)
+
+        self.write(with_compound(SCHEMA))
+        new_version = await api_server.reload_schema_if_changed()
+        response = api_server.Response()
+        self.assertIn("Compound", (await api_server.fetch_schema(response))["NodeTypes"])
+        self.assertEqual(response.headers["X-Schema-Version"], new_version)
+        self.assertEqual(response.headers["ETag"], f'"{new_version}"')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import unittest
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.schema_render as schema_render
+from src.schema_render import available_formats, register_renderer, render_schema
+from src.utils import estimate_tokens
+
+SCHEMA = {
+    "NodeTypes": {
+        "Compound": {"identifier": "String", "name": "String"},
+        "Gene": {"identifier": "Long", "name": "String"},
+        "Tag": {},
+    },
+    "RelationshipTypes": {
+        "TREATS_CtD": {"_endpoints": ["Compound", "Disease"]},
+        "BINDS_CbG": {
+            "_endpoints": ["Compound", "Gene"],
+            "affinity_nM": "Double",
+            "sources": "String, StringArray",
+        },
+        "ORPHAN": {"_endpoints": ["Unknown", "Unknown"]},
+    },
+}
+
+
+class SchemaRenderTests(unittest.TestCase):
+    def test_compact_groups_properties_by_type(self):
+        text = render_schema(SCHEMA, None, "compact")
+        self.assertIn("(:Compound {identifier,name:String})", text)
+        self.assertIn("(:Gene {identifier:Long, name:String})", text)
+        self.assertIn("(:Tag)", text)
+        self.assertIn("(:Compound)-[:TREATS_CtD]->(:Disease)", text)
+        self.assertIn(
+            "(:Compound)-[:BINDS_CbG {affinity_nM:Double, sources:String|StringArray}]->(:Gene)",
+            text,
+        )
+        self.assertIn("()-[:ORPHAN]->()", text)
+
+    def test_compact_renders_hint_sections(self):
+        text = render_schema(SCHEMA, {"relationships": {"TREATS_CtD": "Compound treats Disease"}})
+        self.assertIn("### Schema Hints\nrelationships:\nTREATS_CtD: Compound treats Disease", text)
+
+    def test_compact_is_smaller_than_json_on_bundled_schema(self):
+        schema_path = ROOT / "data" / "input" / "neo4j_schema.json"
+        schema = json.loads(schema_path.read_text(encoding="utf-8"))
+        compact = estimate_tokens(render_schema(schema, None, "compact"))
+        indented = estimate_tokens(render_schema(schema, None, "json"))
+        self.assertLess(compact, indented / 2)
+
+    def test_custom_renderer_and_unknown_format(self):
+        register_renderer("labels-only", lambda schema, hints: ",".join(schema["NodeTypes"]))
+        try:
+            self.assertIn("labels-only", available_formats())
+            self.assertEqual(render_schema(SCHEMA, None, "labels-only"), "Compound,Gene,Tag")
+        finally:
+            schema_render._RENDERERS.pop("labels-only", None)
+        with self.assertRaises(ValueError):
+            render_schema(SCHEMA, None, "yaml")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,213 @@
+import asyncio
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import AsyncMock, patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+import src.text2cypher_agent as text2cypher_agent
+from src.session_store import (
+    InMemorySessionStore,
+    RedisLeaseLock,
+    RedisSessionStore,
+    get_session_store,
+    set_session_store,
+)
+from src.text2cypher_agent import Text2CypherAgent
+from tests.fake_redis import FakeAsyncRedis, FakeRedis, FakeServer
+
+
+def make_redis_store(server: FakeServer, **kwargs) -> RedisSessionStore:
+    return RedisSessionStore(
+        client=FakeRedis(server),
+        async_client=FakeAsyncRedis(server),
+        **kwargs,
+    )
+
+
+class InMemorySessionStoreTests(unittest.IsolatedAsyncioTestCase):
+    async def test_history_trim_and_session_eviction(self):
+        store = InMemorySessionStore(max_history_messages=4, max_sessions=2)
+        for i in range(3):
+            store.append_messages("a", [HumanMessage(f"q{i}"), AIMessage(f"a{i}")])
+        self.assertEqual([m.content for m in store.get_messages("a")], ["q1", "a1", "q2", "a2"])
+
+        store.append_messages("b", [HumanMessage("b")])
+        store.get_messages("a")
+        store.append_messages("c", [HumanMessage("c")])
+        self.assertEqual(set(store.histories), {"a", "c"})
+
+    async def test_records_are_compact_and_roundtrip(self):
+        store = InMemorySessionStore()
+        store.append_messages("a", [
+            HumanMessage("q"),
+            AIMessage("a", additional_kwargs={"provider": "".join(["open", "ai"])}),
+        ])
+        store.append_messages("b", [AIMessage("b", additional_kwargs={"provider": "openai"})])
+
+        record = store.histories["a"][1]
+        self.assertFalse(hasattr(record, "__dict__"))
+        self.assertIs(record.provider, store.histories["b"][0].provider)
+        messages = store.get_messages("a")
+        self.assertIsInstance(messages[1], AIMessage)
+        self.assertEqual(messages[1].additional_kwargs, {"provider": "openai"})
+
+    async def test_byte_budget_evicts_lru_sessions_then_trims(self):
+        probe = InMemorySessionStore(max_history_bytes=0)
+        probe.append_messages("p", [HumanMessage("x" * 1000), AIMessage("y" * 1000)])
+        exchange_bytes = probe.history_bytes
+
+        store = InMemorySessionStore(max_history_bytes=int(exchange_bytes * 2.5))
+        for sid in ("a", "b", "c"):
+            store.append_messages(sid, [HumanMessage("x" * 1000), AIMessage("y" * 1000)])
+        self.assertEqual(list(store.histories), ["b", "c"])
+        self.assertLessEqual(store.history_bytes, store.max_history_bytes)
+
+        store.append_messages("c", [HumanMessage("x" * 1000), AIMessage("y" * 1000)] * 3)
+        self.assertEqual(list(store.histories), ["c"])
+        self.assertEqual(len(store.histories["c"]), 4)
+
+        stats = store.memory_stats()
+        self.assertEqual(stats["history_messages"], 4)
+        self.assertEqual(stats["byte_evictions"], 2)
+        self.assertEqual(
+            stats["history_bytes"],
+            sum(InMemorySessionStore._session_bytes(h) for h in store.histories.values()),
+        )
+
+        store.clear_history()
+        self.assertEqual(store.memory_stats()["history_bytes"], 0)
+
+    async def test_assistant_threads_are_bounded(self):
+        store = InMemorySessionStore(max_assistant_sessions=1)
+        await store.set_assistant_thread("a", "thread_a")
+        await store.set_assistant_thread("b", "thread_b")
+        self.assertIsNone(await store.get_assistant_thread("a"))
+        self.assertEqual(await store.get_assistant_thread("b"), "thread_b")
+
+    async def test_run_lock_eviction_is_lru_and_skips_held_locks(self):
+        store = InMemorySessionStore(max_run_locks=2)
+        held = await store.get_run_lock("held")
+        await store.get_run_lock("idle")
+        await held.acquire()
+        try:
+            await store.get_run_lock("new")
+            self.assertEqual(list(store.run_locks), ["new", "held"])
+            self.assertIs(await store.get_run_lock("held"), held)
+        finally:
+            held.release()
+
+        await store.get_run_lock("newest")
+        self.assertEqual(list(store.run_locks), ["held", "newest"])
+
+
+class RedisSessionStoreTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeServer()
+        self._old_store = get_session_store()
+        api_server._RESPONSE_CACHE.clear()
+
+    async def asyncTearDown(self):
+        set_session_store(self._old_store)
+        api_server._RESPONSE_CACHE.clear()
+
+    async def test_history_is_shared_between_workers(self):
+        worker_a = make_redis_store(self.server, max_history_messages=4)
+        worker_b = make_redis_store(self.server, max_history_messages=4)
+
+        worker_a.append_messages("s", [HumanMessage("q0"), AIMessage("a0", additional_kwargs={"provider": "openai"})])
+        await worker_b.aappend_messages("s", [HumanMessage("q1"), AIMessage("a1")])
+        await worker_a.aappend_messages("s", [HumanMessage("q2"), AIMessage("a2")])
+
+        messages = await worker_b.aget_messages("s")
+        self.assertEqual([m.content for m in messages], ["q1", "a1", "q2", "a2"])
+        self.assertIsInstance(messages[1], AIMessage)
+
+        worker_b.clear_history()
+        self.assertEqual(worker_a.get_messages("s"), [])
+
+    async def test_assistant_thread_roundtrip(self):
+        store = make_redis_store(self.server)
+        self.assertIsNone(await store.get_assistant_thread("s"))
+        await store.set_assistant_thread("s", "thread_1")
+        self.assertEqual(await make_redis_store(self.server).get_assistant_thread("s"), "thread_1")
+        await store.delete_assistant_thread("s")
+        self.assertIsNone(await store.get_assistant_thread("s"))
+
+    async def test_lease_lock_serializes_workers(self):
+        worker_a = make_redis_store(self.server)
+        worker_b = make_redis_store(self.server)
+        order = []
+
+        async def run(store, name):
+            async with await store.get_run_lock("s"):
+                order.append(f"{name}-start")
+                await asyncio.sleep(0.03)
+                order.append(f"{name}-end")
+
+        await asyncio.gather(run(worker_a, "a"), run(worker_b, "b"))
+
+        self.assertIn(order, (
+            ["a-start", "a-end", "b-start", "b-end"],
+            ["b-start", "b-end", "a-start", "a-end"],
+        ))
+        self.assertNotIn("t2c:lock:s", self.server.data)
+
+    async def test_lease_is_renewed_while_held_and_expires_when_abandoned(self):
+        client = FakeAsyncRedis(self.server)
+        lock = RedisLeaseLock(client, "t2c:lock:s", lease_seconds=0.06)
+        await lock.acquire()
+        await asyncio.sleep(0.15)
+        self.assertTrue(await client.get("t2c:lock:s"))
+        self.assertIn("eval", self.server.calls)
+
+        lock._renewer.cancel()
+        await asyncio.sleep(0.1)
+        other = RedisLeaseLock(client, "t2c:lock:s", lease_seconds=0.06, timeout_seconds=1)
+        await other.acquire()
+        self.assertTrue(other.locked())
+        await other.release()
+
+        # Releasing with a stale token must not delete another holder's lease.
+        await client.set("t2c:lock:s", "someone-else")
+        await lock.release()
+        self.assertEqual(await client.get("t2c:lock:s"), "someone-else")
+
+    async def test_lock_timeout_raises(self):
+        client = FakeAsyncRedis(self.server)
+        await client.set("t2c:lock:s", "held")
+        lock = RedisLeaseLock(client, "t2c:lock:s", timeout_seconds=0.05)
+        with self.assertRaises(TimeoutError):
+            await lock.acquire()
+
+    async def test_api_ask_uses_shared_store(self):
+        set_session_store(make_redis_store(self.server))
+        llm = FakeListChatModel(responses=["MATCH (g:Gene) RETURN g"])
+        with patch.object(text2cypher_agent, "make_llm", return_value=llm):
+            agent = Text2CypherAgent(provider="openai")
+
+        req = api_server.QueryRequest(query="list genes", session_id="shared")
+        with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=agent)):
+            result = await api_server.ask_llm_agent(req)
+
+        self.assertEqual(result["answer"], "MATCH (g:Gene) RETURN g")
+        other_worker = make_redis_store(self.server)
+        history = Text2CypherAgent._history_to_payload(other_worker.get_messages("shared"))
+        self.assertEqual(
+            history,
+            [
+                {"role": "user", "content": "list genes"},
+                {"role": "assistant", "content": "MATCH (g:Gene) RETURN g", "provider": "openai"},
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
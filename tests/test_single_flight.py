@@ -0,0 +1,219 @@
+import asyncio
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import AsyncMock, patch
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+from src.response_cache import ResponseCache
+from src.single_flight import SingleFlight
+from src.text2cypher_agent import Text2CypherAgent
+
+
+class SingleFlightTests(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        self.assertEqual(calls, 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+        self.assertEqual(flight.stats(), {"in_flight": 0, "leaders": 1, "followers": 4})
+
+        # Finished calls are not remembered.
+        await flight.do("k", work)
+        self.assertEqual(calls, 2)
+
+    async def test_leader_error_reaches_followers(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("provider down")
+
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(flight.stats()["in_flight"], 0)
+
+    async def test_follower_takes_over_from_a_cancelled_leader(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def work(name):
+            calls.append(name)
+            await asyncio.sleep(0.05)
+            return name
+
+        leader = asyncio.create_task(flight.do("k", lambda: work("leader")))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", lambda: work("follower")))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        self.assertEqual(await follower, ("follower", False))
+        self.assertEqual(calls, ["leader", "follower"])
+
+    async def test_disabled_never_coalesces(self):
+        flight = SingleFlight(enabled=False)
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        await asyncio.gather(*(flight.do("k", work) for _ in range(3)))
+        self.assertEqual(calls, 3)
+
+
+class CountingAgent:
+    def __init__(self):
+        self.calls = 0
+
+    async def arespond(self, user_text: str, session_id: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        answer = "MATCH (g:Gene) RETURN g"
+        await Text2CypherAgent.aappend_external_exchange(session_id, user_text, answer, provider="openai")
+        return answer
+
+    async def astream(self, user_text: str, session_id: str):
+        self.calls += 1
+        for part in ("MATCH (g:Gene) ", "RETURN g"):
+            await asyncio.sleep(0.03)
+            yield part
+        await Text2CypherAgent.aappend_external_exchange(session_id, user_text, "MATCH (g:Gene) RETURN g")
+
+
+class AskSingleFlightTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Text2CypherAgent.clear_session_history()
+        # Cache off: only single-flight can save the duplicate calls.
+        self._cache = patch.object(api_server, "_RESPONSE_CACHE", ResponseCache(max_entries=0))
+        self._cache.start()
+        self._flight = patch.object(api_server, "_SINGLE_FLIGHT", SingleFlight())
+        self._flight.start()
+        self.agent = CountingAgent()
+        self._agent = patch("src.api_server.get_or_create_agent", AsyncMock(return_value=self.agent))
+        self._agent.start()
+
+    async def asyncTearDown(self):
+        self._agent.stop()
+        self._flight.stop()
+        self._cache.stop()
+        Text2CypherAgent.clear_session_history()
+
+    async def test_identical_questions_share_one_llm_call(self):
+        results = await asyncio.gather(*(
+            api_server.ask_llm_agent(api_server.QueryRequest(query=query, session_id=f"sf{i}"))
+            for i, query in enumerate(["list genes", "list genes?", " list  genes", "list genes"])
+        ))
+        self.assertEqual(self.agent.calls, 1)
+        self.assertEqual({r["answer"] for r in results}, {"MATCH (g:Gene) RETURN g"})
+        for i in range(4):
+            history = Text2CypherAgent.get_session_history(f"sf{i}")
+            self.assertEqual([m["role"] for m in history], ["user", "assistant"])
+            self.assertEqual(history[1]["provider"], "openai")
+        self.assertEqual(api_server._SINGLE_FLIGHT.stats()["followers"], 3)
+
+    async def test_different_history_or_provider_is_not_shared(self):
+        await Text2CypherAgent.aappend_external_exchange("with-history", "list diseases", "MATCH (d:Disease) RETURN d")
+        await asyncio.gather(
+            api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id="fresh")),
+            api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id="with-history")),
+            api_server.ask_llm_agent(
+                api_server.QueryRequest(query="list genes", session_id="other", provider="google")
+            ),
+        )
+        self.assertEqual(self.agent.calls, 3)
+
+    async def test_stream_leader_shares_with_plain_ask(self):
+        async def stream():
+            response = await api_server.ask_llm_agent_stream(
+                api_server.QueryRequest(query="list genes", session_id="st1")
+            )
+            return [chunk async for chunk in response.body_iterator]
+
+        events, result = await asyncio.gather(
+            stream(),
+            api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id="st2")),
+        )
+        self.assertEqual(self.agent.calls, 1)
+        self.assertEqual(result["answer"], "MATCH (g:Gene) RETURN g")
+        self.assertIn("event: done", events[-1])
+        self.assertEqual(len(Text2CypherAgent.get_session_history("st2")), 2)
+
+    async def test_identical_streams_on_a_cold_provider_share_one_call(self):
+        async def build_agent(provider="openai"):
+            # A cold provider: the agent is still being built.
+            await asyncio.sleep(0.02)
+            return self.agent
+
+        async def stream(session_id):
+            response = await api_server.ask_llm_agent_stream(
+                api_server.QueryRequest(query="list genes", session_id=session_id)
+            )
+            return [chunk async for chunk in response.body_iterator]
+
+        with patch("src.api_server.get_or_create_agent", build_agent):
+            streams = await asyncio.gather(stream("cold1"), stream("cold2"))
+        self.assertEqual(self.agent.calls, 1)
+        for events in streams:
+            self.assertIn('"answer": "MATCH (g:Gene) RETURN g"', events[-1])
+        self.assertEqual(api_server._SINGLE_FLIGHT.stats()["followers"], 1)
+
+    async def test_every_session_stores_the_raw_answer(self):
+        fenced = "``` MATCH (g:Gene) RETURN g ```"
+
+        async def arespond(user_text, session_id):
+            self.agent.calls += 1
+            await asyncio.sleep(0.05)
+            await Text2CypherAgent.aappend_external_exchange(session_id, user_text, fenced, provider="openai")
+            return "MATCH (g:Gene) RETURN g"
+
+        async def astream(user_text, session_id):
+            self.agent.calls += 1
+            await asyncio.sleep(0.05)
+            yield "MATCH (g:Gene) RETURN g"
+            await Text2CypherAgent.aappend_external_exchange(session_id, user_text, fenced, provider="openai")
+
+        async def stream(session_id):
+            response = await api_server.ask_llm_agent_stream(
+                api_server.QueryRequest(query="list genes", session_id=session_id)
+            )
+            return [chunk async for chunk in response.body_iterator]
+
+        self.agent.arespond, self.agent.astream = arespond, astream
+        with patch.object(api_server, "_RESPONSE_CACHE", ResponseCache(max_entries=10)):
+            results = await asyncio.gather(*(
+                api_server.ask_llm_agent(api_server.QueryRequest(query="list genes", session_id=f"raw{i}"))
+                for i in range(2)
+            ))
+            # Cache hits, on both paths.
+            results.append(await api_server.ask_llm_agent(
+                api_server.QueryRequest(query="list genes", session_id="raw2")
+            ))
+            events = await stream("raw3")
+        # Stream leader and follower.
+        await asyncio.gather(stream("raw4"), stream("raw5"))
+
+        self.assertEqual(self.agent.calls, 2)
+        self.assertEqual({r["answer"] for r in results}, {"MATCH (g:Gene) RETURN g"})
+        self.assertIn('"answer": "MATCH (g:Gene) RETURN g"', events[-1])
+        for i in range(6):
+            history = Text2CypherAgent.get_session_history(f"raw{i}")
+            self.assertEqual(history[1]["content"], fenced, f"raw{i}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import subprocess
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+import src.text2cypher_agent as text2cypher_agent
+
+PROVIDER_MODULES = ["openai", "langchain_openai", "langchain_google_genai"]
+
+
+class LazyImportTests(unittest.TestCase):
+    def test_provider_packages_are_not_imported_with_the_app(self):
+        code = (
+            "import json, sys; import src.api_server; "
+            f"print(json.dumps([m for m in {PROVIDER_MODULES!r} if m in sys.modules]))"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(json.loads(out.stdout.strip().splitlines()[-1]), [])
+
+
+class WarmUpTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._agents = patch.dict(api_server._AGENT_INSTANCES, {"openai": None, "google": None})
+        self._agents.start()
+
+    async def asyncTearDown(self):
+        self._agents.stop()
+
+    async def test_ready_waits_for_warm_up(self):
+        llm = FakeListChatModel(responses=["MATCH (g:Gene) RETURN g"])
+        with patch.object(text2cypher_agent, "make_llm", return_value=llm), \
+                patch.object(api_server, "WARMUP_PROVIDERS", ["openai"]), \
+                patch.object(api_server, "SCHEMA_RELOAD_SECONDS", 0):
+            async with api_server.lifespan(api_server.app):
+                with self.assertRaises(HTTPException) as ctx:
+                    await api_server.readiness_check()
+                self.assertEqual(ctx.exception.status_code, 503)
+
+                timings = await api_server._warmup_task
+                self.assertEqual(list(timings), ["openai"])
+                self.assertTrue((await api_server.readiness_check())["ready"])
+                self.assertIsNotNone(api_server._AGENT_INSTANCES["openai"])
+                self.assertIsNone(api_server._AGENT_INSTANCES["google"])
+
+    async def test_failed_provider_is_left_for_its_first_request(self):
+        with patch.object(text2cypher_agent, "make_llm", side_effect=RuntimeError("no key")), \
+                self.assertLogs("src.api_server", level="ERROR"):
+            timings = await api_server.warm_up(["google"])
+        self.assertEqual(timings, {})
+        self.assertIsNone(api_server._AGENT_INSTANCES["google"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import random
+import unittest
+from pathlib import Path
+import sys
+from unittest.mock import AsyncMock, patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import src.api_server as api_server
+import src.text2cypher_agent as text2cypher_agent
+from src.text2cypher_agent import StreamingAnswerCleaner, Text2CypherAgent, clean_answer
+
+
+async def collect_events(response) -> list[tuple[str, dict]]:
+    events = []
+    async for raw in response.body_iterator:
+        block = raw.decode() if isinstance(raw, bytes) else raw
+        lines = block.strip().splitlines()
+        event = lines[0].removeprefix("event: ")
+        data = json.loads(lines[1].removeprefix("data: "))
+        events.append((event, data))
+    return events
+
+
+class StreamingAnswerCleanerTests(unittest.TestCase):
+    def test_matches_clean_answer_for_any_chunking(self):
+        rng = random.Random(7)
+        samples = [
+            "```MATCH (n) RETURN n```",
+            "  \n```cypher\nMATCH (n)\nRETURN n\n```\n",
+            "x `\n`",
+            "plain",
+            "",
+        ]
+        for text in samples:
+            for _ in range(20):
+                cleaner = StreamingAnswerCleaner()
+                out, idx = "", 0
+                while idx < len(text):
+                    step = rng.randint(1, 4)
+                    out += cleaner.feed(text[idx:idx + step])
+                    idx += step
+                self.assertEqual(out, clean_answer(text), repr(text))
+
+
+class AskStreamTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+        llm = FakeListChatModel(responses=["```MATCH (d:Disease) RETURN d```"])
+        with patch.object(text2cypher_agent, "make_llm", return_value=llm):
+            self.agent = Text2CypherAgent(provider="google")
+
+    async def asyncTearDown(self):
+        Text2CypherAgent.clear_session_history()
+        api_server._RESPONSE_CACHE.clear()
+
+    async def test_stream_emits_tokens_and_commits_history(self):
+        req = api_server.QueryRequest(query="list diseases", session_id="sse", provider="google")
+        with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=self.agent)):
+            response = await api_server.ask_llm_agent_stream(req)
+            events = await collect_events(response)
+
+        self.assertEqual(response.media_type, "text/event-stream")
+        tokens = [data["text"] for event, data in events if event == "token"]
+        self.assertGreater(len(tokens), 1)
+        event, done = events[-1]
+        self.assertEqual(event, "done")
+        self.assertGreater(done.pop("prompt_tokens"), 0)
+        self.assertEqual(done, {
+            "answer": "MATCH (d:Disease) RETURN d",
+            "provider": "google",
+        })
+        self.assertEqual("".join(tokens), "MATCH (d:Disease) RETURN d")
+
+        history = Text2CypherAgent.get_session_history("sse")
+        self.assertEqual([m["role"] for m in history], ["user", "assistant"])
+        self.assertEqual(history[1]["provider"], "google")
+
+    async def test_stream_holds_session_lock(self):
+        req = api_server.QueryRequest(query="list diseases", session_id="sse-lock", provider="google")
+        session_lock = await api_server.get_session_run_lock("sse-lock")
+        seen_locked = []
+
+        async def fake_astream(query, session_id):
+            seen_locked.append(session_lock.locked())
+            yield "RETURN 1"
+
+        self.agent.astream = fake_astream
+        with patch("src.api_server.get_or_create_agent", AsyncMock(return_value=self.agent)):
+            events = await collect_events(await api_server.ask_llm_agent_stream(req))
+
+        self.assertEqual(seen_locked, [True])
+        self.assertFalse(session_lock.locked())
+        self.assertEqual(events[-1][0], "done")
+
+
+if __name__ == "__main__":
+    unittest.main()